@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class AiManagerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ai_manager'
+
+    def ready(self):
+        # Precarga del modelo al iniciar un worker de Celery (no en migrate/tests)
+        from celery.signals import worker_ready
+        worker_ready.connect(warm_up_on_worker_start, weak=False)
+
+
+def warm_up_on_worker_start(sender=None, **kwargs):
+    from .tasks import warm_up_models_task
+    warm_up_models_task.delay()
@@ -0,0 +1,205 @@
+import time
+import uuid
+import logging
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ai:breaker'
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """El circuito está abierto: la llamada se rechaza sin contactar al servidor"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker del servidor de modelos con el estado en la caché
+    (Redis), compartido por todos los workers web y de Celery.
+
+    - Cerrado: las llamadas pasan; errores y llamadas lentas se cuentan en
+      una ventana de LLM_BREAKER_WINDOW segundos. Si hay al menos
+      LLM_BREAKER_FAILURE_THRESHOLD fallos y superan LLM_BREAKER_FAILURE_RATE
+      del total, el circuito se abre.
+    - Abierto: las llamadas fallan de inmediato (CircuitOpenError) durante
+      LLM_BREAKER_OPEN_SECONDS.
+    - Semiabierto: se deja pasar una sola llamada de prueba a la vez; si
+      funciona el circuito se cierra y si falla vuelve a abrirse. Solo
+      quien tiene el token de la prueba (retornado por before_call) cambia
+      el estado: las llamadas que ya estaban en curso no cuentan.
+    """
+
+    def __init__(self, name, failure_threshold=None, failure_rate=None, window=None,
+                 slow_call_ms=None, open_seconds=None, probe_timeout=None):
+        """
+        Args:
+            name (str): Identificador del servidor protegido (URL de Ollama)
+            failure_threshold (int, optional): Fallos mínimos en la ventana para abrir
+            failure_rate (float, optional): Proporción de fallos para abrir
+            window (int, optional): Segundos de la ventana de conteo
+            slow_call_ms (float, optional): Latencia a partir de la cual una llamada cuenta como fallo
+            open_seconds (int, optional): Segundos abierto antes de probar de nuevo
+            probe_timeout (int, optional): Segundos que se reserva la llamada de prueba
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.LLM_BREAKER_FAILURE_THRESHOLD
+        self.failure_rate = failure_rate or settings.LLM_BREAKER_FAILURE_RATE
+        self.window = window or settings.LLM_BREAKER_WINDOW
+        self.slow_call_ms = slow_call_ms or settings.LLM_BREAKER_SLOW_CALL_MS
+        self.open_seconds = open_seconds or settings.LLM_BREAKER_OPEN_SECONDS
+        self.probe_timeout = probe_timeout or settings.LLM_BREAKER_PROBE_TIMEOUT
+
+    def _key(self, suffix):
+        return f"{KEY_PREFIX}:{self.name}:{suffix}"
+
+    def _window_key(self, counter):
+        return self._key(f"{counter}:{int(time.time() // self.window)}")
+
+    def state(self):
+        """
+        Estado actual del circuito
+
+        Returns:
+            dict: {'state', 'opened_at', 'reason', 'retry_at'}
+        """
+        try:
+            stored = cache.get(self._key('state'))
+        except Exception as e:
+            logger.warning(f"No se pudo leer el estado del circuito {self.name}: {str(e)}")
+            stored = None
+
+        if not stored:
+            return {'state': CLOSED, 'opened_at': None, 'reason': None, 'retry_at': None}
+
+        retry_at = stored['opened_at'] + self.open_seconds
+        state = OPEN if time.time() < retry_at else HALF_OPEN
+        return {**stored, 'state': state, 'retry_at': retry_at}
+
+    def before_call(self):
+        """
+        Autoriza una llamada al servidor
+
+        Returns:
+            str: Token de la llamada de prueba si el circuito está semiabierto
+                (se pasa a record_success/record_failure); None si está cerrado
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto o ya hay una prueba en curso
+        """
+        current = self.state()
+        if current['state'] == CLOSED:
+            return None
+
+        if current['state'] == HALF_OPEN:
+            # Solo un worker a la vez obtiene la llamada de prueba
+            probe = uuid.uuid4().hex
+            try:
+                acquired = cache.add(self._key('probe'), probe, timeout=self.probe_timeout)
+            except Exception as e:
+                logger.warning(f"No se pudo reservar la prueba del circuito {self.name}: {str(e)}")
+                acquired = False
+            if acquired:
+                logger.info(f"Circuito {self.name} semiabierto: enviando llamada de prueba")
+                return probe
+
+        raise CircuitOpenError(
+            f"Servidor de modelos no disponible (circuito abierto: {current['reason']})"
+        )
+
+    def _holds_probe(self, probe):
+        """True si `probe` es el token de la llamada de prueba en curso"""
+        if not probe:
+            return False
+        try:
+            return cache.get(self._key('probe')) == probe
+        except Exception as e:
+            logger.warning(f"No se pudo leer la prueba del circuito {self.name}: {str(e)}")
+            return False
+
+    def record_success(self, latency_ms=None, probe=None):
+        """
+        Registra una llamada exitosa. Una llamada más lenta que
+        LLM_BREAKER_SLOW_CALL_MS cuenta como fallo (servidor saturado).
+
+        Args:
+            latency_ms (float, optional): Duración de la llamada
+            probe (str, optional): Token retornado por before_call
+        """
+        if latency_ms is not None and latency_ms > self.slow_call_ms:
+            self.record_failure(f"llamada lenta ({latency_ms:.0f} ms)", probe=probe)
+            return
+
+        self._count('calls')
+        # Solo la llamada de prueba cierra el circuito (no las que ya estaban en curso)
+        if self.state()['state'] == HALF_OPEN and self._holds_probe(probe):
+            self.close()
+
+    def record_failure(self, error, probe=None):
+        """
+        Registra un error o timeout y abre el circuito si corresponde
+
+        Args:
+            error (Exception | str): Causa del fallo
+            probe (str, optional): Token retornado por before_call
+        """
+        reason = str(error) or error.__class__.__name__
+        state = self.state()['state']
+        if state == OPEN:
+            return
+        if state == HALF_OPEN:
+            # Falló la llamada de prueba: otro periodo abierto
+            if self._holds_probe(probe):
+                self.open(reason)
+            return
+
+        calls = self._count('calls')
+        failures = self._count('failures')
+        if failures >= self.failure_threshold and failures >= calls * self.failure_rate:
+            self.open(reason)
+
+    def open(self, reason):
+        logger.error(f"Circuito {self.name} abierto: {reason}")
+        try:
+            cache.set(self._key('state'), {'opened_at': time.time(), 'reason': reason}, timeout=None)
+            cache.delete(self._key('probe'))
+        except Exception as e:
+            logger.warning(f"No se pudo abrir el circuito {self.name}: {str(e)}")
+
+    def close(self):
+        logger.info(f"Circuito {self.name} cerrado")
+        try:
+            cache.delete_many([
+                self._key('state'), self._key('probe'),
+                self._window_key('calls'), self._window_key('failures')
+            ])
+        except Exception as e:
+            logger.warning(f"No se pudo cerrar el circuito {self.name}: {str(e)}")
+
+    def _count(self, counter):
+        """Incrementa un contador de la ventana actual y retorna su valor"""
+        key = self._window_key(counter)
+        try:
+            cache.add(key, 0, timeout=self.window * 2)
+            return cache.incr(key)
+        except Exception as e:
+            logger.warning(f"No se pudo actualizar el contador {key}: {str(e)}")
+            return 0
+
+
+def get_circuit_breaker(base_url=None):
+    """
+    Circuit breaker del servidor de modelos (el estado vive en la caché,
+    por lo que cualquier instancia con la misma URL lo comparte)
+
+    Args:
+        base_url (str, optional): URL del servidor (por defecto OLLAMA_BASE_URL)
+
+    Returns:
+        CircuitBreaker
+    """
+    return CircuitBreaker((base_url or settings.OLLAMA_BASE_URL).rstrip('/'))
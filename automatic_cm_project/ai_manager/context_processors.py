@@ -0,0 +1,13 @@
+import time
+from .circuit_breaker import get_circuit_breaker, CLOSED
+
+
+def llm_status(request):
+    """Estado del circuit breaker del servidor de modelos para el aviso del dashboard"""
+    if not request.user.is_authenticated:
+        return {}
+
+    breaker = get_circuit_breaker().state()
+    if breaker['state'] != CLOSED:
+        breaker['retry_in'] = max(0, round(breaker['retry_at'] - time.time()))
+    return {'llm_breaker': breaker}
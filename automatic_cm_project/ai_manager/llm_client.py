@@ -0,0 +1,443 @@
+import asyncio
+import json
+import time
+import weakref
+import httpx
+import requests
+import threading
+import logging
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from .circuit_breaker import get_circuit_breaker
+
+logger = logging.getLogger(__name__)
+
+
+class LLMClientError(Exception):
+    """Respuesta inválida del servidor de modelos"""
+
+
+class OllamaClient:
+    """
+    Cliente HTTP para el servidor Ollama con una sesión keep-alive
+    (pool de conexiones) compartida por todos los generadores
+    """
+
+    def __init__(self, base_url=None, model_name=None, connect_timeout=None, pool_size=None):
+        """
+        Args:
+            base_url (str, optional): URL del servidor (por defecto OLLAMA_BASE_URL)
+            model_name (str, optional): Modelo por defecto (por defecto OLLAMA_MODEL)
+            connect_timeout (float, optional): Segundos para abrir la conexión
+            pool_size (int, optional): Conexiones keep-alive a mantener abiertas
+        """
+        self.base_url = (base_url or settings.OLLAMA_BASE_URL).rstrip('/')
+        self.model_name = model_name or settings.OLLAMA_MODEL
+        self.connect_timeout = connect_timeout or settings.OLLAMA_CONNECT_TIMEOUT
+        self.keep_alive = settings.OLLAMA_KEEP_ALIVE
+        # Estado compartido entre workers: si Ollama cae, las llamadas fallan de inmediato
+        self.breaker = get_circuit_breaker(self.base_url)
+
+        pool_size = pool_size or settings.OLLAMA_POOL_SIZE
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _url(self, path):
+        return f"{self.base_url}{path}"
+
+    def _timeout(self, timeout):
+        """(connect, read): falla rápido si el servidor no responde"""
+        return (self.connect_timeout, timeout)
+
+    def generate(self, prompt, options=None, timeout=60, model_name=None, **fields):
+        """
+        Llama a /api/generate sin streaming
+
+        Args:
+            prompt (str): Prompt completo
+            options (dict, optional): Opciones del modelo (temperature, etc.)
+            timeout (float): Segundos máximos de lectura de la respuesta
+            model_name (str, optional): Modelo a usar en lugar del por defecto
+            **fields: Campos adicionales del payload de Ollama
+
+        Returns:
+            dict: Respuesta JSON de Ollama
+
+        Raises:
+            LLMClientError: Si el servidor responde con un código distinto de 200
+            requests.exceptions.RequestException: Errores de conexión o timeout
+        """
+        payload = self._payload(model_name, options, prompt=prompt, **fields)
+        return self._post('/api/generate', payload, timeout)
+
+    def generate_stream(self, prompt, options=None, timeout=60, model_name=None, **fields):
+        """
+        Llama a /api/generate con streaming y produce los tokens a medida que
+        el modelo los genera (`timeout` aplica a la espera entre fragmentos)
+
+        Args:
+            prompt (str): Prompt completo
+            options (dict, optional): Opciones del modelo (temperature, etc.)
+            timeout (float): Segundos máximos de espera entre fragmentos
+            model_name (str, optional): Modelo a usar en lugar del por defecto
+            **fields: Campos adicionales del payload de Ollama
+
+        Yields:
+            str: Fragmentos de texto generados
+
+        Raises:
+            LLMClientError: Si el servidor responde con error
+            requests.exceptions.RequestException: Errores de conexión o timeout
+        """
+        payload = self._payload(model_name, options, prompt=prompt, **fields)
+        for chunk in self._stream('/api/generate', payload, timeout):
+            if chunk.get('response'):
+                yield chunk['response']
+
+    def chat(self, messages, options=None, timeout=60, model_name=None, keep_alive=None, **fields):
+        """
+        Llama a /api/chat sin streaming. Los mensajes system/user se envían por
+        separado para que el servidor reutilice la caché del prefijo común.
+
+        Args:
+            messages (list): Mensajes [{'role', 'content'}]
+            options (dict, optional): Opciones del modelo (temperature, etc.)
+            timeout (float): Segundos máximos de lectura de la respuesta
+            model_name (str, optional): Modelo a usar en lugar del por defecto
+            keep_alive (str, optional): Tiempo que el modelo queda cargado (OLLAMA_KEEP_ALIVE)
+            **fields: Campos adicionales del payload de Ollama
+
+        Returns:
+            dict: Respuesta JSON de Ollama (texto en ['message']['content'])
+
+        Raises:
+            LLMClientError: Si el servidor responde con un código distinto de 200
+            requests.exceptions.RequestException: Errores de conexión o timeout
+        """
+        payload = self._payload(
+            model_name, options, messages=messages,
+            keep_alive=keep_alive or self.keep_alive, **fields
+        )
+        return self._post('/api/chat', payload, timeout)
+
+    def chat_stream(self, messages, options=None, timeout=60, model_name=None, keep_alive=None,
+                    on_done=None, **fields):
+        """
+        Llama a /api/chat con streaming y produce los tokens a medida que
+        el modelo los genera
+
+        Args:
+            messages (list): Mensajes [{'role', 'content'}]
+            options (dict, optional): Opciones del modelo (temperature, etc.)
+            timeout (float): Segundos máximos de espera entre fragmentos
+            model_name (str, optional): Modelo a usar en lugar del por defecto
+            keep_alive (str, optional): Tiempo que el modelo queda cargado (OLLAMA_KEEP_ALIVE)
+            on_done (callable, optional): Recibe el fragmento final (conteo de tokens)
+            **fields: Campos adicionales del payload de Ollama
+
+        Yields:
+            str: Fragmentos de texto generados
+
+        Raises:
+            LLMClientError: Si el servidor responde con error
+            requests.exceptions.RequestException: Errores de conexión o timeout
+        """
+        payload = self._payload(
+            model_name, options, messages=messages,
+            keep_alive=keep_alive or self.keep_alive, **fields
+        )
+        for chunk in self._stream('/api/chat', payload, timeout):
+            content = chunk.get('message', {}).get('content')
+            if content:
+                yield content
+            if chunk.get('done') and on_done:
+                on_done(chunk)
+
+    def load_model(self, model_name=None, keep_alive=None, timeout=120):
+        """
+        Carga el modelo en memoria sin generar texto (petición sin prompt)
+
+        Args:
+            model_name (str, optional): Modelo a cargar
+            keep_alive (str, optional): Tiempo que el modelo queda cargado (OLLAMA_KEEP_ALIVE)
+            timeout (float): Segundos máximos para la carga
+
+        Returns:
+            dict: Respuesta JSON de Ollama
+        """
+        payload = {
+            "model": model_name or self.model_name,
+            "keep_alive": keep_alive or self.keep_alive
+        }
+        return self._post('/api/generate', payload, timeout)
+
+    def running_models(self, timeout=5):
+        """
+        Lista los modelos cargados en memoria (/api/ps)
+
+        Returns:
+            list: Nombres de los modelos cargados
+        """
+        response = self.session.get(self._url('/api/ps'), timeout=self._timeout(timeout))
+        if response.status_code != 200:
+            raise LLMClientError(f"Error en la API: {response.status_code}")
+        return [m['name'] for m in response.json().get('models', [])]
+
+    def _payload(self, model_name, options, **fields):
+        return {
+            "model": model_name or self.model_name,
+            "options": options or {},
+            **fields
+        }
+
+    def _post(self, path, payload, timeout):
+        """
+        POST sin streaming; retorna el JSON de la respuesta
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto (sin contactar al servidor)
+        """
+        probe = self.breaker.before_call()
+        start = time.perf_counter()
+        try:
+            response = self.session.post(
+                self._url(path),
+                json={**payload, "stream": False},
+                timeout=self._timeout(timeout)
+            )
+
+            if response.status_code != 200:
+                raise LLMClientError(f"Error en la API: {response.status_code}")
+
+            data = response.json()
+        except Exception as e:
+            self.breaker.record_failure(e, probe=probe)
+            raise
+
+        self.breaker.record_success((time.perf_counter() - start) * 1000, probe=probe)
+        return data
+
+    def _stream(self, path, payload, timeout):
+        """
+        POST con streaming; produce cada objeto JSON hasta el de 'done'. Para
+        el circuit breaker cuenta la latencia hasta el primer fragmento.
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto (sin contactar al servidor)
+        """
+        probe = self.breaker.before_call()
+        start = time.perf_counter()
+        first = True
+        try:
+            with self.session.post(
+                self._url(path),
+                json={**payload, "stream": True},
+                timeout=self._timeout(timeout),
+                stream=True
+            ) as response:
+                if response.status_code != 200:
+                    raise LLMClientError(f"Error en la API: {response.status_code}")
+
+                # Ollama envía un objeto JSON por línea
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        raise LLMClientError(chunk['error'])
+                    if first:
+                        first = False
+                        self.breaker.record_success((time.perf_counter() - start) * 1000, probe=probe)
+                    yield chunk
+                    if chunk.get('done'):
+                        break
+        except Exception as e:
+            if first:
+                self.breaker.record_failure(e, probe=probe)
+            raise
+
+    def list_models(self, timeout=5):
+        """
+        Lista los modelos disponibles en el servidor (/api/tags)
+
+        Returns:
+            list: Nombres de los modelos
+        """
+        response = self.session.get(self._url('/api/tags'), timeout=self._timeout(timeout))
+        if response.status_code != 200:
+            raise LLMClientError(f"Error en la API: {response.status_code}")
+        return [m['name'] for m in response.json().get('models', [])]
+
+
+class AsyncOllamaClient:
+    """
+    Cliente asíncrono (httpx) para el servidor Ollama: una generación larga
+    ocupa una corrutina en lugar de un hilo del servidor
+    """
+
+    def __init__(self, base_url=None, model_name=None, connect_timeout=None, pool_size=None):
+        """
+        Args:
+            base_url (str, optional): URL del servidor (por defecto OLLAMA_BASE_URL)
+            model_name (str, optional): Modelo por defecto (por defecto OLLAMA_MODEL)
+            connect_timeout (float, optional): Segundos para abrir la conexión
+            pool_size (int, optional): Conexiones keep-alive a mantener abiertas
+        """
+        self.base_url = (base_url or settings.OLLAMA_BASE_URL).rstrip('/')
+        self.model_name = model_name or settings.OLLAMA_MODEL
+        self.connect_timeout = connect_timeout or settings.OLLAMA_CONNECT_TIMEOUT
+        self.keep_alive = settings.OLLAMA_KEEP_ALIVE
+        # Estado compartido entre workers: si Ollama cae, las llamadas fallan de inmediato
+        self.breaker = get_circuit_breaker(self.base_url)
+
+        pool_size = pool_size or settings.OLLAMA_POOL_SIZE
+        self.http = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+
+    def _timeout(self, timeout):
+        """Falla rápido si el servidor no responde; `timeout` limita la lectura"""
+        return httpx.Timeout(timeout, connect=self.connect_timeout)
+
+    async def generate(self, prompt, options=None, timeout=60, model_name=None, **fields):
+        """
+        Versión asíncrona de OllamaClient.generate
+
+        Returns:
+            dict: Respuesta JSON de Ollama
+        """
+        payload = self._payload(model_name, options, prompt=prompt, **fields)
+        return await self._post('/api/generate', payload, timeout)
+
+    async def chat(self, messages, options=None, timeout=60, model_name=None, keep_alive=None, **fields):
+        """
+        Versión asíncrona de OllamaClient.chat
+
+        Returns:
+            dict: Respuesta JSON de Ollama (texto en ['message']['content'])
+        """
+        payload = self._payload(
+            model_name, options, messages=messages,
+            keep_alive=keep_alive or self.keep_alive, **fields
+        )
+        return await self._post('/api/chat', payload, timeout)
+
+    async def chat_stream(self, messages, options=None, timeout=60, model_name=None, keep_alive=None,
+                          on_done=None, **fields):
+        """
+        Versión asíncrona de OllamaClient.chat_stream
+
+        Yields:
+            str: Fragmentos de texto generados
+        """
+        payload = self._payload(
+            model_name, options, messages=messages,
+            keep_alive=keep_alive or self.keep_alive, **fields
+        )
+        probe = await sync_to_async(self.breaker.before_call)()
+        start = time.perf_counter()
+        first = True
+        try:
+            async with self.http.stream(
+                'POST', '/api/chat', json={**payload, "stream": True}, timeout=self._timeout(timeout)
+            ) as response:
+                if response.status_code != 200:
+                    raise LLMClientError(f"Error en la API: {response.status_code}")
+
+                # Ollama envía un objeto JSON por línea
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        raise LLMClientError(chunk['error'])
+                    if first:
+                        first = False
+                        await sync_to_async(self.breaker.record_success)(
+                            (time.perf_counter() - start) * 1000, probe=probe
+                        )
+                    content = chunk.get('message', {}).get('content')
+                    if content:
+                        yield content
+                    if chunk.get('done'):
+                        if on_done:
+                            on_done(chunk)
+                        break
+        except Exception as e:
+            if first:
+                await sync_to_async(self.breaker.record_failure)(e, probe=probe)
+            raise
+
+    def _payload(self, model_name, options, **fields):
+        return {
+            "model": model_name or self.model_name,
+            "options": options or {},
+            **fields
+        }
+
+    async def _post(self, path, payload, timeout):
+        probe = await sync_to_async(self.breaker.before_call)()
+        start = time.perf_counter()
+        try:
+            response = await self.http.post(
+                path, json={**payload, "stream": False}, timeout=self._timeout(timeout)
+            )
+
+            if response.status_code != 200:
+                raise LLMClientError(f"Error en la API: {response.status_code}")
+
+            data = response.json()
+        except Exception as e:
+            await sync_to_async(self.breaker.record_failure)(e, probe=probe)
+            raise
+
+        await sync_to_async(self.breaker.record_success)((time.perf_counter() - start) * 1000, probe=probe)
+        return data
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_llm_client(base_url=None):
+    """
+    Retorna el cliente compartido del proceso para un servidor Ollama
+
+    Args:
+        base_url (str, optional): URL del servidor (por defecto OLLAMA_BASE_URL)
+
+    Returns:
+        OllamaClient: Cliente con sesión keep-alive
+    """
+    key = (base_url or settings.OLLAMA_BASE_URL).rstrip('/')
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = OllamaClient(base_url=key)
+        return client
+
+
+# httpx.AsyncClient queda ligado al event loop donde se crea: un cliente por loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_llm_client(base_url=None):
+    """
+    Retorna el cliente asíncrono compartido del event loop actual
+
+    Args:
+        base_url (str, optional): URL del servidor (por defecto OLLAMA_BASE_URL)
+
+    Returns:
+        AsyncOllamaClient: Cliente con pool de conexiones keep-alive
+    """
+    key = (base_url or settings.OLLAMA_BASE_URL).rstrip('/')
+    loop_clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = loop_clients.get(key)
+    if client is None:
+        client = loop_clients[key] = AsyncOllamaClient(base_url=key)
+    return client
@@ -0,0 +1,76 @@
+import statistics
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from ai_manager.llm_client import get_llm_client
+from ai_manager.prompt_builder import PromptBuilder
+from ai_manager.response_generator import ResponseGenerator
+
+SAMPLE_COMMENTS = [
+    '¡Gracias por la información!',
+    '¿Siguen abiertas las vacantes?',
+    'Me interesa, ¿cómo aplico?',
+    '¿El trabajo es remoto o presencial?',
+    'Excelente publicación 👏',
+    '¿Cuál es el rango salarial?',
+    'Ya envié mi hoja de vida por DM',
+    '¿Aceptan perfiles junior?',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el tiempo al primer token (TTFT) con el prefijo del prompt estable '
+        'entre comentarios vs. un prefijo distinto en cada llamada'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=len(SAMPLE_COMMENTS), help='Comentarios por modo')
+        parser.add_argument('--tone', default='friendly')
+        parser.add_argument('--context', default='Post: Vacantes de desarrollo en Magneto')
+
+    def handle(self, *args, **options):
+        client = get_llm_client()
+        comments = [SAMPLE_COMMENTS[i % len(SAMPLE_COMMENTS)] for i in range(options['runs'])]
+        tone, context = options['tone'], options['context']
+
+        # Carga el modelo para no medir el tiempo de carga en la primera corrida
+        self._ttft(client, PromptBuilder.build_messages('Hola', tone, context))
+
+        stable = [
+            self._ttft(client, PromptBuilder.build_messages(comment, tone, context))
+            for comment in comments
+        ]
+        # Un prefijo único por llamada invalida la caché del prompt en el servidor
+        unique = [
+            self._ttft(client, self._unique_prefix(PromptBuilder.build_messages(comment, tone, context)))
+            for comment in comments
+        ]
+
+        self.stdout.write(f'Comentarios por modo: {len(comments)} (modelo {client.model_name})')
+        self._report('Prefijo estable (reutilizado)', stable)
+        self._report('Prefijo distinto (sin reutilizar)', unique)
+
+    def _ttft(self, client, messages):
+        """Milisegundos hasta el primer token de la respuesta"""
+        start = time.perf_counter()
+        stream = client.chat_stream(
+            messages,
+            options=ResponseGenerator.GENERATION_OPTIONS,
+            model_name=client.model_name
+        )
+        try:
+            next(stream, None)
+            return (time.perf_counter() - start) * 1000
+        finally:
+            stream.close()
+
+    def _unique_prefix(self, messages):
+        system, user = messages
+        return [{**system, 'content': f"[{uuid.uuid4()}]\n{system['content']}"}, user]
+
+    def _report(self, label, samples):
+        self.stdout.write(
+            f'{label:36} mediana {statistics.median(samples):8.0f} ms   '
+            f'media {statistics.mean(samples):8.0f} ms'
+        )
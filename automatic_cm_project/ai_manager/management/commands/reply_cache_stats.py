@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from ai_manager.reply_cache import get_reply_cache
+
+
+class Command(BaseCommand):
+    help = 'Muestra la tasa de aciertos de la caché de respuestas generadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reinicia los contadores')
+
+    def handle(self, *args, **options):
+        reply_cache = get_reply_cache()
+        stats = reply_cache.stats()
+
+        self.stdout.write(f"Aciertos: {stats['hits']}")
+        self.stdout.write(f"Fallos:   {stats['misses']}")
+        self.stdout.write(f"Tasa de aciertos: {stats['hit_rate']:.1%}")
+
+        if options['reset']:
+            reply_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Contadores reiniciados'))
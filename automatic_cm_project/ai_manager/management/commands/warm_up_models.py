@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from ai_manager.model_health import configured_models, warm_up_models
+
+
+class Command(BaseCommand):
+    help = 'Carga en memoria los modelos de Ollama configurados (OLLAMA_WARMUP_MODELS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', help='Modelos a cargar (por defecto los configurados)')
+
+    def handle(self, *args, **options):
+        models = options['models'] or configured_models()
+        results = warm_up_models(models)
+
+        for model, load_ms in results.items():
+            if load_ms is None:
+                self.stdout.write(self.style.ERROR(f'{model}: no se pudo cargar'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{model}: cargado en {load_ms} ms'))
@@ -0,0 +1,161 @@
+import time
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from .circuit_breaker import get_circuit_breaker, OPEN
+from .llm_client import get_llm_client
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ai:model'
+LAST_USED_KEY = f'{KEY_PREFIX}:last_used'
+
+# El estado se conserva aunque no haya pings (solo se sobrescribe)
+STATE_TTL = None
+
+
+def _state_key(model_name):
+    return f'{KEY_PREFIX}:state:{model_name}'
+
+
+def configured_models():
+    """Modelos que se precargan y se mantienen en memoria"""
+    return list(getattr(settings, 'OLLAMA_WARMUP_MODELS', None) or [settings.OLLAMA_MODEL])
+
+
+def _update_state(model_name, **fields):
+    key = _state_key(model_name)
+    try:
+        state = cache.get(key) or {'model': model_name}
+        state.update(fields)
+        cache.set(key, state, timeout=STATE_TTL)
+    except Exception as e:
+        logger.warning(f"No se pudo guardar el estado del modelo {model_name}: {str(e)}")
+
+
+def record_generation(model_name, latency_ms=None, ttft_ms=None):
+    """
+    Registra una generación exitosa: el modelo está cargado, su última
+    latencia observada y el momento del último uso (tráfico)
+
+    Args:
+        model_name (str): Modelo usado
+        latency_ms (float, optional): Duración total de la generación
+        ttft_ms (float, optional): Tiempo al primer token (streaming)
+    """
+    now = time.time()
+    fields = {'available': True, 'loaded': True, 'last_used': now, 'error': None}
+    if latency_ms is not None:
+        fields['latency_ms'] = round(latency_ms)
+    if ttft_ms is not None:
+        fields['ttft_ms'] = round(ttft_ms)
+    _update_state(model_name, **fields)
+
+    try:
+        cache.set(LAST_USED_KEY, now, timeout=None)
+    except Exception as e:
+        logger.warning(f"No se pudo registrar el uso del modelo: {str(e)}")
+
+
+def get_model_health():
+    """
+    Estado de los modelos configurados desde la caché (sin llamar a Ollama).
+    Con el circuito abierto el servidor se reporta como no disponible.
+
+    Returns:
+        dict: {'available': bool, 'models': [estado por modelo], 'breaker': estado del circuito}
+    """
+    keys = {model: _state_key(model) for model in configured_models()}
+    try:
+        states = cache.get_many(list(keys.values()))
+    except Exception as e:
+        logger.warning(f"No se pudo leer el estado de los modelos: {str(e)}")
+        states = {}
+
+    models = [states.get(key) or {'model': model, 'checked_at': None} for model, key in keys.items()]
+    breaker = get_circuit_breaker().state()
+    return {
+        'available': breaker['state'] != OPEN and any(state.get('available') for state in models),
+        'models': models,
+        'breaker': breaker
+    }
+
+
+def refresh_model_health():
+    """
+    Consulta /api/ps y actualiza en caché qué modelos están cargados
+
+    Returns:
+        dict: Igual que get_model_health
+    """
+    client = get_llm_client()
+    now = time.time()
+    try:
+        start = time.perf_counter()
+        loaded = client.running_models()
+        ping_ms = round((time.perf_counter() - start) * 1000)
+    except Exception as e:
+        logger.error(f"Error al conectar con Ollama: {str(e)}")
+        for model in configured_models():
+            _update_state(model, available=False, loaded=False, checked_at=now, error=str(e))
+        return get_model_health()
+
+    for model in configured_models():
+        # /api/ps reporta nombres con etiqueta ("llama3:latest")
+        is_loaded = any(name == model or name.split(':')[0] == model for name in loaded)
+        _update_state(model, available=True, loaded=is_loaded, checked_at=now, ping_ms=ping_ms, error=None)
+
+    return get_model_health()
+
+
+def warm_up_models(models=None):
+    """
+    Carga los modelos en memoria para que la primera generación no pague
+    el tiempo de carga
+
+    Args:
+        models (list, optional): Modelos a cargar (por defecto OLLAMA_WARMUP_MODELS)
+
+    Returns:
+        dict: {modelo: milisegundos de carga o None si falló}
+    """
+    client = get_llm_client()
+    results = {}
+    for model in models or configured_models():
+        start = time.perf_counter()
+        try:
+            client.load_model(model)
+        except Exception as e:
+            logger.error(f"No se pudo precargar {model}: {str(e)}")
+            _update_state(model, available=False, loaded=False, checked_at=time.time(), error=str(e))
+            results[model] = None
+            continue
+
+        load_ms = round((time.perf_counter() - start) * 1000)
+        _update_state(model, available=True, loaded=True, checked_at=time.time(), load_ms=load_ms, error=None)
+        logger.info(f"Modelo {model} precargado en {load_ms} ms")
+        results[model] = load_ms
+
+    return results
+
+
+def keep_alive_ping():
+    """
+    Mantiene los modelos cargados solo si hubo tráfico reciente
+    (OLLAMA_KEEPALIVE_IDLE_WINDOW); si no, deja que Ollama los descargue
+
+    Returns:
+        bool: True si se enviaron pings
+    """
+    try:
+        last_used = cache.get(LAST_USED_KEY)
+    except Exception as e:
+        logger.warning(f"No se pudo leer el último uso del modelo: {str(e)}")
+        last_used = None
+
+    active = last_used is not None and time.time() - last_used < settings.OLLAMA_KEEPALIVE_IDLE_WINDOW
+    if active:
+        warm_up_models()
+
+    refresh_model_health()
+    return active
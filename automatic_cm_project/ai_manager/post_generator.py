@@ -1,15 +1,45 @@
-import requests
-import json
 import logging
+from .llm_client import get_async_llm_client, get_llm_client, LLMClientError
+from .scheduler import get_scheduler, INTERACTIVE, QueueTimeout
+from .token_budget import log_token_usage, truncate_to_tokens
 
 logger = logging.getLogger(__name__)
 
+# Segundos máximos de espera por un post generado
+GENERATION_TIMEOUT = 90
+
 class PostGenerator:
     """Genera contenido para posts de empleo usando IA"""
     
-    def __init__(self, model_url="http://localhost:11434/api/generate"):
+    # Tope real de salida (num_predict) y paradas si el modelo repite el prompt
+    JOB_POST_OPTIONS = {
+        "temperature": 0.7,
+        "num_predict": 700,
+        "stop": ["INFORMACIÓN DEL EMPLEO:", "FORMATO DE RESPUESTA:"]
+    }
+    
+    CUSTOM_POST_OPTIONS = {
+        "temperature": 0.8,
+        "num_predict": 600,
+        "stop": ["FORMATO:"]
+    }
+    
+    # Tokens máximos de cada dato del formulario dentro del prompt
+    FIELD_MAX_TOKENS = 40
+    ITEM_MAX_TOKENS = 60
+    MAX_LIST_ITEMS = 15
+    TOPIC_MAX_TOKENS = 200
+    
+    def __init__(self, model_url=None, model_name=None):
+        """
+        Args:
+            model_url (str, optional): URL base del servidor Ollama (por defecto OLLAMA_BASE_URL)
+            model_name (str, optional): Modelo a usar (por defecto OLLAMA_MODEL)
+        """
         self.model_url = model_url
-        self.model_name = "llama3"
+        self.client = get_llm_client(model_url)
+        self.model_name = model_name or self.client.model_name
+        self.scheduler = get_scheduler()
     
     def generate_job_post(self, job_title, company_name, job_type, location, 
                          salary_range=None, requirements=None, benefits=None):
@@ -27,6 +57,9 @@ class PostGenerator:
             
         Returns:
             dict: Título y contenido generados
+            
+        Raises:
+            QueueTimeout: Si no se obtuvo un turno en el servidor de modelos
         """
         try:
             # Construir el prompt
@@ -35,47 +68,82 @@ class PostGenerator:
                 salary_range, requirements, benefits
             )
             
-            # Llamar al modelo
-            payload = {
-                "model": self.model_name,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.7,
-                    "max_tokens": 800
-                }
-            }
+            # Llamar al modelo (turno interactivo en el servidor de modelos)
+            with self.scheduler.slot(INTERACTIVE):
+                result = self.client.generate(
+                    prompt,
+                    options=self.JOB_POST_OPTIONS,
+                    timeout=GENERATION_TIMEOUT,
+                    model_name=self.model_name
+                )
+            log_token_usage('job_post', self.model_name, result)
+            return self._parse_job_post(result.get('response', '').strip())
+                
+        except QueueTimeout:
+            # Cola saturada: quien llama responde con el tiempo estimado (no con el respaldo)
+            raise
+        except LLMClientError as e:
+            logger.error(str(e))
+            return self._get_fallback_post(job_title, company_name)
+        except Exception as e:
+            logger.error(f"Error al generar post: {str(e)}")
+            return self._get_fallback_post(job_title, company_name)
+    
+    async def agenerate_job_post(self, job_title, company_name, job_type, location,
+                                 salary_range=None, requirements=None, benefits=None):
+        """
+        Versión asíncrona de generate_job_post: la espera al modelo no ocupa un hilo
+        
+        Returns:
+            dict: Título y contenido generados
             
-            response = requests.post(
-                self.model_url,
-                json=payload,
-                timeout=90
+        Raises:
+            QueueTimeout: Si no se obtuvo un turno en el servidor de modelos
+        """
+        try:
+            prompt = self._build_job_prompt(
+                job_title, company_name, job_type, location,
+                salary_range, requirements, benefits
             )
             
-            if response.status_code == 200:
-                result = response.json()
-                generated_text = result.get('response', '').strip()
-                
-                # Separar título y contenido
-                lines = generated_text.split('\n', 1)
-                title = lines[0].replace('Título:', '').replace('**', '').strip()
-                content = lines[1].strip() if len(lines) > 1 else generated_text
-                
-                return {
-                    'title': title[:300],  # Límite de Reddit
-                    'content': content
-                }
-            else:
-                logger.error(f"Error en la API: {response.status_code}")
-                return self._get_fallback_post(job_title, company_name)
+            async with self.scheduler.aslot(INTERACTIVE):
+                result = await get_async_llm_client(self.model_url).generate(
+                    prompt,
+                    options=self.JOB_POST_OPTIONS,
+                    timeout=GENERATION_TIMEOUT,
+                    model_name=self.model_name
+                )
+            log_token_usage('job_post', self.model_name, result)
+            return self._parse_job_post(result.get('response', '').strip())
                 
+        except QueueTimeout:
+            # Cola saturada: quien llama responde con el tiempo estimado (no con el respaldo)
+            raise
+        except LLMClientError as e:
+            logger.error(str(e))
+            return self._get_fallback_post(job_title, company_name)
         except Exception as e:
             logger.error(f"Error al generar post: {str(e)}")
             return self._get_fallback_post(job_title, company_name)
     
+    def _parse_job_post(self, generated_text):
+        """Separa título y contenido del texto generado"""
+        lines = generated_text.split('\n', 1)
+        title = lines[0].replace('Título:', '').replace('**', '').strip()
+        content = lines[1].strip() if len(lines) > 1 else generated_text
+        
+        return {
+            'title': title[:300],  # Límite de Reddit
+            'content': content
+        }
+    
     def _build_job_prompt(self, job_title, company_name, job_type, location,
                          salary_range, requirements, benefits):
-        """Construye el prompt para generar el post"""
+        """Construye el prompt para generar el post (cada dato recortado a su tope de tokens)"""
+        job_title, company_name, job_type, location, salary_range = [
+            truncate_to_tokens(value, self.FIELD_MAX_TOKENS) if value else value
+            for value in (job_title, company_name, job_type, location, salary_range)
+        ]
         
         prompt = f"""Eres un experto en reclutamiento y marketing de empleos. Genera un post atractivo para Reddit sobre la siguiente oferta de empleo.
 
@@ -91,13 +159,13 @@ INFORMACIÓN DEL EMPLEO:
         
         if requirements:
             prompt += f"\nREQUISITOS:\n"
-            for req in requirements:
-                prompt += f"- {req}\n"
+            for req in requirements[:self.MAX_LIST_ITEMS]:
+                prompt += f"- {truncate_to_tokens(req, self.ITEM_MAX_TOKENS)}\n"
         
         if benefits:
             prompt += f"\nBENEFICIOS:\n"
-            for benefit in benefits:
-                prompt += f"- {benefit}\n"
+            for benefit in benefits[:self.MAX_LIST_ITEMS]:
+                prompt += f"- {truncate_to_tokens(benefit, self.ITEM_MAX_TOKENS)}\n"
         
         prompt += """
 
@@ -128,9 +196,12 @@ Título: [El título aquí]
             
         Returns:
             dict: Título y contenido generados
+            
+        Raises:
+            QueueTimeout: Si no se obtuvo un turno en el servidor de modelos
         """
         try:
-            prompt = f"""Genera un post para Reddit sobre el siguiente tema: {topic}
+            prompt = f"""Genera un post para Reddit sobre el siguiente tema: {truncate_to_tokens(topic, self.TOPIC_MAX_TOKENS)}
 
 Tono: {tone}
 Longitud: {length}
@@ -143,37 +214,27 @@ Título: [título aquí]
 [contenido aquí]
 """
             
-            payload = {
-                "model": self.model_name,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.8,
-                    "max_tokens": 600
-                }
-            }
+            with self.scheduler.slot(INTERACTIVE):
+                result = self.client.generate(
+                    prompt,
+                    options=self.CUSTOM_POST_OPTIONS,
+                    timeout=GENERATION_TIMEOUT,
+                    model_name=self.model_name
+                )
+            log_token_usage('custom_post', self.model_name, result)
+            generated_text = result.get('response', '').strip()
             
-            response = requests.post(
-                self.model_url,
-                json=payload,
-                timeout=90
-            )
+            lines = generated_text.split('\n', 1)
+            title = lines[0].replace('Título:', '').replace('**', '').strip()
+            content = lines[1].strip() if len(lines) > 1 else generated_text
             
-            if response.status_code == 200:
-                result = response.json()
-                generated_text = result.get('response', '').strip()
-                
-                lines = generated_text.split('\n', 1)
-                title = lines[0].replace('Título:', '').replace('**', '').strip()
-                content = lines[1].strip() if len(lines) > 1 else generated_text
-                
-                return {
-                    'title': title[:300],
-                    'content': content
-                }
-            else:
-                return self._get_fallback_post('Post', 'ACM')
+            return {
+                'title': title[:300],
+                'content': content
+            }
                 
+        except QueueTimeout:
+            raise
         except Exception as e:
             logger.error(f"Error al generar post personalizado: {str(e)}")
             return self._get_fallback_post('Post', 'ACM')
@@ -1,6 +1,13 @@
+from .token_budget import truncate_to_tokens
+
+
 class PromptBuilder:
     """Construye prompts para generar respuestas con diferentes tonos"""
     
+    # Tokens máximos del comentario y del contexto dentro del prompt
+    COMMENT_MAX_TOKENS = 400
+    CONTEXT_MAX_TOKENS = 100
+    
     TONE_PROMPTS = {
         'formal': {
             'system': "Eres un asistente profesional que responde comentarios de manera formal y educada.",
@@ -37,7 +44,13 @@ Genera una respuesta informativa y útil al siguiente comentario.
     @classmethod
     def build_prompt(cls, comment_text, tone='friendly', context=None):
         """
-        Construye el prompt completo para generar una respuesta
+        Construye el prompt completo para generar una respuesta.
+        
+        El system prompt (rol, instrucciones del tono y contexto del post) es
+        idéntico byte a byte para todos los comentarios del mismo post y tono;
+        solo el user prompt cambia. Así el servidor puede reutilizar la caché
+        del prefijo entre comentarios. Comentario y contexto se recortan a
+        COMMENT_MAX_TOKENS y CONTEXT_MAX_TOKENS.
         
         Args:
             comment_text (str): Texto del comentario
@@ -47,20 +60,48 @@ Genera una respuesta informativa y útil al siguiente comentario.
         Returns:
             dict: Diccionario con system prompt y user prompt
         """
+        return {
+            'system': cls.build_system_prompt(tone, context),
+            'user': (
+                f"COMENTARIO A RESPONDER:\n{truncate_to_tokens(comment_text, cls.COMMENT_MAX_TOKENS)}"
+                "\n\nRESPUESTA (máximo 500 caracteres):"
+            )
+        }
+    
+    @classmethod
+    def build_system_prompt(cls, tone='friendly', context=None):
+        """
+        Prefijo estable del prompt: no depende del comentario
+        
+        Args:
+            tone (str): Tono de la respuesta (formal, friendly, informative)
+            context (str, optional): Contexto adicional sobre el post
+            
+        Returns:
+            str: System prompt
+        """
         tone_config = cls.TONE_PROMPTS.get(tone, cls.TONE_PROMPTS['friendly'])
         
-        user_prompt = f"{tone_config['instructions']}\n\n"
+        system_prompt = f"{tone_config['system']}\n{tone_config['instructions']}"
         
         if context:
-            user_prompt += f"CONTEXTO DEL POST: {context}\n\n"
+            system_prompt += f"\nCONTEXTO DEL POST: {truncate_to_tokens(context, cls.CONTEXT_MAX_TOKENS)}\n"
         
-        user_prompt += f"COMENTARIO A RESPONDER:\n{comment_text}\n\n"
-        user_prompt += "RESPUESTA (máximo 500 caracteres):"
+        return system_prompt
+    
+    @classmethod
+    def build_messages(cls, comment_text, tone='friendly', context=None):
+        """
+        Mensajes para /api/chat de Ollama (system + user)
         
-        return {
-            'system': tone_config['system'],
-            'user': user_prompt
-        }
+        Returns:
+            list: [{'role': 'system', ...}, {'role': 'user', ...}]
+        """
+        prompt_data = cls.build_prompt(comment_text, tone, context)
+        return [
+            {'role': 'system', 'content': prompt_data['system']},
+            {'role': 'user', 'content': prompt_data['user']}
+        ]
     
     @classmethod
     def get_available_tones(cls):
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+import logging
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ai:reply'
+STATS_KEYS = ('hits', 'misses')
+
+# Signos que se ignoran al inicio y final del comentario ("¡Gracias!!" == "gracias")
+EDGE_PUNCTUATION = '!¡?¿.,;:…-_~*"\'()[]'
+
+
+def normalize_comment(text):
+    """
+    Normaliza un comentario para que variaciones triviales compartan entrada
+    en la caché (mayúsculas, espacios, signos repetidos o en los extremos)
+
+    Args:
+        text (str): Texto original del comentario
+
+    Returns:
+        str: Texto normalizado
+    """
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    text = re.sub(r'\s+', ' ', text).strip()
+    # "gracias!!!" -> "gracias!", "😂😂😂" -> "😂"
+    text = re.sub(r'([^\w\s])\1+', r'\1', text)
+    stripped = text.strip(EDGE_PUNCTUATION + ' ')
+    # Un comentario solo de signos se conserva tal cual
+    return stripped or text
+
+
+def reply_cache_key(comment_text, tone, context, model_name):
+    """Clave de la respuesta: hash del texto normalizado, tono, contexto y modelo"""
+    material = json.dumps(
+        [normalize_comment(comment_text), tone, context or '', model_name],
+        ensure_ascii=False
+    )
+    return f"{KEY_PREFIX}:{hashlib.sha256(material.encode('utf-8')).hexdigest()}"
+
+
+class ReplyCache:
+    """
+    Caché de respuestas generadas en dos niveles: L1 LRU en memoria del
+    proceso (con TTL corto) y L2 compartida entre workers en Redis
+    """
+
+    def __init__(self, l1_size=None, l1_ttl=None, ttl=None):
+        """
+        Args:
+            l1_size (int, optional): Entradas máximas de la L1 (REPLY_CACHE_L1_SIZE)
+            l1_ttl (float, optional): Segundos de vida en L1 (REPLY_CACHE_L1_TTL)
+            ttl (float, optional): Segundos de vida en Redis (REPLY_CACHE_TTL)
+        """
+        self.l1_size = l1_size or settings.REPLY_CACHE_L1_SIZE
+        self.l1_ttl = l1_ttl or settings.REPLY_CACHE_L1_TTL
+        self.ttl = ttl or settings.REPLY_CACHE_TTL
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Busca una respuesta en L1 y luego en Redis
+
+        Returns:
+            str: Respuesta guardada o None
+        """
+        value = self._l1_get(key)
+
+        if value is None:
+            try:
+                value = cache.get(key)
+            except Exception as e:
+                logger.warning(f"No se pudo leer la respuesta {key}: {str(e)}")
+            if value is not None:
+                self._l1_set(key, value)
+
+        self._count('hits' if value is not None else 'misses')
+        return value
+
+    def set(self, key, value):
+        """Guarda una respuesta en ambos niveles"""
+        self._l1_set(key, value)
+        try:
+            cache.set(key, value, timeout=self.ttl)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar la respuesta {key}: {str(e)}")
+
+    def stats(self):
+        """
+        Contadores compartidos de aciertos y fallos
+
+        Returns:
+            dict: {'hits', 'misses', 'hit_rate', 'l1_entries'}
+        """
+        try:
+            counts = cache.get_many([self._stats_key(name) for name in STATS_KEYS])
+        except Exception as e:
+            logger.warning(f"No se pudieron leer las estadísticas de la caché: {str(e)}")
+            counts = {}
+
+        hits = counts.get(self._stats_key('hits'), 0)
+        misses = counts.get(self._stats_key('misses'), 0)
+        total = hits + misses
+
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total else 0.0,
+            'l1_entries': len(self._l1)
+        }
+
+    def reset_stats(self):
+        try:
+            cache.delete_many([self._stats_key(name) for name in STATS_KEYS])
+        except Exception as e:
+            logger.warning(f"No se pudieron reiniciar las estadísticas de la caché: {str(e)}")
+
+    def clear_l1(self):
+        with self._lock:
+            self._l1.clear()
+
+    def _l1_get(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._l1[key]
+                return None
+
+            self._l1.move_to_end(key)
+            return value
+
+    def _l1_set(self, key, value):
+        with self._lock:
+            self._l1[key] = (time.monotonic() + self.l1_ttl, value)
+            self._l1.move_to_end(key)
+            # Expulsar las entradas menos usadas recientemente
+            while len(self._l1) > self.l1_size:
+                self._l1.popitem(last=False)
+
+    def _stats_key(self, name):
+        return f"{KEY_PREFIX}:stats:{name}"
+
+    def _count(self, name):
+        key = self._stats_key(name)
+        try:
+            cache.add(key, 0, timeout=None)
+            cache.incr(key)
+        except Exception as e:
+            logger.warning(f"No se pudo actualizar el contador {key}: {str(e)}")
+
+
+_reply_cache = None
+_reply_cache_lock = threading.Lock()
+
+
+def get_reply_cache():
+    """
+    Retorna la caché de respuestas compartida del proceso
+
+    Returns:
+        ReplyCache: Caché con L1 en memoria y L2 en Redis
+    """
+    global _reply_cache
+    with _reply_cache_lock:
+        if _reply_cache is None:
+            _reply_cache = ReplyCache()
+        return _reply_cache
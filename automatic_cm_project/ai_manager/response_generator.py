@@ -1,24 +1,53 @@
+import time
+import httpx
 import requests
-import json
 import logging
+from asgiref.sync import sync_to_async
+from .llm_client import get_async_llm_client, get_llm_client, LLMClientError
 from .prompt_builder import PromptBuilder
+from .model_health import get_model_health, record_generation, refresh_model_health
+from .reply_cache import get_reply_cache, reply_cache_key
+from .scheduler import get_scheduler, INTERACTIVE, QueueTimeout
+from .token_budget import log_token_usage
 
 logger = logging.getLogger(__name__)
 
+# Segundos máximos de espera por una respuesta del modelo
+GENERATION_TIMEOUT = 60
+
+
+class GenerationInterrupted(Exception):
+    """El modelo falló después de enviar tokens: el texto parcial no es una respuesta"""
+
+
 class ResponseGenerator:
     """Genera respuestas usando un modelo local de IA (Llama 3)"""
     
-    def __init__(self, model_url="http://localhost:11434/api/generate"):
+    # Ollama ignora "max_tokens": el tope de salida es num_predict. ~200 tokens
+    # alcanzan para los 500 caracteres que pide el prompt; las secuencias de
+    # parada cortan si el modelo empieza a inventar otro comentario.
+    GENERATION_OPTIONS = {
+        "temperature": 0.7,
+        "num_predict": 200,
+        "stop": ["COMENTARIO A RESPONDER:", "\n\n\n"]
+    }
+    
+    def __init__(self, model_url=None, model_name=None):
         """
         Inicializa el generador de respuestas
         
         Args:
-            model_url (str): URL del servidor Ollama local
+            model_url (str, optional): URL base del servidor Ollama (por defecto OLLAMA_BASE_URL)
+            model_name (str, optional): Modelo a usar (por defecto OLLAMA_MODEL)
         """
         self.model_url = model_url
-        self.model_name = "llama3"  # o "llama3.1", "llama3.2" según tu instalación
+        self.client = get_llm_client(model_url)
+        self.model_name = model_name or self.client.model_name
+        self.cache = get_reply_cache()
+        self.scheduler = get_scheduler()
     
-    def generate(self, comment_text, tone='friendly', context=None):
+    def generate(self, comment_text, tone='friendly', context=None, fallback=True, regenerate=False,
+                 priority=INTERACTIVE):
         """
         Genera una respuesta al comentario usando IA
         
@@ -26,55 +55,267 @@ class ResponseGenerator:
             comment_text (str): Texto del comentario
             tone (str): Tono de la respuesta
             context (str, optional): Contexto adicional
+            fallback (bool): Si es False, los errores se propagan en lugar de
+                retornar la respuesta de respaldo
+            regenerate (bool): Ignora la respuesta en caché y genera una nueva
+            priority (str): INTERACTIVE (clic del moderador) o BACKGROUND (lotes)
             
         Returns:
             str: Respuesta generada
+            
+        Raises:
+            QueueTimeout: Si no se obtuvo un turno en el servidor de modelos
         """
+        cache_key = reply_cache_key(comment_text, tone, context, self.model_name)
+        if not regenerate:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         try:
-            # Construir el prompt
-            prompt_data = PromptBuilder.build_prompt(comment_text, tone, context)
-            
-            # Combinar system y user prompt para Ollama
-            full_prompt = f"{prompt_data['system']}\n\n{prompt_data['user']}"
-            
             # Llamar al modelo local
-            payload = {
-                "model": self.model_name,
-                "prompt": full_prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.7,
-                    "max_tokens": 500
-                }
-            }
+            # Espera un turno global en el servidor de modelos según la prioridad
+            with self.scheduler.slot(priority):
+                start = time.perf_counter()
+                result = self.client.chat(
+                    PromptBuilder.build_messages(comment_text, tone, context),
+                    options=self.GENERATION_OPTIONS,
+                    timeout=GENERATION_TIMEOUT,
+                    model_name=self.model_name
+                )
+            generated_text = result.get('message', {}).get('content', '').strip()
+            latency_ms = (time.perf_counter() - start) * 1000
+            log_token_usage('reply', self.model_name, result)
             
-            response = requests.post(
-                self.model_url,
-                json=payload,
-                timeout=60
-            )
+            # Validar que la respuesta no esté vacía
+            if not generated_text:
+                logger.warning("El modelo generó una respuesta vacía")
+                if not fallback:
+                    raise LLMClientError("El modelo generó una respuesta vacía")
+                return self._get_fallback_response(tone)
             
-            if response.status_code == 200:
-                result = response.json()
-                generated_text = result.get('response', '').strip()
-                
-                # Validar que la respuesta no esté vacía
-                if not generated_text:
-                    logger.warning("El modelo generó una respuesta vacía")
-                    return self._get_fallback_response(tone)
+            # Solo se guardan respuestas reales del modelo (nunca las de respaldo)
+            self._remember(cache_key, generated_text, latency_ms)
+            return generated_text
                 
-                return generated_text
-            else:
-                logger.error(f"Error en la API: {response.status_code}")
+        except QueueTimeout:
+            # Cola saturada: quien llama responde con el tiempo estimado (no con el respaldo)
+            raise
+        except requests.exceptions.Timeout:
+            logger.error("Timeout al conectar con el modelo")
+            if not fallback:
+                raise
+            return self._get_fallback_response(tone)
+        except LLMClientError as e:
+            logger.error(str(e))
+            if not fallback:
+                raise
+            return self._get_fallback_response(tone)
+        except Exception as e:
+            logger.error(f"Error al generar respuesta: {str(e)}")
+            if not fallback:
+                raise
+            return self._get_fallback_response(tone)
+    
+    def generate_stream(self, comment_text, tone='friendly', context=None, regenerate=False):
+        """
+        Genera una respuesta al comentario produciendo los tokens a medida
+        que el modelo los genera
+        
+        Args:
+            comment_text (str): Texto del comentario
+            tone (str): Tono de la respuesta
+            context (str, optional): Contexto adicional
+            regenerate (bool): Ignora la respuesta en caché y genera una nueva
+            
+        Yields:
+            str: Fragmentos de la respuesta (o la respuesta de respaldo si falla
+                antes del primer token)
+            
+        Raises:
+            QueueTimeout: Si no se obtuvo un turno en el servidor de modelos
+            GenerationInterrupted: Si falla después de haber enviado tokens
+        """
+        cache_key = reply_cache_key(comment_text, tone, context, self.model_name)
+        if not regenerate:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        
+        tokens = []
+        completed = False
+        ttft_ms = None
+        start = time.perf_counter()
+        try:
+            # El turno se retiene mientras dure el streaming
+            with self.scheduler.slot(INTERACTIVE):
+                for token in self.client.chat_stream(
+                    PromptBuilder.build_messages(comment_text, tone, context),
+                    options=self.GENERATION_OPTIONS,
+                    timeout=GENERATION_TIMEOUT,
+                    model_name=self.model_name,
+                    on_done=lambda chunk: log_token_usage('reply', self.model_name, chunk)
+                ):
+                    if not tokens:
+                        ttft_ms = (time.perf_counter() - start) * 1000
+                        logger.debug(f"Primer token en {ttft_ms:.0f} ms")
+                    tokens.append(token)
+                    yield token
+            completed = True
+        except QueueTimeout:
+            raise
+        except requests.exceptions.Timeout:
+            logger.error("Timeout al conectar con el modelo")
+        except LLMClientError as e:
+            logger.error(str(e))
+        except Exception as e:
+            logger.error(f"Error al generar respuesta: {str(e)}")
+        
+        if tokens and not completed:
+            raise GenerationInterrupted('La generación se interrumpió, intenta de nuevo')
+        
+        generated_text = ''.join(tokens).strip()
+        if completed and generated_text:
+            self._remember(cache_key, generated_text, (time.perf_counter() - start) * 1000, ttft_ms)
+        
+        # Sin tokens (error o respuesta vacía): usar la respuesta de respaldo
+        if not tokens:
+            logger.warning("El modelo no generó tokens, usando respuesta de respaldo")
+            yield self._get_fallback_response(tone)
+    
+    async def agenerate(self, comment_text, tone='friendly', context=None, fallback=True, regenerate=False,
+                        priority=INTERACTIVE):
+        """
+        Versión asíncrona de generate: la espera al modelo no ocupa un hilo
+        
+        Args:
+            comment_text (str): Texto del comentario
+            tone (str): Tono de la respuesta
+            context (str, optional): Contexto adicional
+            fallback (bool): Si es False, los errores se propagan
+            regenerate (bool): Ignora la respuesta en caché y genera una nueva
+            priority (str): INTERACTIVE (clic del moderador) o BACKGROUND (lotes)
+            
+        Returns:
+            str: Respuesta generada
+            
+        Raises:
+            QueueTimeout: Si no se obtuvo un turno en el servidor de modelos
+        """
+        cache_key = reply_cache_key(comment_text, tone, context, self.model_name)
+        if not regenerate:
+            cached = await sync_to_async(self.cache.get)(cache_key)
+            if cached is not None:
+                return cached
+        
+        try:
+            async with self.scheduler.aslot(priority):
+                start = time.perf_counter()
+                result = await get_async_llm_client(self.model_url).chat(
+                    PromptBuilder.build_messages(comment_text, tone, context),
+                    options=self.GENERATION_OPTIONS,
+                    timeout=GENERATION_TIMEOUT,
+                    model_name=self.model_name
+                )
+            generated_text = result.get('message', {}).get('content', '').strip()
+            latency_ms = (time.perf_counter() - start) * 1000
+            log_token_usage('reply', self.model_name, result)
+            
+            if not generated_text:
+                logger.warning("El modelo generó una respuesta vacía")
+                if not fallback:
+                    raise LLMClientError("El modelo generó una respuesta vacía")
                 return self._get_fallback_response(tone)
+            
+            await sync_to_async(self._remember)(cache_key, generated_text, latency_ms)
+            return generated_text
                 
-        except requests.exceptions.Timeout:
+        except QueueTimeout:
+            # Cola saturada: quien llama responde con el tiempo estimado (no con el respaldo)
+            raise
+        except httpx.TimeoutException:
             logger.error("Timeout al conectar con el modelo")
+            if not fallback:
+                raise
+            return self._get_fallback_response(tone)
+        except LLMClientError as e:
+            logger.error(str(e))
+            if not fallback:
+                raise
             return self._get_fallback_response(tone)
         except Exception as e:
             logger.error(f"Error al generar respuesta: {str(e)}")
+            if not fallback:
+                raise
             return self._get_fallback_response(tone)
     
+    async def agenerate_stream(self, comment_text, tone='friendly', context=None, regenerate=False):
+        """
+        Versión asíncrona de generate_stream
+        
+        Yields:
+            str: Fragmentos de la respuesta (o la respuesta de respaldo si falla
+                antes del primer token)
+            
+        Raises:
+            QueueTimeout: Si no se obtuvo un turno en el servidor de modelos
+            GenerationInterrupted: Si falla después de haber enviado tokens
+        """
+        cache_key = reply_cache_key(comment_text, tone, context, self.model_name)
+        if not regenerate:
+            cached = await sync_to_async(self.cache.get)(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        
+        tokens = []
+        completed = False
+        ttft_ms = None
+        start = time.perf_counter()
+        try:
+            async with self.scheduler.aslot(INTERACTIVE):
+                async for token in get_async_llm_client(self.model_url).chat_stream(
+                    PromptBuilder.build_messages(comment_text, tone, context),
+                    options=self.GENERATION_OPTIONS,
+                    timeout=GENERATION_TIMEOUT,
+                    model_name=self.model_name,
+                    on_done=lambda chunk: log_token_usage('reply', self.model_name, chunk)
+                ):
+                    if not tokens:
+                        ttft_ms = (time.perf_counter() - start) * 1000
+                        logger.debug(f"Primer token en {ttft_ms:.0f} ms")
+                    tokens.append(token)
+                    yield token
+            completed = True
+        except QueueTimeout:
+            raise
+        except httpx.TimeoutException:
+            logger.error("Timeout al conectar con el modelo")
+        except LLMClientError as e:
+            logger.error(str(e))
+        except Exception as e:
+            logger.error(f"Error al generar respuesta: {str(e)}")
+        
+        if tokens and not completed:
+            raise GenerationInterrupted('La generación se interrumpió, intenta de nuevo')
+        
+        generated_text = ''.join(tokens).strip()
+        if completed and generated_text:
+            await sync_to_async(self._remember)(
+                cache_key, generated_text, (time.perf_counter() - start) * 1000, ttft_ms
+            )
+        
+        # Sin tokens (error o respuesta vacía): usar la respuesta de respaldo
+        if not tokens:
+            logger.warning("El modelo no generó tokens, usando respuesta de respaldo")
+            yield self._get_fallback_response(tone)
+    
+    def _remember(self, cache_key, generated_text, latency_ms, ttft_ms=None):
+        """Guarda la respuesta en caché y registra la latencia observada"""
+        self.cache.set(cache_key, generated_text)
+        record_generation(self.model_name, latency_ms=latency_ms, ttft_ms=ttft_ms)
+    
     def _get_fallback_response(self, tone):
         """Respuesta de respaldo si falla la IA"""
         fallbacks = {
@@ -86,18 +327,14 @@ class ResponseGenerator:
     
     def test_connection(self):
         """
-        Prueba la conexión con el modelo local
+        Indica si el servidor de modelos está disponible, según el estado en
+        caché (lo actualizan las generaciones y el ping de keep-alive). Solo
+        consulta a Ollama si todavía no hay estado registrado.
         
         Returns:
             bool: True si la conexión es exitosa
         """
-        try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=5)
-            if response.status_code == 200:
-                models = response.json().get('models', [])
-                logger.info(f"Modelos disponibles: {[m['name'] for m in models]}")
-                return True
-            return False
-        except Exception as e:
-            logger.error(f"Error al conectar con Ollama: {str(e)}")
-            return False
\ No newline at end of file
+        health = get_model_health()
+        if not any(state.get('checked_at') or state.get('last_used') for state in health['models']):
+            health = refresh_model_health()
+        return health['available']
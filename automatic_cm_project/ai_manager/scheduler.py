@@ -0,0 +1,269 @@
+import math
+import time
+import uuid
+import asyncio
+import logging
+from contextlib import asynccontextmanager, contextmanager
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ai:sched'
+
+# Clases de prioridad: clics en "generar" frente a borradores en lote
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+# Duración estimada de una generación mientras no hay mediciones
+DEFAULT_SERVICE_MS = 5000
+
+# Peso de la última generación en el promedio móvil de duración
+SERVICE_EWMA_ALPHA = 0.2
+
+POLL_INTERVAL = 0.05
+
+
+class QueueTimeout(Exception):
+    """No se obtuvo un turno en el servidor de modelos a tiempo"""
+
+    def __init__(self, message, eta_seconds):
+        """
+        Args:
+            message (str): Causa del error
+            eta_seconds (int): Segundos estimados hasta que haya un turno
+        """
+        super().__init__(message)
+        self.eta_seconds = eta_seconds
+
+
+class GenerationScheduler:
+    """
+    Turnos de generación contra el servidor de modelos, compartidos por
+    todos los procesos a través de la caché (Redis).
+
+    - Hay LLM_MAX_CONCURRENCY turnos globales (claves con lease; si un
+      worker muere, su turno expira solo).
+    - Las generaciones en segundo plano no usan los
+      LLM_INTERACTIVE_RESERVED_SLOTS turnos reservados ni toman un turno
+      mientras haya generaciones interactivas esperando.
+    - Con más de LLM_MAX_INTERACTIVE_QUEUE interactivas en espera las
+      nuevas se rechazan con un tiempo estimado (admit).
+    """
+
+    def __init__(self, max_concurrency=None, reserved_slots=None, max_queue=None, lease=None):
+        """
+        Args:
+            max_concurrency (int, optional): Generaciones simultáneas (LLM_MAX_CONCURRENCY)
+            reserved_slots (int, optional): Turnos solo para interactivas (LLM_INTERACTIVE_RESERVED_SLOTS)
+            max_queue (int, optional): Interactivas en espera admitidas (LLM_MAX_INTERACTIVE_QUEUE)
+            lease (int, optional): Segundos máximos que se retiene un turno (LLM_SLOT_LEASE)
+        """
+        self.max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        reserved = settings.LLM_INTERACTIVE_RESERVED_SLOTS if reserved_slots is None else reserved_slots
+        self.background_slots = max(1, self.max_concurrency - reserved)
+        self.max_queue = max_queue or settings.LLM_MAX_INTERACTIVE_QUEUE
+        self.lease = lease or settings.LLM_SLOT_LEASE
+        self.timeouts = {
+            INTERACTIVE: settings.LLM_INTERACTIVE_QUEUE_TIMEOUT,
+            BACKGROUND: settings.LLM_BACKGROUND_QUEUE_TIMEOUT,
+        }
+
+    def _slot_key(self, index):
+        return f"{KEY_PREFIX}:slot:{index}"
+
+    def _waiting_key(self, priority):
+        return f"{KEY_PREFIX}:waiting:{priority}"
+
+    def _service_key(self):
+        return f"{KEY_PREFIX}:service_ms"
+
+    def _slots_for(self, priority):
+        return range(self.max_concurrency if priority == INTERACTIVE else self.background_slots)
+
+    def stats(self):
+        """
+        Estado actual de la cola
+
+        Returns:
+            dict: {'running', 'waiting_interactive', 'waiting_background', 'service_ms'}
+        """
+        keys = [self._slot_key(i) for i in range(self.max_concurrency)]
+        keys += [self._waiting_key(INTERACTIVE), self._waiting_key(BACKGROUND), self._service_key()]
+        try:
+            values = cache.get_many(keys)
+        except Exception as e:
+            logger.warning(f"No se pudo leer el estado de la cola: {str(e)}")
+            values = {}
+
+        return {
+            'running': sum(1 for i in range(self.max_concurrency) if values.get(self._slot_key(i))),
+            'waiting_interactive': max(0, values.get(self._waiting_key(INTERACTIVE), 0)),
+            'waiting_background': max(0, values.get(self._waiting_key(BACKGROUND), 0)),
+            'service_ms': values.get(self._service_key()) or DEFAULT_SERVICE_MS,
+        }
+
+    def estimate_wait(self, ahead, stats=None):
+        """
+        Segundos estimados hasta que termine una generación con `ahead`
+        generaciones delante
+
+        Returns:
+            int: Segundos (redondeado hacia arriba)
+        """
+        stats = stats or self.stats()
+        rounds = math.ceil((ahead + 1) / self.max_concurrency)
+        return math.ceil(rounds * stats['service_ms'] / 1000)
+
+    def estimate_batch(self, count):
+        """
+        Segundos estimados para `count` generaciones en segundo plano, que
+        solo usan los turnos no reservados
+
+        Returns:
+            int: Segundos (redondeado hacia arriba)
+        """
+        rounds = math.ceil(count / self.background_slots)
+        return math.ceil(rounds * self.stats()['service_ms'] / 1000)
+
+    def admit(self, priority=INTERACTIVE):
+        """
+        Control de admisión: decide si una generación nueva entra en la cola
+
+        Returns:
+            dict: {'admitted': bool, 'waiting': int, 'eta_seconds': int}
+        """
+        stats = self.stats()
+        if priority == INTERACTIVE:
+            waiting = stats['waiting_interactive']
+            admitted = waiting < self.max_queue
+        else:
+            waiting = stats['waiting_interactive'] + stats['waiting_background']
+            admitted = True
+
+        return {
+            'admitted': admitted,
+            'waiting': waiting,
+            'eta_seconds': self.estimate_wait(waiting + stats['running'], stats),
+        }
+
+    def try_acquire(self, priority):
+        """
+        Intenta tomar un turno sin esperar
+
+        Returns:
+            tuple: (clave del turno, token) o None si no hay turno libre
+        """
+        if priority == BACKGROUND and self.stats()['waiting_interactive'] > 0:
+            return None
+
+        token = uuid.uuid4().hex
+        for index in self._slots_for(priority):
+            key = self._slot_key(index)
+            try:
+                if cache.add(key, token, timeout=self.lease):
+                    return key, token
+            except Exception as e:
+                # Sin caché no hay coordinación: se permite la generación
+                logger.warning(f"No se pudo reservar el turno {key}: {str(e)}")
+                return None, token
+        return None
+
+    def release(self, slot, duration_ms=None):
+        """
+        Libera un turno y actualiza la duración promedio de las generaciones
+
+        Args:
+            slot (tuple): Valor retornado por try_acquire
+            duration_ms (float, optional): Duración de la generación
+        """
+        key, token = slot
+        try:
+            if key and cache.get(key) == token:
+                cache.delete(key)
+            if duration_ms is not None:
+                previous = cache.get(self._service_key()) or duration_ms
+                average = SERVICE_EWMA_ALPHA * duration_ms + (1 - SERVICE_EWMA_ALPHA) * previous
+                cache.set(self._service_key(), round(average), timeout=None)
+        except Exception as e:
+            logger.warning(f"No se pudo liberar el turno {key}: {str(e)}")
+
+    def _update_waiting(self, priority, delta):
+        key = self._waiting_key(priority)
+        try:
+            # El contador expira si nadie lo actualiza (un worker que murió esperando)
+            cache.add(key, 0, timeout=self.timeouts[priority] * 2)
+            cache.incr(key, delta)
+            cache.touch(key, self.timeouts[priority] * 2)
+        except Exception as e:
+            logger.warning(f"No se pudo actualizar la cola {key}: {str(e)}")
+
+    @contextmanager
+    def slot(self, priority=INTERACTIVE, timeout=None):
+        """
+        Espera un turno y lo retiene durante el bloque
+
+        Raises:
+            QueueTimeout: Si no hay turno libre en `timeout` segundos
+        """
+        timeout = self.timeouts[priority] if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        acquired = self.try_acquire(priority)
+        if acquired is None:
+            self._update_waiting(priority, 1)
+            try:
+                while acquired is None:
+                    if time.monotonic() >= deadline:
+                        raise QueueTimeout(
+                            f"Sin turno en el servidor de modelos tras {timeout} s ({priority})",
+                            self.admit(priority)['eta_seconds']
+                        )
+                    time.sleep(POLL_INTERVAL)
+                    acquired = self.try_acquire(priority)
+            finally:
+                self._update_waiting(priority, -1)
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(acquired, (time.perf_counter() - start) * 1000)
+
+    @asynccontextmanager
+    async def aslot(self, priority=INTERACTIVE, timeout=None):
+        """Versión asíncrona de slot: la espera no ocupa un hilo"""
+        timeout = self.timeouts[priority] if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        acquired = await sync_to_async(self.try_acquire)(priority)
+        if acquired is None:
+            await sync_to_async(self._update_waiting)(priority, 1)
+            try:
+                while acquired is None:
+                    if time.monotonic() >= deadline:
+                        admission = await sync_to_async(self.admit)(priority)
+                        raise QueueTimeout(
+                            f"Sin turno en el servidor de modelos tras {timeout} s ({priority})",
+                            admission['eta_seconds']
+                        )
+                    await asyncio.sleep(POLL_INTERVAL)
+                    acquired = await sync_to_async(self.try_acquire)(priority)
+            finally:
+                await sync_to_async(self._update_waiting)(priority, -1)
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            await sync_to_async(self.release)(acquired, (time.perf_counter() - start) * 1000)
+
+
+def get_scheduler():
+    """
+    Planificador de generaciones (el estado vive en la caché, por lo que
+    todas las instancias lo comparten)
+
+    Returns:
+        GenerationScheduler
+    """
+    return GenerationScheduler()
@@ -0,0 +1,14 @@
+from celery import shared_task
+from .model_health import keep_alive_ping, warm_up_models
+
+
+@shared_task
+def keep_models_alive():
+    """Ping periódico (CELERY_BEAT_SCHEDULE): mantiene el modelo cargado si hay tráfico"""
+    return keep_alive_ping()
+
+
+@shared_task
+def warm_up_models_task():
+    """Precarga los modelos configurados"""
+    return warm_up_models()
@@ -1,3 +1,474 @@
-from django.test import TestCase
+import json
+import threading
+import time
+import httpx
+import requests
+from unittest.mock import MagicMock, patch
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from . import circuit_breaker, llm_client, model_health, reply_cache, scheduler
+from .post_generator import PostGenerator
+from .prompt_builder import PromptBuilder
+from .response_generator import GenerationInterrupted, ResponseGenerator
+from .token_budget import estimate_tokens, truncate_to_tokens
 
-# Create your tests here.
+
+def ok_response(payload):
+    response = MagicMock(status_code=200)
+    response.json.return_value = payload
+    return response
+
+
+LOCMEM_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+}
+
+
+@override_settings(OLLAMA_BASE_URL='http://modelos:8080', OLLAMA_MODEL='llama3.2', CACHES=LOCMEM_CACHE)
+class LLMClientTests(SimpleTestCase):
+    def setUp(self):
+        llm_client._clients.clear()
+        reply_cache._reply_cache = None
+        cache.clear()
+
+    def test_generators_share_one_pooled_session(self):
+        responses, posts = ResponseGenerator(), PostGenerator()
+
+        self.assertIs(responses.client, posts.client)
+        self.assertEqual(responses.model_name, 'llama3.2')
+
+    def test_generate_uses_configured_server_and_timeouts(self):
+        generator = ResponseGenerator()
+        with patch.object(generator.client.session, 'post',
+                          return_value=ok_response({'message': {'content': ' Hola '}})) as post:
+            self.assertEqual(generator.generate('gracias!'), 'Hola')
+
+        url = post.call_args.args[0]
+        self.assertEqual(url, 'http://modelos:8080/api/chat')
+        self.assertEqual(post.call_args.kwargs['json']['model'], 'llama3.2')
+        self.assertEqual(post.call_args.kwargs['json']['keep_alive'], '30m')
+        self.assertEqual(post.call_args.kwargs['timeout'], (3, 60))
+
+    def test_http_error_returns_fallback(self):
+        generator = ResponseGenerator()
+        with patch.object(generator.client.session, 'post', return_value=MagicMock(status_code=500)):
+            text = generator.generate('gracias!', tone='formal')
+
+        self.assertEqual(text, generator._get_fallback_response('formal'))
+
+    def test_connection_uses_base_url(self):
+        generator = ResponseGenerator()
+        with patch.object(generator.client.session, 'get',
+                          return_value=ok_response({'models': [{'name': 'llama3.2:latest'}]})) as get:
+            self.assertTrue(generator.test_connection())
+            # El segundo chequeo se responde desde la caché
+            self.assertTrue(generator.test_connection())
+
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(get.call_args.args[0], 'http://modelos:8080/api/ps')
+
+    def test_generate_stream_yields_tokens(self):
+        lines = [b'{"message": {"content": "Hola"}, "done": false}', b'',
+                 b'{"message": {"content": " amigo"}, "done": false}',
+                 b'{"message": {"content": ""}, "done": true}']
+        stream = MagicMock(status_code=200)
+        stream.iter_lines.return_value = lines
+        stream.__enter__.return_value = stream
+
+        generator = ResponseGenerator()
+        with patch.object(generator.client.session, 'post', return_value=stream) as post:
+            tokens = list(generator.generate_stream('gracias!'))
+
+        self.assertEqual(tokens, ['Hola', ' amigo'])
+        self.assertTrue(post.call_args.kwargs['stream'])
+        self.assertTrue(post.call_args.kwargs['json']['stream'])
+
+    def test_generate_stream_falls_back_without_tokens(self):
+        error = MagicMock(status_code=500)
+        error.__enter__.return_value = error
+
+        generator = ResponseGenerator()
+        with patch.object(generator.client.session, 'post', return_value=error):
+            tokens = list(generator.generate_stream('gracias!', tone='formal'))
+
+        self.assertEqual(tokens, [generator._get_fallback_response('formal')])
+
+    def test_generate_stream_cut_midway_is_not_a_response(self):
+        def lines():
+            yield b'{"message": {"content": "Hola"}, "done": false}'
+            raise requests.exceptions.ConnectionError('conexión cortada')
+
+        stream = MagicMock(status_code=200)
+        stream.iter_lines.return_value = lines()
+        stream.__enter__.return_value = stream
+
+        generator = ResponseGenerator()
+        tokens = []
+        with patch.object(generator.client.session, 'post', return_value=stream):
+            with self.assertRaises(GenerationInterrupted):
+                for token in generator.generate_stream('gracias!'):
+                    tokens.append(token)
+
+        # Ni respuesta de respaldo ni texto parcial en la caché de respuestas
+        self.assertEqual(tokens, ['Hola'])
+        self.assertIsNone(generator.cache.get(
+            reply_cache.reply_cache_key('gracias!', 'friendly', None, generator.model_name)
+        ))
+
+    def test_queue_timeout_is_not_replaced_by_fallback(self):
+        generator = ResponseGenerator()
+        timeout = scheduler.QueueTimeout('cola llena', 12)
+        with patch.object(generator.scheduler, 'slot', side_effect=timeout):
+            with self.assertRaises(scheduler.QueueTimeout):
+                generator.generate('gracias!')
+            with self.assertRaises(scheduler.QueueTimeout):
+                list(generator.generate_stream('gracias!'))
+        posts = PostGenerator()
+        with patch.object(posts.scheduler, 'slot', side_effect=timeout):
+            with self.assertRaises(scheduler.QueueTimeout):
+                posts.generate_job_post('Dev', 'ACM', 'Remoto', 'Lima')
+
+    def test_output_is_capped_and_token_usage_logged(self):
+        generator = ResponseGenerator()
+        result = {'message': {'content': 'Hola'}, 'prompt_eval_count': 120, 'eval_count': 8}
+        with patch.object(generator.client.session, 'post', return_value=ok_response(result)) as post:
+            with self.assertLogs('ai_manager.token_budget', level='INFO') as logs:
+                generator.generate('gracias!')
+
+        options = post.call_args.kwargs['json']['options']
+        self.assertNotIn('max_tokens', options)
+        self.assertEqual(options['num_predict'], 200)
+        self.assertIn('COMENTARIO A RESPONDER:', options['stop'])
+        self.assertIn('prompt=120 salida=8', logs.output[0])
+
+    def test_job_post_uses_num_predict(self):
+        generator = PostGenerator()
+        result = {'response': 'Título: Dev\nContenido', 'done_reason': 'length'}
+        with patch.object(generator.client.session, 'post', return_value=ok_response(result)) as post:
+            with self.assertLogs('ai_manager.token_budget', level='WARNING'):
+                post_data = generator.generate_job_post('Dev', 'ACM', 'Remoto', 'Medellín')
+
+        self.assertEqual(post_data['title'], 'Dev')
+        self.assertEqual(post.call_args.kwargs['json']['options']['num_predict'], 700)
+
+
+@override_settings(OLLAMA_BASE_URL='http://modelos:8080', OLLAMA_MODEL='llama3.2', CACHES=LOCMEM_CACHE)
+class AsyncLLMClientTests(SimpleTestCase):
+    def setUp(self):
+        reply_cache._reply_cache = None
+        cache.clear()
+
+    def mock_server(self, client, handler):
+        client.http = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+
+    async def test_agenerate_uses_async_chat(self):
+        requests_seen = []
+
+        def handler(request):
+            requests_seen.append(request)
+            return httpx.Response(200, json={'message': {'content': ' Hola '}})
+
+        generator = ResponseGenerator()
+        self.mock_server(llm_client.get_async_llm_client(), handler)
+
+        self.assertEqual(await generator.agenerate('gracias!'), 'Hola')
+        self.assertEqual(str(requests_seen[0].url), 'http://modelos:8080/api/chat')
+        self.assertEqual(json.loads(requests_seen[0].content)['model'], 'llama3.2')
+
+    async def test_agenerate_stream_yields_tokens(self):
+        body = b'{"message": {"content": "Hola"}}\n{"message": {"content": " amigo"}}\n{"done": true}\n'
+        generator = ResponseGenerator()
+        self.mock_server(llm_client.get_async_llm_client(), lambda request: httpx.Response(200, content=body))
+
+        tokens = [token async for token in generator.agenerate_stream('gracias!')]
+        self.assertEqual(tokens, ['Hola', ' amigo'])
+
+    async def test_agenerate_stream_cut_midway_raises(self):
+        async def body():
+            yield b'{"message": {"content": "Hola"}}\n'
+            raise httpx.ReadError('conexión cortada')
+
+        generator = ResponseGenerator()
+        self.mock_server(llm_client.get_async_llm_client(), lambda request: httpx.Response(200, content=body()))
+
+        tokens = []
+        with self.assertRaises(GenerationInterrupted):
+            async for token in generator.agenerate_stream('gracias!'):
+                tokens.append(token)
+        self.assertEqual(tokens, ['Hola'])
+
+    async def test_agenerate_http_error_returns_fallback(self):
+        generator = ResponseGenerator()
+        self.mock_server(llm_client.get_async_llm_client(), lambda request: httpx.Response(500))
+
+        text = await generator.agenerate('gracias!', tone='formal')
+        self.assertEqual(text, generator._get_fallback_response('formal'))
+
+
+@override_settings(OLLAMA_BASE_URL='http://modelos:8080', CACHES=LOCMEM_CACHE,
+                   LLM_BREAKER_FAILURE_THRESHOLD=3, LLM_BREAKER_OPEN_SECONDS=30)
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        llm_client._clients.clear()
+        reply_cache._reply_cache = None
+        cache.clear()
+
+    def test_opens_after_repeated_failures_and_fails_fast(self):
+        generator = ResponseGenerator()
+        with patch.object(generator.client.session, 'post', return_value=MagicMock(status_code=503)) as post:
+            for i in range(5):
+                text = generator.generate(f'comentario {i}', tone='formal')
+                self.assertEqual(text, generator._get_fallback_response('formal'))
+
+        # Tras 3 fallos el resto de llamadas no llegan al servidor
+        self.assertEqual(post.call_count, 3)
+        self.assertEqual(generator.client.breaker.state()['state'], circuit_breaker.OPEN)
+        self.assertFalse(model_health.get_model_health()['available'])
+
+    def test_half_open_sends_one_probe_and_closes_on_success(self):
+        breaker = circuit_breaker.get_circuit_breaker()
+        breaker.open('Error en la API: 503')
+
+        with patch.object(circuit_breaker.time, 'time', return_value=time.time() + 31):
+            self.assertEqual(breaker.state()['state'], circuit_breaker.HALF_OPEN)
+            probe = breaker.before_call()
+            # Otro worker no obtiene la prueba mientras está en curso
+            with self.assertRaises(circuit_breaker.CircuitOpenError):
+                breaker.before_call()
+            breaker.record_success(latency_ms=200, probe=probe)
+
+        self.assertEqual(breaker.state()['state'], circuit_breaker.CLOSED)
+
+    def test_failed_probe_reopens_circuit(self):
+        breaker = circuit_breaker.get_circuit_breaker()
+        breaker.open('timeout')
+
+        later = time.time() + 31
+        with patch.object(circuit_breaker.time, 'time', return_value=later):
+            probe = breaker.before_call()
+            breaker.record_failure(f"llamada lenta ({settings.LLM_BREAKER_SLOW_CALL_MS + 1} ms)", probe=probe)
+            self.assertEqual(breaker.state()['state'], circuit_breaker.OPEN)
+            self.assertEqual(breaker.state()['retry_at'], later + 30)
+
+    def test_stale_in_flight_calls_do_not_decide_half_open(self):
+        breaker = circuit_breaker.get_circuit_breaker()
+        # Llamada autorizada con el circuito cerrado, todavía en curso
+        stale = breaker.before_call()
+        breaker.open('Error en la API: 503')
+
+        with patch.object(circuit_breaker.time, 'time', return_value=time.time() + 31):
+            probe = breaker.before_call()
+            # Termina la llamada vieja: ni cierra ni reabre el circuito
+            breaker.record_success(latency_ms=200, probe=stale)
+            self.assertEqual(breaker.state()['state'], circuit_breaker.HALF_OPEN)
+            breaker.record_failure('Error en la API: 503', probe=stale)
+            self.assertEqual(breaker.state()['state'], circuit_breaker.HALF_OPEN)
+            with self.assertRaises(circuit_breaker.CircuitOpenError):
+                breaker.before_call()
+
+            breaker.record_success(latency_ms=200, probe=probe)
+
+        self.assertEqual(breaker.state()['state'], circuit_breaker.CLOSED)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, LLM_MAX_CONCURRENCY=2, LLM_INTERACTIVE_RESERVED_SLOTS=1,
+                   LLM_MAX_INTERACTIVE_QUEUE=2)
+class GenerationSchedulerTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.scheduler = scheduler.get_scheduler()
+
+    def test_background_never_takes_reserved_slot(self):
+        with self.scheduler.slot(scheduler.BACKGROUND):
+            with self.assertRaises(scheduler.QueueTimeout) as raised:
+                with self.scheduler.slot(scheduler.BACKGROUND, timeout=0.1):
+                    pass
+            self.assertGreater(raised.exception.eta_seconds, 0)
+            # El turno reservado sigue libre para un clic interactivo
+            with self.scheduler.slot(scheduler.INTERACTIVE, timeout=0):
+                self.assertEqual(self.scheduler.stats()['running'], 2)
+
+        self.assertEqual(self.scheduler.stats()['running'], 0)
+
+    def test_background_yields_to_waiting_interactive(self):
+        self.scheduler._update_waiting(scheduler.INTERACTIVE, 1)
+
+        self.assertIsNone(self.scheduler.try_acquire(scheduler.BACKGROUND))
+        self.assertIsNotNone(self.scheduler.try_acquire(scheduler.INTERACTIVE))
+
+    def test_interactive_latency_flat_during_background_batch(self):
+        stop = threading.Event()
+
+        def background_worker():
+            while not stop.is_set():
+                with self.scheduler.slot(scheduler.BACKGROUND, timeout=5):
+                    time.sleep(0.2)
+
+        workers = [threading.Thread(target=background_worker) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        try:
+            waits = []
+            for _ in range(5):
+                start = time.perf_counter()
+                with self.scheduler.slot(scheduler.INTERACTIVE, timeout=5):
+                    waits.append(time.perf_counter() - start)
+                time.sleep(0.05)
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.join()
+
+        # Nunca espera a que termine una generación del lote (0.2 s)
+        self.assertLess(max(waits), 0.1)
+
+    def test_admission_rejects_full_queue_with_eta(self):
+        cache.set('ai:sched:service_ms', 4000)
+        self.assertTrue(self.scheduler.admit()['admitted'])
+
+        self.scheduler._update_waiting(scheduler.INTERACTIVE, 2)
+        admission = self.scheduler.admit()
+
+        self.assertFalse(admission['admitted'])
+        # 2 en espera + esta: 2 rondas de 4 s con 2 turnos
+        self.assertEqual(admission['eta_seconds'], 8)
+
+class PromptBuilderTests(SimpleTestCase):
+    def test_system_prefix_is_stable_across_comments(self):
+        first = PromptBuilder.build_messages('¿Siguen abiertas?', 'formal', 'Post: Vacantes')
+        second = PromptBuilder.build_messages('Gracias!', 'formal', 'Post: Vacantes')
+
+        self.assertEqual(first[0], second[0])
+        self.assertEqual(first[0]['role'], 'system')
+        self.assertIn('CONTEXTO DEL POST: Post: Vacantes', first[0]['content'])
+        self.assertNotIn('Gracias!', second[0]['content'])
+        self.assertIn('Gracias!', second[1]['content'])
+
+    def test_long_input_is_truncated(self):
+        comment = 'palabra ' * 2000
+        system, user = PromptBuilder.build_messages(comment, 'friendly', 'Post: ' + 'título ' * 500)
+
+        self.assertLessEqual(estimate_tokens(user['content']), PromptBuilder.COMMENT_MAX_TOKENS + 20)
+        self.assertIn('…\n\nRESPUESTA', user['content'])
+        self.assertLess(len(system['content']), 1200)
+        # Un comentario corto se envía intacto
+        self.assertEqual(truncate_to_tokens('Hola!', 10), 'Hola!')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ReplyCacheTests(SimpleTestCase):
+    def setUp(self):
+        llm_client._clients.clear()
+        reply_cache._reply_cache = None
+        cache.clear()
+
+    def test_trivial_variations_share_key(self):
+        key = reply_cache.reply_cache_key('¡Gracias!!!', 'friendly', 'Post: A', 'llama3')
+
+        self.assertEqual(key, reply_cache.reply_cache_key('  gracias ', 'friendly', 'Post: A', 'llama3'))
+        self.assertNotEqual(key, reply_cache.reply_cache_key('gracias', 'formal', 'Post: A', 'llama3'))
+        self.assertNotEqual(key, reply_cache.reply_cache_key('gracias', 'friendly', 'Post: A', 'otro'))
+        self.assertEqual(reply_cache.normalize_comment('😂😂😂'), '😂')
+
+    def test_hit_skips_model_and_regenerate_refreshes(self):
+        generator = ResponseGenerator()
+        with patch.object(generator.client.session, 'post',
+                          return_value=ok_response({'message': {'content': 'Con gusto'}})) as post:
+            self.assertEqual(generator.generate('gracias!'), 'Con gusto')
+            self.assertEqual(generator.generate('Gracias'), 'Con gusto')
+            self.assertEqual(post.call_count, 1)
+
+            post.return_value = ok_response({'message': {'content': 'A ti'}})
+            self.assertEqual(generator.generate('gracias', regenerate=True), 'A ti')
+            self.assertEqual(post.call_count, 2)
+
+        stats = generator.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_fallback_is_not_cached(self):
+        generator = ResponseGenerator()
+        with patch.object(generator.client.session, 'post', return_value=MagicMock(status_code=500)) as post:
+            generator.generate('gracias!')
+            generator.generate('gracias!')
+
+        self.assertEqual(post.call_count, 2)
+
+    def test_l1_evicts_least_recently_used(self):
+        l1 = reply_cache.ReplyCache(l1_size=2, l1_ttl=60, ttl=60)
+        l1.set('a', '1')
+        l1.set('b', '2')
+        l1.get('a')
+        l1.set('c', '3')
+
+        self.assertEqual(list(l1._l1), ['a', 'c'])
+
+    def test_redis_level_is_shared_between_processes(self):
+        worker = reply_cache.ReplyCache(l1_size=10, l1_ttl=60, ttl=60)
+        worker.set('clave', 'hola')
+
+        other_worker = reply_cache.ReplyCache(l1_size=10, l1_ttl=60, ttl=60)
+        self.assertEqual(other_worker.get('clave'), 'hola')
+
+
+@override_settings(
+    OLLAMA_BASE_URL='http://modelos:8080', OLLAMA_MODEL='llama3.2',
+    OLLAMA_WARMUP_MODELS=['llama3.2'], CACHES=LOCMEM_CACHE
+)
+class ModelHealthTests(TestCase):
+    def setUp(self):
+        llm_client._clients.clear()
+        reply_cache._reply_cache = None
+        cache.clear()
+
+    def login_staff(self):
+        self.client.force_login(User.objects.create_user('ops', password='x', is_staff=True))
+
+    def test_health_requires_staff(self):
+        self.assertEqual(self.client.get('/ai/health/').status_code, 302)
+
+        self.client.force_login(User.objects.create_user('cm', password='x'))
+        self.assertEqual(self.client.get('/ai/health/').status_code, 302)
+
+    def test_generation_updates_cached_health(self):
+        generator = ResponseGenerator()
+        with patch.object(generator.client.session, 'post',
+                          return_value=ok_response({'message': {'content': 'Hola'}})):
+            generator.generate('gracias!')
+
+        self.login_staff()
+        with patch.object(generator.client.session, 'get') as get:
+            response = self.client.get('/ai/health/')
+
+        get.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        state = response.json()['models'][0]
+        self.assertTrue(state['loaded'])
+        self.assertIn('latency_ms', state)
+
+    def test_health_reports_unavailable_server(self):
+        client = llm_client.get_llm_client()
+        with patch.object(client.session, 'get', side_effect=ConnectionError('caído')):
+            model_health.refresh_model_health()
+
+        self.login_staff()
+        response = self.client.get('/ai/health/')
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()['models'][0]['loaded'])
+
+    def test_keep_alive_only_pings_with_recent_traffic(self):
+        client = llm_client.get_llm_client()
+        ps = ok_response({'models': []})
+        with patch.object(client.session, 'post', return_value=ok_response({})) as post, \
+                patch.object(client.session, 'get', return_value=ps):
+            self.assertFalse(model_health.keep_alive_ping())
+            post.assert_not_called()
+
+            model_health.record_generation('llama3.2', latency_ms=120)
+            self.assertTrue(model_health.keep_alive_ping())
+
+        payload = post.call_args.kwargs['json']
+        self.assertEqual(payload['model'], 'llama3.2')
+        self.assertNotIn('prompt', payload)
@@ -0,0 +1,74 @@
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Caracteres por token aproximados de Llama 3 en español (conservador: en
+# inglés suele ser ~4). Sin tokenizador local basta para acotar la entrada.
+CHARS_PER_TOKEN = 3.5
+
+TRUNCATION_MARK = '…'
+
+
+def estimate_tokens(text):
+    """
+    Estimación de los tokens que ocupa un texto en el prompt
+
+    Args:
+        text (str): Texto a medir
+
+    Returns:
+        int: Tokens aproximados
+    """
+    return math.ceil(len(text or '') / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    Recorta un texto para que no supere max_tokens, cortando en el último
+    espacio para no partir palabras
+
+    Args:
+        text (str): Texto original
+        max_tokens (int): Tokens máximos permitidos
+
+    Returns:
+        str: El mismo texto si cabe; si no, el inicio terminado en '…'
+    """
+    text = text or ''
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    limit = int(max_tokens * CHARS_PER_TOKEN) - len(TRUNCATION_MARK)
+    cut = text[:limit]
+    # Solo retroceder hasta un espacio si no se pierde demasiado texto
+    space = cut.rfind(' ')
+    if space > limit * 0.8:
+        cut = cut[:space]
+    return cut.rstrip() + TRUNCATION_MARK
+
+
+def log_token_usage(use_case, model_name, result):
+    """
+    Registra los tokens de prompt y de salida que reporta Ollama
+    (prompt_eval_count / eval_count) y avisa si la salida llegó al tope
+
+    Args:
+        use_case (str): Tipo de generación ('reply', 'job_post', ...)
+        model_name (str): Modelo usado
+        result (dict): Respuesta final de Ollama (o el último fragmento del stream)
+
+    Returns:
+        dict: {'prompt_tokens', 'completion_tokens'}
+    """
+    usage = {
+        'prompt_tokens': result.get('prompt_eval_count'),
+        'completion_tokens': result.get('eval_count')
+    }
+    logger.info(
+        f"Tokens {use_case} ({model_name}): prompt={usage['prompt_tokens']} "
+        f"salida={usage['completion_tokens']}"
+    )
+    if result.get('done_reason') == 'length':
+        logger.warning(f"La generación {use_case} se cortó al llegar a num_predict")
+    return usage
@@ -1,3 +1,18 @@
-from django.shortcuts import render
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from .model_health import get_model_health
+from .scheduler import get_scheduler
 
-# Create your views here.
+
+@staff_member_required
+@require_GET
+def model_health(request):
+    """
+    Estado de los modelos y de la cola de generaciones para monitoreo: se
+    sirve desde la caché, sin llamar a Ollama (503 si el servidor no está
+    disponible). Solo staff: expone los errores del servidor de modelos
+    """
+    health = get_model_health()
+    health['queue'] = get_scheduler().stats()
+    return JsonResponse(health, status=200 if health['available'] else 503)
@@ -1,3 +1,4 @@
-#from .celery import app as celery_app
+# Carga la app de Celery al iniciar Django para que @shared_task la use
+from .celery import app as celery_app
 
-#__all__ = ('celery_app',)
\ No newline at end of file
+__all__ = ('celery_app',)
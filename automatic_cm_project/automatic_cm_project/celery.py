@@ -1,9 +1,8 @@
-# automatic_cm/celery.py (NUEVO - créalo)
 import os
 from celery import Celery
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'automatic_cm.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'automatic_cm_project.settings')
 
 app = Celery('automatic_cm_project')
 app.config_from_object('django.conf:settings', namespace='CELERY')
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
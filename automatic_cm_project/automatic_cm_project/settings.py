@@ -33,7 +33,37 @@ CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
-CELERY_TIMEZONE = 'Bogota'
+CELERY_TIMEZONE = 'America/Bogota'
+CELERY_BEAT_SCHEDULE = {
+    # Mantiene el modelo cargado mientras haya tráfico (ver ai_manager/model_health.py)
+    'ollama-keep-alive': {
+        'task': 'ai_manager.tasks.keep_models_alive',
+        'schedule': 600,  # segundos (menor que OLLAMA_KEEP_ALIVE)
+    },
+    # Encola las sincronizaciones de cada usuario y plataforma cuyo intervalo se cumplió
+    # (SyncSchedule, ver dashboard/sync.py)
+    'dispatch-due-syncs': {
+        'task': 'core.tasks.dispatch_due_syncs',
+        'schedule': 60,
+    },
+    # Respaldo de la cola de publicación: relanza el drenado si una tarea se perdió
+    # (ver dashboard/publishing.py)
+    'dispatch-publish-outbox': {
+        'task': 'core.tasks.dispatch_publish_outbox',
+        'schedule': 60,
+    },
+}
+
+# Caché (Redis) para snapshots del dashboard
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/1',
+    }
+}
+
+# Máximo de segundos que un snapshot del dashboard puede estar desactualizado
+DASHBOARD_SNAPSHOT_TTL = 300
 
 
 # Application definition
@@ -73,6 +103,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'ai_manager.context_processors.llm_status',
             ],
         },
     },
@@ -80,6 +111,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'automatic_cm_project.wsgi.application'
 
+# Las respuestas en streaming (SSE) de las vistas async solo se envían por
+# partes bajo ASGI; con WSGI Django consume el generador completo antes de responder
+ASGI_APPLICATION = 'automatic_cm_project.asgi.application'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -144,6 +179,67 @@ REDDIT_USER_AGENT = "Automatic Community Manager (proyecto académico)"
 REDDIT_USERNAME = "Fine-Product-429"
 REDDIT_PASSWORD = "ACM123._"
 
+# Servidor de modelos (Ollama)
+OLLAMA_BASE_URL = 'http://localhost:11434'
+OLLAMA_MODEL = 'llama3'  # o "llama3.1", "llama3.2" según tu instalación
+OLLAMA_CONNECT_TIMEOUT = 3  # segundos
+OLLAMA_POOL_SIZE = 10  # conexiones keep-alive
+OLLAMA_KEEP_ALIVE = '30m'  # tiempo que el modelo queda cargado en memoria tras cada uso
+OLLAMA_WARMUP_MODELS = [OLLAMA_MODEL]  # modelos que se precargan al iniciar los workers
+OLLAMA_KEEPALIVE_IDLE_WINDOW = 60 * 60  # sin tráfico en este tiempo se deja de hacer ping
+
+# Circuit breaker del servidor de modelos (estado compartido en la caché)
+LLM_BREAKER_FAILURE_THRESHOLD = 5  # fallos mínimos en la ventana para abrir el circuito
+LLM_BREAKER_FAILURE_RATE = 0.5  # proporción de llamadas fallidas para abrirlo
+LLM_BREAKER_WINDOW = 60  # segundos de la ventana de conteo
+LLM_BREAKER_SLOW_CALL_MS = 45000  # llamadas más lentas cuentan como fallo
+LLM_BREAKER_OPEN_SECONDS = 30  # segundos abierto antes de enviar una llamada de prueba
+LLM_BREAKER_PROBE_TIMEOUT = 90  # segundos que se reserva la llamada de prueba
+
+# Planificador de generaciones (turnos compartidos entre procesos en la caché)
+LLM_MAX_CONCURRENCY = 2  # generaciones simultáneas en Ollama (igual a OLLAMA_NUM_PARALLEL)
+LLM_INTERACTIVE_RESERVED_SLOTS = 1  # turnos que los lotes en segundo plano no pueden usar
+LLM_MAX_INTERACTIVE_QUEUE = 8  # generaciones interactivas en espera antes de responder 429
+LLM_INTERACTIVE_QUEUE_TIMEOUT = 30  # segundos máximos de espera de un clic en "generar"
+LLM_BACKGROUND_QUEUE_TIMEOUT = 600  # segundos máximos de espera de un borrador en lote
+LLM_SLOT_LEASE = 180  # un turno se libera solo si el worker muere
+
+# Sincronización periódica con Reddit y YouTube
+SYNC_LOCK_TIMEOUT = 30 * 60  # segundos máximos de una sincronización (el lock expira solo)
+SYNC_COMMENTS_WINDOW_DAYS = 30  # se sincronizan los comentarios de posts/videos de este periodo
+SYNC_VELOCITY_WINDOW_HOURS = 24  # los videos con más comentarios en este periodo se sincronizan primero
+SYNC_REPLY_WINDOW_DAYS = 7  # en modo incremental solo se buscan respuestas nuevas en hilos activos en este periodo
+SYNC_REPLY_MAX_THREADS = 100  # máximo de hilos revisados por video en cada sincronización incremental
+
+# Cuota diaria de la API de YouTube (unidades por cuenta; se reinicia a medianoche hora del Pacífico)
+YOUTUBE_DAILY_QUOTA = 10000
+
+# Rate limiter de llamadas salientes (token bucket por plataforma y cuenta, compartido en la caché)
+PLATFORM_RATE_LIMITS = {
+    'reddit': {'rate': 1.5, 'capacity': 10},  # Reddit permite ~100 peticiones por minuto con OAuth
+    'youtube': {'rate': 5, 'capacity': 20},  # peticiones por segundo (la cuota diaria es aparte)
+}
+RATE_LIMIT_MAX_WAIT = 30  # segundos que una llamada espera cupo antes de diferirse
+
+# Cola de publicación de respuestas (reintentos con espera exponencial)
+PUBLISH_MAX_ATTEMPTS = 6  # intentos con error transitorio antes de marcar la respuesta como fallida
+PUBLISH_BACKOFF_BASE = 30  # segundos de espera tras el primer error (se duplica en cada intento)
+PUBLISH_BACKOFF_MAX = 60 * 60  # espera máxima entre intentos
+PUBLISH_RATE_LIMIT_DELAY = 60  # segundos de pausa si la plataforma limita sin indicar cuánto esperar
+PUBLISH_MAX_INLINE_SLEEP = 60  # esperas de rate limit más cortas se duermen en el worker; las largas pausan la cola
+PUBLISH_DRAIN_SECONDS = 5 * 60  # duración máxima de una corrida del worker (luego se reprograma)
+
+# Revisión en bloque (aprobar, rechazar o publicar varias respuestas por petición)
+BULK_REVIEW_MAX_RESPONSES = 500
+
+# Borradores en segundo plano: generaciones simultáneas contra el servidor de modelos
+DRAFT_GENERATION_CONCURRENCY = 2
+
+# Caché de respuestas generadas (L1 en memoria del proceso, L2 en Redis)
+REPLY_CACHE_TTL = 60 * 60 * 24  # segundos en Redis
+REPLY_CACHE_L1_TTL = 300  # segundos en memoria
+REPLY_CACHE_L1_SIZE = 1000  # entradas en memoria (LRU)
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
@@ -7,6 +7,8 @@ from django.shortcuts import redirect
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('dashboard/', include('dashboard.urls')),
+    path('ai/', include('ai_manager.urls')),
+    path('bots/', include('bots.urls')),
     path('', lambda request: redirect('reddit_manager')),  # Redirigir root a reddit
 ]
 
@@ -0,0 +1,130 @@
+import logging
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'quota:youtube'
+
+# La cuota diaria de la API de YouTube se reinicia a medianoche (hora del Pacífico)
+YOUTUBE_QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')
+
+# Unidades de cuota por llamada (methodId de googleapiclient)
+QUOTA_COSTS = {
+    'youtube.channels.list': 1,
+    'youtube.playlistItems.list': 1,
+    'youtube.videos.list': 1,
+    'youtube.commentThreads.list': 1,
+    'youtube.comments.list': 1,
+    'youtube.comments.insert': 50,
+    'youtube.comments.update': 50,
+    'youtube.comments.delete': 50,
+}
+
+# Costo de los métodos que no están en la tabla: lecturas 1, escrituras 50
+DEFAULT_READ_COST = 1
+DEFAULT_WRITE_COST = 50
+
+
+def quota_cost(method):
+    """Unidades de cuota que consume una llamada al método `method`"""
+    if method in QUOTA_COSTS:
+        return QUOTA_COSTS[method]
+    return DEFAULT_READ_COST if method.endswith('.list') else DEFAULT_WRITE_COST
+
+
+def quota_day(now=None):
+    """Día de cuota (fecha en hora del Pacífico) al que pertenece `now`"""
+    return (now or timezone.now()).astimezone(YOUTUBE_QUOTA_TIMEZONE).date()
+
+
+def seconds_until_quota_reset(now=None):
+    """Segundos hasta que se reinicia la cuota diaria de YouTube"""
+    now = (now or timezone.now()).astimezone(YOUTUBE_QUOTA_TIMEZONE)
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), YOUTUBE_QUOTA_TIMEZONE)
+    return (midnight - now).total_seconds()
+
+
+class QuotaLedger:
+    """
+    Unidades de cuota de la API de YouTube consumidas por una cuenta en el
+    día, en total y por método. Los contadores viven en la caché (Redis),
+    compartidos por todos los procesos, y expiran solos tras el reinicio.
+    Si la caché no responde la llamada no se registra (no se bloquea).
+    """
+
+    def __init__(self, account, daily_quota=None):
+        """
+        Args:
+            account (str): Cuenta que hace las llamadas
+            daily_quota (int, optional): Unidades por día (YOUTUBE_DAILY_QUOTA)
+        """
+        self.account = account
+        self.daily_quota = daily_quota or settings.YOUTUBE_DAILY_QUOTA
+
+    def _key(self, day, name='total'):
+        return f"{KEY_PREFIX}:{self.account}:{day.isoformat()}:{name}"
+
+    def record(self, method, now=None):
+        """
+        Registra una llamada a la API
+
+        Args:
+            method (str): methodId de la llamada ('youtube.comments.insert', ...)
+            now (datetime, optional): Momento de la llamada
+
+        Returns:
+            int: Unidades consumidas por la llamada
+        """
+        units = quota_cost(method)
+        day = quota_day(now)
+        # Se conservan un día más que la cuota para poder consultar el anterior
+        timeout = int(seconds_until_quota_reset(now)) + 60 * 60 * 24
+        try:
+            for key in (self._key(day), self._key(day, method)):
+                cache.add(key, 0, timeout=timeout)
+                cache.incr(key, units)
+        except Exception as e:
+            logger.warning(f"No se pudo registrar la cuota de YouTube de {self.account}: {str(e)}")
+        return units
+
+    def used(self, now=None):
+        """Unidades consumidas en el día de cuota actual"""
+        try:
+            return cache.get(self._key(quota_day(now))) or 0
+        except Exception as e:
+            logger.warning(f"No se pudo leer la cuota de YouTube de {self.account}: {str(e)}")
+            return 0
+
+    def remaining(self, now=None):
+        """Unidades que quedan en el día de cuota actual"""
+        return max(0, self.daily_quota - self.used(now))
+
+    def usage(self, now=None):
+        """
+        Consumo del día (para métricas)
+
+        Returns:
+            dict: {'account', 'day', 'used', 'remaining', 'daily_quota', 'by_method'}
+        """
+        day = quota_day(now)
+        try:
+            values = cache.get_many([self._key(day, method) for method in QUOTA_COSTS])
+        except Exception as e:
+            logger.warning(f"No se pudo leer la cuota de YouTube de {self.account}: {str(e)}")
+            values = {}
+
+        return {
+            'account': self.account,
+            'day': day.isoformat(),
+            'used': self.used(now),
+            'remaining': self.remaining(now),
+            'daily_quota': self.daily_quota,
+            'by_method': {
+                method: values[self._key(day, method)]
+                for method in QUOTA_COSTS if values.get(self._key(day, method))
+            },
+        }
@@ -0,0 +1,236 @@
+import os
+import time
+import uuid
+import logging
+from functools import partial
+from django.conf import settings
+from django.core.cache import cache
+from googleapiclient.http import HttpRequest
+from prawcore import Requestor
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ratelimit'
+
+REDDIT = 'reddit'
+YOUTUBE = 'youtube'
+
+# El lock solo protege la lectura y escritura del estado del bucket
+LOCK_TIMEOUT = 2
+LOCK_POLL_INTERVAL = 0.01
+
+
+class RateLimited(Exception):
+    """No hubo cupo en el bucket dentro de la espera permitida: la llamada debe diferirse"""
+
+    def __init__(self, bucket, retry_after):
+        """
+        Args:
+            bucket (str): Bucket agotado ('reddit:<cuenta>', ...)
+            retry_after (float): Segundos hasta que haya cupo
+        """
+        super().__init__(f"Límite de llamadas de {bucket} alcanzado: reintentar en {retry_after:.0f} s")
+        self.bucket = bucket
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket de llamadas a una plataforma para una cuenta, compartido
+    por todos los procesos (gunicorn y Celery) a través de la caché (Redis).
+
+    Se recargan `rate` tokens por segundo hasta `capacity` y cada petición
+    HTTP consume uno. El estado ({'tokens', 'updated'}) se lee y se escribe
+    bajo un lock corto tomado con cache.add. Si la caché no responde, las
+    llamadas se permiten (sin coordinación) en lugar de fallar.
+    """
+
+    def __init__(self, platform, account, rate=None, capacity=None, max_wait=None):
+        """
+        Args:
+            platform (str): REDDIT o YOUTUBE
+            account (str): Cuenta que hace las llamadas
+            rate (float, optional): Tokens por segundo (PLATFORM_RATE_LIMITS)
+            capacity (int, optional): Ráfaga máxima (PLATFORM_RATE_LIMITS)
+            max_wait (float, optional): Segundos que una llamada puede esperar cupo (RATE_LIMIT_MAX_WAIT)
+        """
+        limits = settings.PLATFORM_RATE_LIMITS[platform]
+        self.name = f"{platform}:{account}"
+        self.rate = rate or limits['rate']
+        self.capacity = capacity or limits['capacity']
+        self.max_wait = settings.RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+
+    def _key(self, suffix='state'):
+        return f"{KEY_PREFIX}:{self.name}:{suffix}"
+
+    def _available(self, state, now):
+        """Tokens disponibles en `now` según el último estado guardado"""
+        if not state:
+            return float(self.capacity)
+        return min(float(self.capacity), state['tokens'] + (now - state['updated']) * self.rate)
+
+    def _lock(self):
+        """Toma el lock del bucket (expira solo si el proceso muere) y retorna su token"""
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + LOCK_TIMEOUT * 2
+        while not cache.add(self._key('lock'), token, timeout=LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                logger.warning(f"Lock del rate limiter {self.name} retenido demasiado tiempo")
+                return None
+            time.sleep(LOCK_POLL_INTERVAL)
+        return token
+
+    def try_acquire(self, tokens=1):
+        """
+        Intenta tomar tokens sin esperar
+
+        Returns:
+            float: 0 si se tomaron; si no, segundos hasta que haya suficientes
+        """
+        try:
+            lock = self._lock()
+        except Exception as e:
+            logger.warning(f"No se pudo usar el rate limiter {self.name}: {str(e)}")
+            return 0.0
+
+        try:
+            now = time.time()
+            available = self._available(cache.get(self._key()), now)
+            if available >= tokens:
+                available -= tokens
+                wait = 0.0
+            else:
+                wait = (tokens - available) / self.rate
+            # Tras recargarse por completo el estado ya no aporta nada: expira solo
+            idle_timeout = int(self.capacity / self.rate) + 60
+            cache.set(self._key(), {'tokens': available, 'updated': now}, timeout=idle_timeout)
+            return wait
+        except Exception as e:
+            logger.warning(f"No se pudo actualizar el rate limiter {self.name}: {str(e)}")
+            return 0.0
+        finally:
+            try:
+                if lock and cache.get(self._key('lock')) == lock:
+                    cache.delete(self._key('lock'))
+            except Exception as e:
+                logger.warning(f"No se pudo liberar el lock del rate limiter {self.name}: {str(e)}")
+
+    def acquire(self, tokens=1, max_wait=None):
+        """
+        Toma tokens esperando hasta `max_wait` segundos a que haya cupo
+
+        Raises:
+            RateLimited: Si no hay cupo dentro de la espera permitida
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimited(self.name, wait)
+            time.sleep(wait)
+
+    def level(self):
+        """
+        Nivel actual del bucket (para métricas)
+
+        Returns:
+            dict: {'bucket', 'tokens', 'capacity', 'rate'}
+        """
+        try:
+            state = cache.get(self._key())
+        except Exception as e:
+            logger.warning(f"No se pudo leer el rate limiter {self.name}: {str(e)}")
+            state = None
+
+        return {
+            'bucket': self.name,
+            'tokens': round(self._available(state, time.time()), 2),
+            'capacity': self.capacity,
+            'rate': self.rate,
+        }
+
+
+def get_bucket(platform, account):
+    """
+    Bucket de una plataforma y cuenta (el estado vive en la caché, por lo
+    que todas las instancias con el mismo nombre lo comparten). Se registra
+    su nombre para que las métricas incluyan todas las cuentas en uso.
+
+    Returns:
+        TokenBucket
+    """
+    bucket = TokenBucket(platform, account)
+    try:
+        names = cache.get(f"{KEY_PREFIX}:buckets") or []
+        if bucket.name not in names:
+            cache.set(f"{KEY_PREFIX}:buckets", sorted({*names, bucket.name}), timeout=None)
+    except Exception as e:
+        logger.warning(f"No se pudo registrar el rate limiter {bucket.name}: {str(e)}")
+    return bucket
+
+
+def youtube_account_name(token_file):
+    """Identificador de una cuenta de YouTube a partir de su archivo de token"""
+    return os.path.splitext(os.path.basename(token_file))[0]
+
+
+def _registered_buckets():
+    try:
+        return cache.get(f"{KEY_PREFIX}:buckets") or []
+    except Exception as e:
+        logger.warning(f"No se pudieron leer los rate limiters: {str(e)}")
+        return []
+
+
+def registered_accounts(platform):
+    """Cuentas de la plataforma que hicieron llamadas (ver get_bucket)"""
+    return [name.split(':', 1)[1] for name in _registered_buckets() if name.startswith(f"{platform}:")]
+
+
+def bucket_levels():
+    """
+    Niveles de los buckets de todas las cuentas que hicieron llamadas
+
+    Returns:
+        list: [{'bucket', 'tokens', 'capacity', 'rate'}, ...]
+    """
+    return [TokenBucket(*name.split(':', 1)).level() for name in _registered_buckets()]
+
+
+class RateLimitedRequestor(Requestor):
+    """Requestor de prawcore que toma un token antes de cada petición HTTP a Reddit"""
+
+    def __init__(self, *args, bucket, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bucket = bucket
+
+    def request(self, *args, **kwargs):
+        self.bucket.acquire()
+        return super().request(*args, **kwargs)
+
+
+class RateLimitedHttpRequest(HttpRequest):
+    """
+    Petición de googleapiclient que toma un token antes de cada execute() y
+    registra su costo en el ledger de cuota (YouTube cobra también las
+    llamadas que fallan)
+    """
+
+    def __init__(self, *args, bucket, ledger=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bucket = bucket
+        self.ledger = ledger
+
+    def execute(self, *args, **kwargs):
+        self.bucket.acquire()
+        if self.ledger is not None:
+            self.ledger.record(self.methodId)
+        return super().execute(*args, **kwargs)
+
+
+def youtube_request_builder(bucket, ledger=None):
+    """requestBuilder para googleapiclient.discovery.build que usa `bucket` y `ledger`"""
+    return partial(RateLimitedHttpRequest, bucket=bucket, ledger=ledger)
@@ -1,49 +1,119 @@
 import praw
+import threading
 from django.conf import settings
 from datetime import datetime
 import logging
+from .rate_limit import REDDIT, RateLimited, RateLimitedRequestor, get_bucket
 
 logger = logging.getLogger(__name__)
 
-class RedditBot:
-    def __init__(self):
-        """Inicializa la conexión con Reddit"""
-        self.reddit = praw.Reddit(
-            client_id=settings.REDDIT_CLIENT_ID,
-            client_secret=settings.REDDIT_CLIENT_SECRET,
-            user_agent=settings.REDDIT_USER_AGENT,
-            username=settings.REDDIT_USERNAME,
-            password=settings.REDDIT_PASSWORD
+# Clientes de Reddit reutilizados entre requests y tareas, uno por hilo y
+# por credenciales (praw.Reddit no es thread-safe). Cada cliente conserva su
+# sesión HTTP y su token OAuth, que prawcore renueva solo cuando expira.
+_clients = threading.local()
+
+
+def get_reddit_client(client_id=None, client_secret=None, user_agent=None,
+                      username=None, password=None):
+    """
+    Retorna el cliente praw.Reddit compartido para unas credenciales,
+    creándolo la primera vez que se usa en el hilo actual
+    
+    Args:
+        client_id, client_secret, user_agent, username, password (str, optional):
+            Credenciales; por defecto las de settings
+            
+    Returns:
+        praw.Reddit: Cliente autenticado
+    """
+    credentials = (
+        client_id or settings.REDDIT_CLIENT_ID,
+        client_secret or settings.REDDIT_CLIENT_SECRET,
+        user_agent or settings.REDDIT_USER_AGENT,
+        username or settings.REDDIT_USERNAME,
+        password or settings.REDDIT_PASSWORD
+    )
+    
+    pool = getattr(_clients, 'pool', None)
+    if pool is None:
+        pool = _clients.pool = {}
+    
+    client = pool.get(credentials)
+    if client is None:
+        client = praw.Reddit(
+            client_id=credentials[0],
+            client_secret=credentials[1],
+            user_agent=credentials[2],
+            username=credentials[3],
+            password=credentials[4],
+            # Cada petición HTTP toma un token del bucket de la cuenta
+            requestor_class=RateLimitedRequestor,
+            requestor_kwargs={'bucket': get_bucket(REDDIT, credentials[3])}
         )
+        pool[credentials] = client
+        logger.info(f"Cliente de Reddit creado para {credentials[3]}")
+    
+    return client
+
+
+class RedditBot:
+    def __init__(self, reddit=None):
+        """
+        Inicializa la conexión con Reddit
         
-    def get_subreddit_posts(self, subreddit_name, limit=25):
+        Args:
+            reddit (praw.Reddit, optional): Cliente a usar; por defecto el compartido
+        """
+        self.reddit = reddit or get_reddit_client()
+        
+    def get_subreddit_posts(self, subreddit_name, limit=25, cursor=None):
         """
         Obtiene los posts más recientes de un subreddit
         
+        Si se pasa `cursor` (fullname y created_utc del post más reciente ya
+        visto), se pagina el listado /new de 100 en 100 hasta alcanzarlo, de
+        modo que solo se descargan los posts nuevos, incluso si son más de 25.
+        
         Args:
             subreddit_name (str): Nombre del subreddit
-            limit (int): Número de posts a obtener
+            limit (int, optional): Número máximo de posts a obtener (None = sin límite)
+            cursor (dict, optional): {'fullname': str, 'created_utc': float}
             
         Returns:
-            list: Lista de posts con su información
+            list: Lista de posts con su información (más recientes primero)
+            
+        Raises:
+            RateLimited: Si la cuenta no tiene cupo de llamadas
         """
         try:
             subreddit = self.reddit.subreddit(subreddit_name)
             posts = []
             
             for submission in subreddit.new(limit=limit):
+                # Alcanzamos el cursor (o uno anterior si fue borrado): ya está sincronizado
+                if cursor and (
+                    submission.fullname == cursor['fullname'] or
+                    submission.created_utc < cursor['created_utc']
+                ):
+                    break
+                
                 posts.append({
                     'post_id': submission.id,
+                    'fullname': submission.fullname,
                     'title': submission.title,
                     'url': submission.url,
                     'permalink': f"https://reddit.com{submission.permalink}",
                     'author': str(submission.author),
                     'created_at': datetime.fromtimestamp(submission.created_utc),
+                    'created_utc': submission.created_utc,
                     'subreddit': subreddit_name,
                     'num_comments': submission.num_comments
                 })
             
             return posts
+        except RateLimited:
+            # Sin cupo en el rate limiter: quien llama difiere la sincronización
+            raise
         except Exception as e:
             logger.error(f"Error al obtener posts: {str(e)}")
             return []
@@ -57,6 +127,9 @@ class RedditBot:
             
         Returns:
             list: Lista de comentarios con su información
+            
+        Raises:
+            RateLimited: Si la cuenta no tiene cupo de llamadas
         """
         try:
             submission = self.reddit.submission(id=post_id)
@@ -78,17 +151,22 @@ class RedditBot:
                 })
             
             return comments
+        except RateLimited:
+            # Sin cupo en el rate limiter: quien llama difiere la sincronización
+            raise
         except Exception as e:
             logger.error(f"Error al obtener comentarios del post {post_id}: {str(e)}")
             return []
     
-    def reply_to_comment(self, comment_id, text):
+    def reply_to_comment(self, comment_id, text, raise_errors=False):
         """
         Responde a un comentario en Reddit
         
         Args:
             comment_id (str): ID del comentario
             text (str): Texto de la respuesta
+            raise_errors (bool): Propagar la excepción en lugar de retornar None
+                (la cola de publicación la usa para decidir si reintentar)
             
         Returns:
             str: ID de la respuesta o None si falla
@@ -96,10 +174,15 @@ class RedditBot:
         try:
             comment = self.reddit.comment(id=comment_id)
             reply = comment.reply(text)
+            if reply is None:
+                # PRAW retorna None si Reddit no crea la respuesta (comentario bloqueado)
+                raise ValueError(f"Reddit no creó la respuesta al comentario {comment_id}")
             logger.info(f"Respuesta publicada exitosamente: {reply.id}")
             return reply.id
         except Exception as e:
             logger.error(f"Error al publicar respuesta: {str(e)}")
+            if raise_errors:
+                raise
             return None
     
     def test_connection(self):
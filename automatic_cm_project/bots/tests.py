@@ -1,3 +1,410 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+import os
+import pickle
+import tempfile
+import threading
+from unittest.mock import MagicMock, patch
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from prawcore import Requestor
+from . import reddit_bot
+from .quota import QuotaLedger, quota_day
+from .rate_limit import (
+    RateLimited, RateLimitedHttpRequest, RateLimitedRequestor, TokenBucket, get_bucket
+)
+from .reddit_bot import RedditBot
+from . import youtube_bot
+from .youtube_bot import YouTubeBot
 
-# Create your tests here.
+LOCMEM_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+}
+
+
+def fake_video(video_id):
+    return {
+        'id': video_id,
+        'snippet': {
+            'title': f'Video {video_id}',
+            'description': '',
+            'publishedAt': '2024-01-01T00:00:00Z',
+            'thumbnails': {'medium': {'url': 'https://img/'}},
+            'channelTitle': 'Canal'
+        },
+        'statistics': {'viewCount': '10', 'commentCount': '2'}
+    }
+
+
+def make_youtube_bot(service):
+    """Crea un YouTubeBot sin pasar por OAuth"""
+    bot = YouTubeBot.__new__(YouTubeBot)
+    bot.youtube = service
+    return bot
+
+
+class GetChannelVideosTests(SimpleTestCase):
+    def setUp(self):
+        self.total_videos = 120
+        ids = [f'v{i}' for i in range(self.total_videos)]
+
+        self.service = MagicMock()
+        self.service.channels().list().execute.return_value = {
+            'items': [{'contentDetails': {'relatedPlaylists': {'uploads': 'UU1'}}}]
+        }
+
+        def playlist_page(**kwargs):
+            start = int(kwargs.get('pageToken') or 0)
+            end = start + kwargs['maxResults']
+            response = {'items': [{'contentDetails': {'videoId': v}} for v in ids[start:end]]}
+            if end < len(ids):
+                response['nextPageToken'] = str(end)
+            request = MagicMock()
+            request.execute.return_value = response
+            return request
+
+        def videos_batch(**kwargs):
+            request = MagicMock()
+            request.execute.return_value = {
+                'items': [fake_video(v) for v in kwargs['id'].split(',')]
+            }
+            return request
+
+        self.service.playlistItems().list.side_effect = playlist_page
+        self.service.videos().list.side_effect = videos_batch
+        self.service.playlistItems().list.reset_mock()
+        self.service.videos().list.reset_mock()
+
+    def test_paginates_and_batches_all_videos(self):
+        videos = make_youtube_bot(self.service).get_channel_videos(max_results=None)
+
+        self.assertEqual(len(videos), self.total_videos)
+        self.assertEqual(videos[0]['video_id'], 'v0')
+        self.assertEqual(videos[-1]['video_id'], 'v119')
+        # 3 páginas de playlist y 3 lotes de estadísticas en vez de 120 llamadas
+        self.assertEqual(self.service.playlistItems().list.call_count, 3)
+        self.assertEqual(self.service.videos().list.call_count, 3)
+
+    def test_respects_max_results(self):
+        videos = make_youtube_bot(self.service).get_channel_videos(max_results=25)
+
+        self.assertEqual(len(videos), 25)
+        self.assertEqual(self.service.videos().list.call_count, 1)
+
+
+def fake_thread(index, published_at):
+    stamp = published_at.strftime('%Y-%m-%dT%H:%M:%SZ')
+    return {
+        'snippet': {
+            'topLevelComment': {
+                'id': f'c{index}',
+                'snippet': {
+                    'authorDisplayName': 'usuario',
+                    'textDisplay': f'Comentario {index}',
+                    'publishedAt': stamp,
+                    'updatedAt': stamp
+                }
+            }
+        }
+    }
+
+
+class GetVideoCommentsTests(SimpleTestCase):
+    def setUp(self):
+        # 250 hilos del más reciente (c0) al más antiguo (c249), páginas de 100
+        base = datetime(2024, 1, 1)
+        self.times = [base - timedelta(minutes=i) for i in range(250)]
+        threads = [fake_thread(i, t) for i, t in enumerate(self.times)]
+        pages = [threads[i:i + 100] for i in range(0, len(threads), 100)]
+
+        self.service = MagicMock()
+        requests = []
+        for index, page in enumerate(pages):
+            request = MagicMock()
+            request.execute.return_value = {'items': page}
+            request.page = index
+            requests.append(request)
+        self.requests = requests
+
+        self.service.commentThreads().list.return_value = requests[0]
+        self.service.commentThreads().list_next.side_effect = (
+            lambda request, response: requests[request.page + 1]
+            if request.page + 1 < len(requests) else None
+        )
+
+    def test_incremental_stops_at_watermark(self):
+        watermark = (self.times[30].replace(tzinfo=dt_timezone.utc), 'c30')
+        comments = make_youtube_bot(self.service).get_video_comments(
+            'v1', max_results=None, watermark=watermark
+        )
+
+        self.assertEqual([c['comment_id'] for c in comments], [f'c{i}' for i in range(30)])
+        self.requests[0].execute.assert_called_once()
+        self.requests[1].execute.assert_not_called()
+
+    def test_full_resync_reads_every_page(self):
+        comments = make_youtube_bot(self.service).get_video_comments('v1', max_results=None)
+
+        self.assertEqual(len(comments), 250)
+        self.requests[2].execute.assert_called_once()
+
+    def test_incremental_fetches_new_replies_on_old_threads(self):
+        # c40 es anterior al watermark y recibió una respuesta desde la última sincronización
+        stamp = '2024-01-02T00:00:00Z'
+        totals = {'c40': 1}
+        check_ids = []
+        check = MagicMock()
+        check.execute.side_effect = lambda: {'items': [
+            {'id': thread_id, 'snippet': {'totalReplyCount': totals.get(thread_id, 0)}}
+            for thread_id in check_ids
+        ]}
+
+        def thread_list(**kwargs):
+            if 'id' not in kwargs:
+                return self.requests[0]
+            check_ids[:] = kwargs['id'].split(',')
+            return check
+
+        self.service.commentThreads().list.side_effect = thread_list
+        self.service.comments().list().execute.return_value = {'items': [{
+            'id': 'c40.r1',
+            'snippet': {'authorDisplayName': 'usuario', 'textDisplay': 'Respuesta',
+                        'publishedAt': stamp, 'updatedAt': stamp}
+        }]}
+        self.service.comments().list_next.return_value = None
+        self.service.comments().list.reset_mock()
+
+        watermark = (self.times[30].replace(tzinfo=dt_timezone.utc), 'c30')
+        reply_counts = {f'c{i}': 0 for i in range(30, 130)}
+        comments = make_youtube_bot(self.service).get_video_comments(
+            'v1', max_results=None, watermark=watermark, reply_counts=reply_counts
+        )
+
+        self.assertEqual(len(comments), 31)
+        self.assertEqual(comments[-1]['comment_id'], 'c40.r1')
+        self.assertEqual(comments[-1]['parent_id'], 'c40')
+        self.assertTrue(comments[-1]['is_reply'])
+        # 2 lotes de 50 hilos para ver los totales; solo se piden las respuestas de c40
+        self.assertEqual(check.execute.call_count, 2)
+        self.service.comments().list.assert_called_once_with(
+            part='snippet', parentId='c40', maxResults=100, textFormat='plainText'
+        )
+
+
+def fake_submission(index, created_utc):
+    submission = MagicMock()
+    submission.id = f'p{index}'
+    submission.fullname = f't3_p{index}'
+    submission.title = f'Post {index}'
+    submission.url = 'https://reddit.com/'
+    submission.permalink = f'/r/test/{index}'
+    submission.author = 'autor'
+    submission.created_utc = created_utc
+    submission.num_comments = 0
+    return submission
+
+
+class GetSubredditPostsTests(SimpleTestCase):
+    def setUp(self):
+        # 150 posts del más reciente (p0) al más antiguo (p149)
+        self.submissions = [fake_submission(i, 1_700_000_000 - i * 60) for i in range(150)]
+        self.bot = RedditBot.__new__(RedditBot)
+        self.bot.reddit = MagicMock()
+        self.bot.reddit.subreddit().new.side_effect = (
+            lambda limit: iter(self.submissions[:limit] if limit else self.submissions)
+        )
+
+    def test_backfills_everything_newer_than_cursor(self):
+        cursor = {'fullname': 't3_p120', 'created_utc': self.submissions[120].created_utc}
+        posts = self.bot.get_subreddit_posts('test', limit=None, cursor=cursor)
+
+        self.assertEqual(len(posts), 120)
+        self.assertEqual(posts[0]['fullname'], 't3_p0')
+
+    def test_deleted_cursor_stops_at_older_post(self):
+        cursor = {'fullname': 't3_borrado', 'created_utc': self.submissions[10].created_utc + 30}
+        posts = self.bot.get_subreddit_posts('test', limit=None, cursor=cursor)
+
+        self.assertEqual([p['post_id'] for p in posts], [f'p{i}' for i in range(10)])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+@patch('bots.reddit_bot.praw.Reddit')
+class RedditClientPoolTests(SimpleTestCase):
+    def setUp(self):
+        reddit_bot._clients.__dict__.clear()
+
+    def test_bots_share_one_client_per_thread(self, reddit_cls):
+        first, second = RedditBot(), RedditBot()
+
+        self.assertIs(first.reddit, second.reddit)
+        reddit_cls.assert_called_once()
+        # Todas las peticiones del cliente pasan por el rate limiter de la cuenta
+        self.assertIs(reddit_cls.call_args.kwargs['requestor_class'], RateLimitedRequestor)
+        self.assertEqual(reddit_cls.call_args.kwargs['requestor_kwargs']['bucket'].name, 'reddit:Fine-Product-429')
+
+    def test_other_threads_and_credentials_get_their_own_client(self, reddit_cls):
+        reddit_cls.side_effect = lambda **kwargs: MagicMock()
+        main_client = reddit_bot.get_reddit_client()
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(reddit_bot.get_reddit_client()))
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(other[0], main_client)
+        self.assertIsNot(reddit_bot.get_reddit_client(username='otro'), main_client)
+        self.assertIs(reddit_bot.get_reddit_client(), main_client)
+
+
+class FakeCredentials:
+    """Credenciales mínimas serializables con pickle"""
+
+    def __init__(self, expires_in):
+        self.token = 'token'
+        self.refresh_token = 'refresh'
+        self.expiry = datetime.now(dt_timezone.utc).replace(tzinfo=None) + expires_in
+        self.refresh_count = 0
+
+    @property
+    def valid(self):
+        return self.expiry > datetime.now(dt_timezone.utc).replace(tzinfo=None)
+
+    def refresh(self, request):
+        self.refresh_count += 1
+        self.expiry = datetime.now(dt_timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+@patch('bots.youtube_bot.build')
+class YouTubeAccountTests(SimpleTestCase):
+    def setUp(self):
+        youtube_bot._accounts.clear()
+        handle, self.token_file = tempfile.mkstemp(suffix='.pickle')
+        os.close(handle)
+        self.addCleanup(os.remove, self.token_file)
+
+    def write_token(self, creds):
+        with open(self.token_file, 'wb') as token:
+            pickle.dump(creds, token)
+
+    def test_service_is_built_once_from_static_discovery(self, build):
+        self.write_token(FakeCredentials(timedelta(hours=1)))
+        mtime = os.path.getmtime(self.token_file)
+
+        first = YouTubeBot(token_file=self.token_file)
+        second = YouTubeBot(token_file=self.token_file)
+
+        self.assertIs(first.youtube, second.youtube)
+        build.assert_called_once()
+        self.assertTrue(build.call_args.kwargs['static_discovery'])
+        # El token no cambió: no se vuelve a escribir
+        self.assertEqual(os.path.getmtime(self.token_file), mtime)
+
+    def test_refreshes_before_expiry_and_persists(self, build):
+        self.write_token(FakeCredentials(timedelta(minutes=2)))
+
+        account = youtube_bot.get_youtube_account(token_file=self.token_file)
+        creds = account.get_credentials()
+        account.get_credentials()
+
+        self.assertEqual(creds.refresh_count, 1)
+        with open(self.token_file, 'rb') as token:
+            self.assertEqual(pickle.load(token).refresh_count, 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_allows_a_burst_then_asks_to_wait(self):
+        bucket = TokenBucket('reddit', 'bot', rate=1, capacity=3)
+
+        self.assertEqual([bucket.try_acquire() for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(bucket.try_acquire(), 1, places=1)
+
+    def test_acquire_blocks_briefly_until_refill(self):
+        bucket = TokenBucket('reddit', 'bot', rate=100, capacity=1)
+        bucket.acquire()
+
+        with patch('bots.rate_limit.time.sleep', wraps=__import__('time').sleep) as sleep:
+            bucket.acquire()
+
+        sleep.assert_called()
+
+    def test_long_waits_are_deferred(self):
+        bucket = TokenBucket('reddit', 'bot', rate=0.1, capacity=1, max_wait=1)
+        bucket.acquire()
+
+        with self.assertRaises(RateLimited) as raised:
+            bucket.acquire()
+        self.assertGreater(raised.exception.retry_after, 9)
+
+    def test_accounts_have_separate_buckets(self):
+        TokenBucket('youtube', 'a', rate=0.1, capacity=1).acquire()
+
+        self.assertEqual(TokenBucket('youtube', 'b', rate=0.1, capacity=1).try_acquire(), 0)
+        self.assertGreater(TokenBucket('youtube', 'a', rate=0.1, capacity=1).try_acquire(), 0)
+
+    def test_fails_open_without_cache(self):
+        bucket = TokenBucket('reddit', 'bot', rate=0.1, capacity=1)
+
+        with patch('bots.rate_limit.cache.add', side_effect=ConnectionError('redis caído')):
+            self.assertEqual([bucket.try_acquire(), bucket.try_acquire()], [0, 0])
+
+    def test_requestor_takes_a_token_per_request(self):
+        bucket = MagicMock()
+        requestor = RateLimitedRequestor(user_agent='acm test agent', bucket=bucket)
+
+        with patch.object(Requestor, 'request', return_value='ok'):
+            self.assertEqual(requestor.request('GET', 'https://oauth.reddit.com/api/v1/me'), 'ok')
+        bucket.acquire.assert_called_once()
+
+    def test_youtube_requests_record_their_quota_cost(self):
+        ledger = QuotaLedger('canal')
+        request = RateLimitedHttpRequest(
+            MagicMock(), None, 'https://youtube.googleapis.com/youtube/v3/comments',
+            method='POST', methodId='youtube.comments.insert', bucket=MagicMock(), ledger=ledger
+        )
+
+        with patch('googleapiclient.http.HttpRequest.execute', return_value={'id': 'r1'}):
+            request.execute()
+
+        self.assertEqual(ledger.usage()['by_method'], {'youtube.comments.insert': 50})
+
+    def test_quota_day_follows_the_pacific_reset(self):
+        # 07:59 UTC es todavía el día anterior en hora del Pacífico (PST)
+        before = datetime(2024, 1, 2, 7, 59, tzinfo=dt_timezone.utc)
+        after = before + timedelta(minutes=2)
+        ledger = QuotaLedger('canal')
+        ledger.record('youtube.videos.list', now=before)
+
+        self.assertEqual((quota_day(before).day, quota_day(after).day), (1, 2))
+        self.assertEqual((ledger.used(before), ledger.used(after)), (1, 0))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RateLimitsViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_requires_staff(self):
+        self.assertEqual(self.client.get('/bots/rate-limits/').status_code, 302)
+
+        self.client.force_login(User.objects.create_user('cm', password='x'))
+        self.assertEqual(self.client.get('/bots/rate-limits/').status_code, 302)
+
+    def test_levels_are_exposed_for_monitoring(self):
+        get_bucket('reddit', 'bot').acquire()
+        get_bucket('youtube', 'canal')
+        QuotaLedger('canal').record('youtube.commentThreads.list')
+
+        self.client.force_login(User.objects.create_user('ops', password='x', is_staff=True))
+        response = self.client.get('/bots/rate-limits/')
+
+        levels = response.json()['buckets']
+        self.assertEqual([level['bucket'] for level in levels], ['reddit:bot', 'youtube:canal'])
+        self.assertLess(levels[0]['tokens'], levels[0]['capacity'])
+        quota = response.json()['youtube_quota']
+        self.assertEqual([(usage['account'], usage['used']) for usage in quota], [('canal', 1)])
@@ -0,0 +1,6 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('rate-limits/', views.rate_limits, name='rate_limits'),
+]
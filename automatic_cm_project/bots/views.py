@@ -1,3 +1,20 @@
-from django.shortcuts import render
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from .quota import QuotaLedger
+from .rate_limit import YOUTUBE, bucket_levels, registered_accounts
 
-# Create your views here.
+
+@staff_member_required
+@require_GET
+def rate_limits(request):
+    """
+    Nivel de los rate limiters de llamadas a Reddit y YouTube (tokens
+    disponibles por plataforma y cuenta) y cuota diaria de YouTube
+    consumida por cada cuenta, para monitoreo (solo staff: expone los
+    nombres de las cuentas)
+    """
+    return JsonResponse({
+        'buckets': bucket_levels(),
+        'youtube_quota': [QuotaLedger(account).usage() for account in registered_accounts(YOUTUBE)],
+    })
@@ -1,12 +1,15 @@
 import os
 import pickle
+import threading
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from datetime import datetime
+from datetime import datetime, timedelta, timezone as dt_timezone
 import logging
+from .quota import QuotaLedger
+from .rate_limit import YOUTUBE, RateLimited, get_bucket, youtube_account_name, youtube_request_builder
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +19,165 @@ SCOPES = [
     'https://www.googleapis.com/auth/youtube.readonly'
 ]
 
+# Máximo de IDs/resultados por llamada que acepta la API
+MAX_IDS_PER_REQUEST = 50
+
+# Margen para refrescar el token antes de que expire
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+
+class YouTubeAccount:
+    """
+    Credenciales en memoria y clientes de la API de una cuenta de YouTube.
+    
+    El token se carga del disco una sola vez, se refresca bajo un lock antes
+    de que expire y solo se vuelve a guardar cuando cambia. El cliente de la
+    API se construye con el documento de discovery estático (sin petición de
+    red) y se reutiliza; hay uno por hilo porque httplib2 no es thread-safe.
+    """
+    
+    def __init__(self, credentials_file, token_file):
+        self.credentials_file = credentials_file
+        self.token_file = token_file
+        self.name = youtube_account_name(token_file)
+        # Unidades de cuota consumidas por la cuenta en el día
+        self.quota = QuotaLedger(self.name)
+        self.creds = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+    
+    def get_credentials(self):
+        """
+        Retorna credenciales válidas, refrescándolas si expiran pronto
+        
+        Returns:
+            Credentials: Credenciales OAuth 2.0
+        """
+        with self._lock:
+            if self.creds is None:
+                self.creds = self._load_credentials()
+            
+            if self._needs_refresh(self.creds):
+                try:
+                    self.creds.refresh(Request())
+                    self._save_credentials()
+                    logger.info("Token de YouTube refrescado")
+                except Exception as e:
+                    logger.error(f"Error al refrescar token: {str(e)}")
+                    if not self.creds.valid:
+                        self.creds = self._run_flow()
+            
+            return self.creds
+    
+    def get_service(self):
+        """
+        Retorna el cliente de la API de YouTube del hilo actual
+        
+        Returns:
+            Resource: Cliente de YouTube Data API v3
+        """
+        creds = self.get_credentials()
+        
+        service = getattr(self._local, 'service', None)
+        if service is None or self._local.creds is not creds:
+            # Cada execute() toma un token del bucket de la cuenta y registra su costo de cuota
+            bucket = get_bucket(YOUTUBE, self.name)
+            service = build(
+                'youtube', 'v3', credentials=creds, static_discovery=True,
+                requestBuilder=youtube_request_builder(bucket, self.quota)
+            )
+            self._local.service = service
+            self._local.creds = creds
+        
+        return service
+    
+    def _needs_refresh(self, creds):
+        """True si el token expiró o expira dentro de TOKEN_REFRESH_MARGIN"""
+        if not creds.refresh_token:
+            return False
+        if not creds.token or creds.expiry is None:
+            return not creds.valid
+        # google-auth guarda expiry en UTC sin zona horaria
+        now = datetime.now(dt_timezone.utc).replace(tzinfo=None)
+        return creds.expiry - now < TOKEN_REFRESH_MARGIN
+    
+    def _load_credentials(self):
+        """Carga el token guardado o inicia el login OAuth si no existe"""
+        if os.path.exists(self.token_file):
+            with open(self.token_file, 'rb') as token:
+                creds = pickle.load(token)
+            if creds and (creds.valid or creds.refresh_token):
+                return creds
+        
+        return self._run_flow()
+    
+    def _run_flow(self):
+        """Solicita login con OAuth 2.0 y guarda el token"""
+        if not os.path.exists(self.credentials_file):
+            raise FileNotFoundError(
+                f"No se encontró {self.credentials_file}. "
+                "Descarga el archivo desde Google Cloud Console."
+            )
+        
+        flow = InstalledAppFlow.from_client_secrets_file(
+            self.credentials_file, 
+            SCOPES
+        )
+        self.creds = flow.run_local_server(port=8080)
+        self._save_credentials()
+        return self.creds
+    
+    def _save_credentials(self):
+        """Guarda el token para futuros procesos"""
+        with open(self.token_file, 'wb') as token:
+            pickle.dump(self.creds, token)
+
+
+_accounts = {}
+_accounts_lock = threading.Lock()
+
+
+def get_youtube_account(credentials_file='client_secret.json', token_file='youtube_token.pickle'):
+    """
+    Retorna la cuenta compartida (en memoria del proceso) para un token
+    
+    Args:
+        credentials_file (str): Ruta al archivo client_secret.json
+        token_file (str): Ruta del token de acceso de la cuenta
+        
+    Returns:
+        YouTubeAccount: Cuenta con credenciales y clientes cacheados
+    """
+    key = os.path.abspath(token_file)
+    with _accounts_lock:
+        account = _accounts.get(key)
+        if account is None:
+            account = _accounts[key] = YouTubeAccount(credentials_file, token_file)
+        return account
+
+
+def _reply_data(reply, parent_id):
+    """Convierte una respuesta de la API al formato de get_video_comments"""
+    reply_snippet = reply['snippet']
+    return {
+        'comment_id': reply['id'],
+        'author': reply_snippet['authorDisplayName'],
+        'author_channel_id': reply_snippet.get('authorChannelId', {}).get('value', ''),
+        'content': reply_snippet['textDisplay'],
+        'like_count': reply_snippet.get('likeCount', 0),
+        'published_at': datetime.strptime(
+            reply_snippet['publishedAt'],
+            '%Y-%m-%dT%H:%M:%SZ'
+        ),
+        'updated_at': datetime.strptime(
+            reply_snippet['updatedAt'],
+            '%Y-%m-%dT%H:%M:%SZ'
+        ),
+        'parent_id': parent_id,
+        'is_reply': True
+    }
+
+
 class YouTubeBot:
     def __init__(self, credentials_file='client_secret.json', token_file='youtube_token.pickle'):
         """
@@ -27,47 +189,8 @@ class YouTubeBot:
         """
         self.credentials_file = credentials_file
         self.token_file = token_file
-        self.youtube = None
-        self._authenticate()
-    
-    def _authenticate(self):
-        """Autentica con OAuth 2.0 y crea el cliente de YouTube"""
-        creds = None
-        
-        # Verificar si ya existe un token guardado
-        if os.path.exists(self.token_file):
-            with open(self.token_file, 'rb') as token:
-                creds = pickle.load(token)
-        
-        # Si no hay credenciales válidas, solicitar login
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                try:
-                    creds.refresh(Request())
-                except Exception as e:
-                    logger.error(f"Error al refrescar token: {str(e)}")
-                    creds = None
-            
-            if not creds:
-                if not os.path.exists(self.credentials_file):
-                    raise FileNotFoundError(
-                        f"No se encontró {self.credentials_file}. "
-                        "Descarga el archivo desde Google Cloud Console."
-                    )
-                
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    self.credentials_file, 
-                    SCOPES
-                )
-                creds = flow.run_local_server(port=8080)
-            
-            # Guardar el token para futuros usos
-            with open(self.token_file, 'wb') as token:
-                pickle.dump(creds, token)
-        
-        # Crear el cliente de YouTube
-        self.youtube = build('youtube', 'v3', credentials=creds)
-        logger.info("Autenticación exitosa con YouTube API")
+        self.account = get_youtube_account(credentials_file, token_file)
+        self.youtube = self.account.get_service()
     
     def get_channel_videos(self, channel_id=None, max_results=25):
         """
@@ -75,10 +198,13 @@ class YouTubeBot:
         
         Args:
             channel_id (str, optional): ID del canal. Si no se proporciona, usa el canal autenticado
-            max_results (int): Número máximo de videos a obtener
+            max_results (int, optional): Número máximo de videos a obtener (None = todos)
             
         Returns:
             list: Lista de videos con su información
+            
+        Raises:
+            RateLimited: Si la cuenta no tiene cupo de llamadas
         """
         try:
             if not channel_id:
@@ -106,75 +232,141 @@ class YouTubeBot:
                 
                 uploads_playlist_id = channels_response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
             
-            # Obtener videos de la playlist de uploads
-            playlist_response = self.youtube.playlistItems().list(
-                part='snippet,contentDetails',
-                playlistId=uploads_playlist_id,
-                maxResults=max_results
-            ).execute()
-            
-            videos = []
-            for item in playlist_response.get('items', []):
-                video_id = item['contentDetails']['videoId']
+            # Obtener IDs de la playlist de uploads siguiendo nextPageToken
+            video_ids = []
+            page_token = None
+            while max_results is None or len(video_ids) < max_results:
+                page_size = MAX_IDS_PER_REQUEST
+                if max_results is not None:
+                    page_size = min(page_size, max_results - len(video_ids))
+                
+                playlist_response = self.youtube.playlistItems().list(
+                    part='contentDetails',
+                    playlistId=uploads_playlist_id,
+                    maxResults=page_size,
+                    pageToken=page_token
+                ).execute()
                 
-                # Obtener estadísticas del video
+                video_ids.extend(
+                    item['contentDetails']['videoId']
+                    for item in playlist_response.get('items', [])
+                )
+                
+                page_token = playlist_response.get('nextPageToken')
+                if not page_token:
+                    break
+            
+            if max_results is not None:
+                video_ids = video_ids[:max_results]
+            
+            # Obtener snippet y estadísticas en lotes de hasta 50 IDs por llamada
+            videos_by_id = {}
+            for start in range(0, len(video_ids), MAX_IDS_PER_REQUEST):
+                batch = video_ids[start:start + MAX_IDS_PER_REQUEST]
                 video_response = self.youtube.videos().list(
                     part='snippet,statistics',
-                    id=video_id
+                    id=','.join(batch)
                 ).execute()
                 
-                if video_response.get('items'):
-                    video_data = video_response['items'][0]
-                    videos.append({
-                        'video_id': video_id,
-                        'title': video_data['snippet']['title'],
-                        'description': video_data['snippet']['description'],
-                        'published_at': datetime.strptime(
-                            video_data['snippet']['publishedAt'],
-                            '%Y-%m-%dT%H:%M:%SZ'
-                        ),
-                        'thumbnail_url': video_data['snippet']['thumbnails']['medium']['url'],
-                        'url': f"https://www.youtube.com/watch?v={video_id}",
-                        'view_count': int(video_data['statistics'].get('viewCount', 0)),
-                        'comment_count': int(video_data['statistics'].get('commentCount', 0)),
-                        'channel_title': video_data['snippet']['channelTitle']
-                    })
+                for video_data in video_response.get('items', []):
+                    videos_by_id[video_data['id']] = video_data
+            
+            # Mantener el orden de la playlist (más recientes primero)
+            videos = []
+            for video_id in video_ids:
+                video_data = videos_by_id.get(video_id)
+                if not video_data:
+                    continue
+                
+                videos.append({
+                    'video_id': video_id,
+                    'title': video_data['snippet']['title'],
+                    'description': video_data['snippet']['description'],
+                    'published_at': datetime.strptime(
+                        video_data['snippet']['publishedAt'],
+                        '%Y-%m-%dT%H:%M:%SZ'
+                    ),
+                    'thumbnail_url': video_data['snippet']['thumbnails']['medium']['url'],
+                    'url': f"https://www.youtube.com/watch?v={video_id}",
+                    'view_count': int(video_data['statistics'].get('viewCount', 0)),
+                    'comment_count': int(video_data['statistics'].get('commentCount', 0)),
+                    'channel_title': video_data['snippet']['channelTitle']
+                })
             
             return videos
             
         except HttpError as e:
             logger.error(f"Error HTTP al obtener videos: {str(e)}")
             return []
+        except RateLimited:
+            # Sin cupo en el rate limiter: quien llama difiere la sincronización
+            raise
         except Exception as e:
             logger.error(f"Error al obtener videos: {str(e)}")
             return []
     
-    def get_video_comments(self, video_id, max_results=100):
+    def get_video_comments(self, video_id, max_results=100, watermark=None, reply_counts=None):
         """
-        Obtiene los comentarios de un video
+        Obtiene los comentarios de un video, de los más recientes a los más antiguos
+        
+        Modo incremental: si se pasa `watermark` (published_at, comment_id) del
+        comentario top-level más reciente ya guardado, se deja de paginar al
+        llegar a él, de modo que solo se descargan los comentarios nuevos.
+        Sin `watermark` se hace una resincronización completa.
+        
+        Los hilos se ordenan por la fecha del comentario top-level, así que las
+        respuestas nuevas a hilos anteriores al watermark no aparecen en esas
+        páginas: con `reply_counts` se traen aparte (ver get_new_replies).
         
         Args:
             video_id (str): ID del video
-            max_results (int): Número máximo de comentarios a obtener
+            max_results (int, optional): Número máximo de comentarios a obtener (None = sin límite)
+            watermark (tuple, optional): (published_at, comment_id) del último comentario conocido
+            reply_counts (dict, optional): {comment_id: respuestas guardadas} de los
+                hilos ya conocidos, solo en modo incremental
             
         Returns:
             list: Lista de comentarios con su información
+            
+        Raises:
+            RateLimited: Si la cuenta no tiene cupo de llamadas
         """
         try:
+            since, since_id = None, None
+            if watermark:
+                since, since_id = watermark
+                # Las fechas de la API se parsean sin zona horaria (UTC)
+                if since.tzinfo is not None:
+                    since = since.astimezone(dt_timezone.utc).replace(tzinfo=None)
+            
             comments = []
+            page_size = 100 if max_results is None else min(max_results, 100)
             request = self.youtube.commentThreads().list(
                 part='snippet,replies',
                 videoId=video_id,
-                maxResults=min(max_results, 100),  # API permite máx 100 por request
+                maxResults=page_size,  # API permite máx 100 por request
                 textFormat='plainText',
                 order='time'  # Ordenar por más recientes
             )
             
-            while request and len(comments) < max_results:
+            caught_up = False
+            while request:
                 response = request.execute()
                 
                 for item in response.get('items', []):
                     top_comment = item['snippet']['topLevelComment']['snippet']
+                    published_at = datetime.strptime(
+                        top_comment['publishedAt'],
+                        '%Y-%m-%dT%H:%M:%SZ'
+                    )
+                    
+                    # Alcanzamos comentarios ya guardados: no seguir paginando
+                    if since is not None and (
+                        item['snippet']['topLevelComment']['id'] == since_id or
+                        published_at < since
+                    ):
+                        caught_up = True
+                        break
                     
                     comment_data = {
                         'comment_id': item['snippet']['topLevelComment']['id'],
@@ -182,10 +374,7 @@ class YouTubeBot:
                         'author_channel_id': top_comment.get('authorChannelId', {}).get('value', ''),
                         'content': top_comment['textDisplay'],
                         'like_count': top_comment.get('likeCount', 0),
-                        'published_at': datetime.strptime(
-                            top_comment['publishedAt'],
-                            '%Y-%m-%dT%H:%M:%SZ'
-                        ),
+                        'published_at': published_at,
                         'updated_at': datetime.strptime(
                             top_comment['updatedAt'],
                             '%Y-%m-%dT%H:%M:%SZ'
@@ -198,33 +387,23 @@ class YouTubeBot:
                     # Obtener respuestas al comentario si existen
                     if 'replies' in item:
                         for reply in item['replies']['comments']:
-                            reply_snippet = reply['snippet']
-                            reply_data = {
-                                'comment_id': reply['id'],
-                                'author': reply_snippet['authorDisplayName'],
-                                'author_channel_id': reply_snippet.get('authorChannelId', {}).get('value', ''),
-                                'content': reply_snippet['textDisplay'],
-                                'like_count': reply_snippet.get('likeCount', 0),
-                                'published_at': datetime.strptime(
-                                    reply_snippet['publishedAt'],
-                                    '%Y-%m-%dT%H:%M:%SZ'
-                                ),
-                                'updated_at': datetime.strptime(
-                                    reply_snippet['updatedAt'],
-                                    '%Y-%m-%dT%H:%M:%SZ'
-                                ),
-                                'parent_id': item['snippet']['topLevelComment']['id'],
-                                'is_reply': True
-                            }
-                            comments.append(reply_data)
+                            comments.append(_reply_data(reply, item['snippet']['topLevelComment']['id']))
                 
-                # Siguiente página si existe
-                request = self.youtube.commentThreads().list_next(request, response)
+                if caught_up:
+                    break
                 
-                if len(comments) >= max_results:
+                if max_results is not None and len(comments) >= max_results:
                     break
+                
+                # Siguiente página si existe
+                request = self.youtube.commentThreads().list_next(request, response)
             
-            return comments[:max_results]
+            if max_results is not None:
+                comments = comments[:max_results]
+            
+            if watermark and reply_counts:
+                comments.extend(self.get_new_replies(reply_counts))
+            return comments
             
         except HttpError as e:
             if e.resp.status == 403:
@@ -232,17 +411,63 @@ class YouTubeBot:
             else:
                 logger.error(f"Error HTTP al obtener comentarios: {str(e)}")
             return []
+        except RateLimited:
+            # Sin cupo en el rate limiter: quien llama difiere la sincronización
+            raise
         except Exception as e:
             logger.error(f"Error al obtener comentarios: {str(e)}")
             return []
     
-    def reply_to_comment(self, comment_id, text):
+    def get_new_replies(self, reply_counts):
+        """
+        Obtiene las respuestas de los hilos ya guardados que recibieron
+        respuestas nuevas. Se consulta totalReplyCount en lotes de hasta 50
+        hilos por llamada y solo se descargan las respuestas de los hilos cuyo
+        total supera las guardadas.
+        
+        Args:
+            reply_counts (dict): {comment_id: respuestas guardadas} de cada hilo
+            
+        Returns:
+            list: Respuestas de los hilos con actividad (mismo formato que get_video_comments)
+        """
+        thread_ids = list(reply_counts)
+        changed = []
+        for start in range(0, len(thread_ids), MAX_IDS_PER_REQUEST):
+            batch = thread_ids[start:start + MAX_IDS_PER_REQUEST]
+            response = self.youtube.commentThreads().list(
+                part='snippet',
+                id=','.join(batch),
+                maxResults=MAX_IDS_PER_REQUEST
+            ).execute()
+            
+            for item in response.get('items', []):
+                if item['snippet'].get('totalReplyCount', 0) > reply_counts.get(item['id'], 0):
+                    changed.append(item['id'])
+        
+        replies = []
+        for thread_id in changed:
+            request = self.youtube.comments().list(
+                part='snippet',
+                parentId=thread_id,
+                maxResults=100,
+                textFormat='plainText'
+            )
+            while request:
+                response = request.execute()
+                replies.extend(_reply_data(reply, thread_id) for reply in response.get('items', []))
+                request = self.youtube.comments().list_next(request, response)
+        
+        return replies
+    
+    def reply_to_comment(self, comment_id, text, raise_errors=False):
         """
         Responde a un comentario
         
         Args:
             comment_id (str): ID del comentario (puede ser top-level o reply)
             text (str): Texto de la respuesta
+            raise_errors (bool): Propagar la excepción en lugar de retornar None
             
         Returns:
             str: ID de la respuesta creada o None si falla
@@ -265,9 +490,13 @@ class YouTubeBot:
             
         except HttpError as e:
             logger.error(f"Error HTTP al publicar respuesta: {str(e)}")
+            if raise_errors:
+                raise
             return None
         except Exception as e:
             logger.error(f"Error al publicar respuesta: {str(e)}")
+            if raise_errors:
+                raise
             return None
     
     def test_connection(self):
@@ -0,0 +1,333 @@
+import math
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from celery import shared_task
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from ai_manager.response_generator import ResponseGenerator
+from ai_manager.scheduler import get_scheduler, BACKGROUND
+from bots.rate_limit import RateLimited
+from dashboard.clustering import apply_draft_to_cluster
+from dashboard.models import (
+    Comment, Response, YouTubeComment, YouTubeResponse, RedditPost, YouTubeVideo, SyncSchedule
+)
+from dashboard.snapshots import REDDIT, YOUTUBE
+from dashboard import publishing, sync
+
+logger = logging.getLogger(__name__)
+
+# Resultados posibles de cada comentario en una corrida de borradores
+CREATED = 'created'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+# Dueño de cada tarea de borradores; dura lo mismo que el resultado en Celery (1 día)
+DRAFT_TASK_OWNER_TTL = 60 * 60 * 24
+
+
+def pending_comments(platform, user_id, parent_id=None):
+    """
+    Comentarios del usuario que todavía no tienen respuesta
+
+    Args:
+        platform (str): REDDIT o YOUTUBE
+        user_id (int): Dueño de los posts/videos
+        parent_id (int, optional): pk del post o video (todos si es None)
+
+    Returns:
+        QuerySet: Comentarios sin respuesta, del más antiguo al más nuevo
+    """
+    if platform == REDDIT:
+        comments = Comment.objects.filter(
+            post__user_id=user_id, response__isnull=True
+        ).select_related('post').order_by('created_at')
+        if parent_id is not None:
+            comments = comments.filter(post_id=parent_id)
+    elif platform == YOUTUBE:
+        comments = YouTubeComment.objects.filter(
+            video__user_id=user_id, youtube_response__isnull=True
+        ).select_related('video').order_by('published_at')
+        if parent_id is not None:
+            comments = comments.filter(video_id=parent_id)
+    else:
+        raise ValueError(f"Plataforma no soportada: {platform}")
+
+    return comments
+
+
+def _draft_group(platform, generator, comments, tone):
+    """
+    Genera un borrador para un grupo de comentarios casi idénticos (o uno
+    solo) y lo guarda para cada miembro. Se ejecuta en un hilo del pool.
+
+    Returns:
+        dict: Borradores por resultado {CREATED, SKIPPED, FAILED}; en un
+            cluster CREATED puede superar el tamaño del grupo
+    """
+    comment = comments[0]
+    cluster_id = comment.cluster_id
+    if platform == REDDIT:
+        response_model, context = Response, f"Post: {comment.post.title}"
+    else:
+        response_model, context = YouTubeResponse, f"Video: {comment.video.title}"
+
+    try:
+        # Otro proceso (o el moderador) pudo responder mientras esperaba en la cola
+        answered = set(
+            response_model.objects.filter(comment__in=comments).values_list('comment_id', flat=True)
+        )
+        if len(answered) == len(comments):
+            return {SKIPPED: len(comments)}
+        comment = next(c for c in comments if c.pk not in answered)
+
+        generated_text = generator.generate(
+            comment_text=comment.content,
+            tone=tone,
+            context=context,
+            fallback=False,  # No guardar respuestas de respaldo como borradores
+            priority=BACKGROUND  # Cede el servidor a las generaciones interactivas
+        )
+
+        if cluster_id is not None:
+            # Una sola generación para todo el cluster, incluidos los miembros
+            # del mismo post/video que llegaron después de armar el lote
+            created = apply_draft_to_cluster(platform, cluster_id, generated_text, tone)
+            return {CREATED: created, SKIPPED: len(answered)}
+
+        response_model.objects.create(
+            comment=comment,
+            generated_text=generated_text,
+            tone=tone,
+            status='pending'
+        )
+        return {CREATED: 1}
+    except IntegrityError:
+        # El borrador se creó entre la verificación y el INSERT
+        return {SKIPPED: len(comments)}
+    except Exception as e:
+        logger.error(f"Error al generar borrador para {comment.comment_id}: {str(e)}")
+        return {FAILED: len(comments)}
+    finally:
+        # Cada hilo abre su propia conexión a la base de datos
+        connection.close()
+
+
+@shared_task(bind=True)
+def generate_drafts(self, platform, user_id, parent_id=None, tone='friendly'):
+    """
+    Genera borradores para todos los comentarios sin respuesta de un post,
+    un video o de todo el usuario, con concurrencia limitada contra el
+    servidor de modelos (DRAFT_GENERATION_CONCURRENCY). Se hace una sola
+    generación por cluster de comentarios casi idénticos.
+
+    Args:
+        platform (str): REDDIT o YOUTUBE
+        user_id (int): Dueño de los comentarios
+        parent_id (int, optional): pk del post o video (todos si es None)
+        tone (str): Tono de las respuestas
+
+    Returns:
+        dict: Progreso final {'total', 'done', 'created', 'skipped', 'failed'};
+            'done' son los comentarios del lote procesados y 'created' todos
+            los borradores creados, incluidos los de otros miembros de un cluster
+    """
+    comments = list(pending_comments(platform, user_id, parent_id))
+    progress = {'total': len(comments), 'done': 0, CREATED: 0, SKIPPED: 0, FAILED: 0}
+
+    # Los comentarios casi idénticos (mismo cluster) comparten una generación
+    groups = defaultdict(list)
+    for comment in comments:
+        groups[comment.cluster_id or ('comment', comment.pk)].append(comment)
+
+    def report():
+        # Sin id de tarea (ejecución directa) no hay dónde guardar el progreso
+        if self.request.id:
+            self.update_state(state='PROGRESS', meta=progress)
+
+    report()
+    logger.info(
+        f"Generando {len(comments)} borradores en {len(groups)} grupos ({platform}, usuario {user_id})"
+    )
+
+    generator = ResponseGenerator()
+    with ThreadPoolExecutor(max_workers=settings.DRAFT_GENERATION_CONCURRENCY) as pool:
+        futures = {
+            pool.submit(_draft_group, platform, generator, group, tone): len(group)
+            for group in groups.values()
+        }
+        for future in as_completed(futures):
+            for outcome, count in future.result().items():
+                progress[outcome] += count
+            # 'done' cuenta comentarios del lote procesados (no supera 'total')
+            progress['done'] += futures[future]
+            report()
+
+    logger.info(f"Borradores generados: {progress}")
+    return progress
+
+
+def start_draft_generation(platform, user_id, parent_id=None, tone='friendly'):
+    """
+    Encola generate_drafts si hay comentarios pendientes y guarda en la
+    caché el usuario dueño de la tarea (ver draft_task_owner)
+
+    Returns:
+        dict: {'task_id': str o None, 'pending': int, 'eta_seconds': int}
+    """
+    pending = pending_comments(platform, user_id, parent_id).count()
+    if not pending:
+        return {'task_id': None, 'pending': 0, 'eta_seconds': 0}
+
+    result = generate_drafts.delay(platform, user_id, parent_id, tone)
+    try:
+        cache.set(f"draft-task:{result.id}", user_id, timeout=DRAFT_TASK_OWNER_TTL)
+    except Exception as e:
+        logger.warning(f"No se pudo registrar el dueño de la tarea {result.id}: {str(e)}")
+    return {'task_id': result.id, 'pending': pending, 'eta_seconds': get_scheduler().estimate_batch(pending)}
+
+
+def draft_task_owner(task_id):
+    """
+    Usuario que encoló una tarea de borradores
+
+    Returns:
+        int: user_id, o None si la tarea no existe, expiró o la caché no responde
+    """
+    try:
+        return cache.get(f"draft-task:{task_id}")
+    except Exception as e:
+        logger.warning(f"No se pudo leer el dueño de la tarea {task_id}: {str(e)}")
+        return None
+
+
+def _skip_if_running(func, *args, **kwargs):
+    """Ejecuta una sincronización; si el objetivo está bloqueado la omite"""
+    try:
+        return func(*args, **kwargs)
+    except sync.SyncInProgress as e:
+        logger.info(f"{str(e)}: se omite esta corrida")
+        return {'skipped': True}
+
+
+def _defer_if_rate_limited(task, func, *args):
+    """
+    Ejecuta una sincronización (ver _skip_if_running); si se agota el cupo
+    de llamadas a la plataforma, la tarea se reprograma para cuando lo haya
+    """
+    try:
+        return _skip_if_running(func, *args)
+    except RateLimited as e:
+        logger.info(f"{str(e)}: se reprograma la sincronización")
+        raise task.retry(exc=e, countdown=math.ceil(e.retry_after))
+
+
+@shared_task(bind=True)
+def sync_reddit_posts_task(self, user_id):
+    """Sincroniza los posts nuevos del subreddit para el usuario"""
+    return _defer_if_rate_limited(self, sync.sync_reddit_posts, User.objects.get(pk=user_id))
+
+
+@shared_task(bind=True)
+def sync_youtube_videos_task(self, user_id):
+    """Sincroniza los videos del canal para el usuario"""
+    return _defer_if_rate_limited(self, sync.sync_youtube_videos, User.objects.get(pk=user_id))
+
+
+@shared_task(bind=True)
+def sync_comments_task(self, platform, parent_id):
+    """
+    Sincroniza los comentarios de un post o video
+
+    Args:
+        platform (str): REDDIT o YOUTUBE
+        parent_id (int): pk del post o video
+    """
+    if platform == REDDIT:
+        return _defer_if_rate_limited(self, sync.sync_reddit_comments, RedditPost.objects.get(pk=parent_id))
+    return _defer_if_rate_limited(self, sync.sync_youtube_comments, YouTubeVideo.objects.get(pk=parent_id))
+
+
+@shared_task(bind=True)
+def sync_platform(self, user_id, platform):
+    """
+    Corrida programada de un usuario y plataforma: posts/videos y
+    comentarios recientes. Si la corrida anterior sigue en curso se omite;
+    si se agota el cupo de llamadas se reprograma.
+
+    Returns:
+        dict: Resultado de run_scheduled_sync (o {'skipped': True})
+    """
+    schedule = SyncSchedule.objects.select_related('user').get(user_id=user_id, platform=platform)
+    return _defer_if_rate_limited(self, sync.run_scheduled_sync, schedule)
+
+
+@shared_task
+def dispatch_due_syncs():
+    """
+    Tarea de Celery beat: encola sync_platform para cada usuario y
+    plataforma cuyo intervalo ya se cumplió
+
+    Returns:
+        int: Corridas encoladas
+    """
+    now = timezone.now()
+    due = [schedule for schedule in SyncSchedule.objects.filter(enabled=True) if schedule.is_due(now)]
+    for schedule in due:
+        sync_platform.delay(schedule.user_id, schedule.platform)
+    return len(due)
+
+
+@shared_task
+def drain_publish_outbox(platform):
+    """
+    Publica las respuestas en cola de una plataforma y se vuelve a
+    programar para el siguiente intento pendiente (reintentos o pausa
+    por rate limit). Si otro worker ya está publicando se omite.
+
+    Args:
+        platform (str): REDDIT o YOUTUBE
+
+    Returns:
+        dict: Resultado de publishing.drain_outbox (o {'skipped': True})
+    """
+    result = _skip_if_running(publishing.drain_outbox, platform)
+    if result.get('next_in') is not None:
+        drain_publish_outbox.apply_async((platform,), countdown=math.ceil(result['next_in']))
+    return result
+
+
+@shared_task
+def dispatch_publish_outbox():
+    """
+    Tarea de Celery beat: lanza el drenado de las plataformas con
+    respuestas listas para publicar (por si una tarea programada se perdió)
+
+    Returns:
+        list: Plataformas con drenado encolado
+    """
+    due = [platform for platform in (REDDIT, YOUTUBE) if publishing.seconds_until_next(platform) == 0]
+    for platform in due:
+        drain_publish_outbox.delay(platform)
+    return due
+
+
+def start_publishing(platform, response_ids):
+    """
+    Pone las respuestas en la cola de publicación y lanza el worker que la
+    drena (al confirmar la transacción, para que vea las respuestas encoladas)
+
+    Args:
+        platform (str): REDDIT o YOUTUBE
+        response_ids (iterable): IDs (pk) de las respuestas
+
+    Returns:
+        dict: {'queued': respuestas encoladas}
+    """
+    queued = publishing.enqueue(platform, response_ids)
+    if queued:
+        transaction.on_commit(lambda: drain_publish_outbox.delay(platform))
+    return {'queued': queued}
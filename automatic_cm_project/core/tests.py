@@ -1,3 +1,267 @@
-from django.test import TestCase
+from unittest.mock import MagicMock, patch
+from celery.exceptions import Retry
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from datetime import timedelta
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from ai_manager.scheduler import BACKGROUND
+from bots.rate_limit import RateLimited
+from dashboard.clustering import cluster_new_comments
+from dashboard import sync
+from dashboard.models import RedditPost, Comment, Response, SyncSchedule
+from dashboard.snapshots import REDDIT
+from .tasks import (
+    dispatch_due_syncs, dispatch_publish_outbox, drain_publish_outbox,
+    generate_drafts, pending_comments, sync_platform
+)
 
-# Create your tests here.
+LOCMEM_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+}
+
+
+def make_post(user, index):
+    return RedditPost.objects.create(
+        user=user,
+        post_id=f'p{index}',
+        title=f'Post {index}',
+        url='https://reddit.com/',
+        permalink='https://reddit.com/',
+        subreddit='ACM_Magneto',
+        author='autor',
+        created_at=timezone.now()
+    )
+
+
+def make_comment(post, index, content='Hola'):
+    return Comment.objects.create(
+        post=post,
+        comment_id=f'{post.post_id}c{index}',
+        author='usuario',
+        content=content,
+        permalink='https://reddit.com/',
+        created_at=timezone.now()
+    )
+
+
+def fake_generate(comment_text, tone, context, fallback, priority):
+    if comment_text == 'falla' or priority != BACKGROUND:
+        raise RuntimeError('modelo caído')
+    return f'Respuesta a {comment_text}'
+
+
+# Los hilos del pool abren sus propias conexiones: necesitan datos confirmados.
+# Un solo hilo: la base SQLite en memoria de los tests bloquea escrituras concurrentes
+@override_settings(CACHES=LOCMEM_CACHE, DRAFT_GENERATION_CONCURRENCY=1)
+class GenerateDraftsTaskTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cm', password='x')
+        self.post = make_post(self.user, 1)
+        # El progreso se guarda en el backend de resultados (Redis), que no existe en los tests
+        update_state = patch.object(generate_drafts, 'update_state')
+        update_state.start()
+        self.addCleanup(update_state.stop)
+
+    def test_drafts_only_unanswered_comments(self):
+        answered = make_comment(self.post, 1)
+        Response.objects.create(comment=answered, generated_text='ya', tone='formal')
+        make_comment(self.post, 2, 'gracias')
+        make_comment(self.post, 3, 'falla')
+        make_comment(make_post(self.user, 2), 1, 'otro post')
+
+        with patch('core.tasks.ResponseGenerator.generate', side_effect=fake_generate):
+            progress = generate_drafts.apply(args=(REDDIT, self.user.id, self.post.pk)).get()
+
+        self.assertEqual(progress, {'total': 2, 'done': 2, 'created': 1, 'skipped': 0, 'failed': 1})
+        self.assertEqual(
+            Response.objects.get(comment__comment_id='p1c2').generated_text,
+            'Respuesta a gracias'
+        )
+        self.assertEqual(Response.objects.get(comment=answered).generated_text, 'ya')
+        self.assertFalse(Response.objects.filter(comment__comment_id='p2c1').exists())
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.unread_total, 3)
+
+
+    def test_one_generation_per_cluster(self):
+        for index in range(3):
+            make_comment(self.post, index, 'quiero participar')
+        make_comment(self.post, 3, 'otra pregunta distinta')
+        cluster_new_comments(REDDIT, self.post)
+
+        with patch('core.tasks.ResponseGenerator.generate', side_effect=fake_generate) as generate:
+            progress = generate_drafts.apply(args=(REDDIT, self.user.id)).get()
+
+        self.assertEqual(generate.call_count, 2)
+        self.assertEqual(progress['created'], 4)
+        self.assertEqual(
+            Response.objects.filter(generated_text='Respuesta a quiero participar').count(), 3
+        )
+
+    def test_cluster_drafts_outside_the_batch_are_reported(self):
+        members = [make_comment(self.post, index, 'quiero participar') for index in range(3)]
+        cluster_new_comments(REDDIT, self.post)
+
+        # El lote solo trae un miembro (los otros llegaron después de listarlo)
+        with patch('core.tasks.pending_comments', return_value=[Comment.objects.get(pk=members[0].pk)]), \
+                patch('core.tasks.ResponseGenerator.generate', side_effect=fake_generate):
+            progress = generate_drafts.apply(args=(REDDIT, self.user.id)).get()
+
+        self.assertEqual(progress, {'total': 1, 'done': 1, 'created': 3, 'skipped': 0, 'failed': 0})
+        self.assertEqual(Response.objects.filter(comment__in=members).count(), 3)
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DraftViewsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cm', password='x')
+        self.client.force_login(self.user)
+        self.post = make_post(self.user, 1)
+
+    def test_pending_comments_scope(self):
+        make_comment(self.post, 1)
+        make_comment(make_post(self.user, 2), 1)
+        other = User.objects.create_user('otro', password='x')
+        make_comment(make_post(other, 3), 1)
+
+        self.assertEqual(pending_comments(REDDIT, self.user.id).count(), 2)
+        self.assertEqual(pending_comments(REDDIT, self.user.id, self.post.pk).count(), 1)
+
+    def test_post_view_enqueues_task(self):
+        make_comment(self.post, 1)
+        with patch('core.tasks.generate_drafts.delay', return_value=MagicMock(id='t1')) as delay:
+            response = self.client.post(f'/dashboard/reddit/post/{self.post.post_id}/generate-drafts/')
+
+        self.assertEqual(response.json(), {'success': True, 'task_id': 't1', 'pending': 1, 'eta_seconds': 5})
+        delay.assert_called_once_with(REDDIT, self.user.id, self.post.pk, 'friendly')
+
+    def test_status_is_only_visible_to_the_owner(self):
+        make_comment(self.post, 1)
+        with patch('core.tasks.generate_drafts.delay', return_value=MagicMock(id='t1')):
+            self.client.post(f'/dashboard/reddit/post/{self.post.post_id}/generate-drafts/')
+
+        with patch('dashboard.views.AsyncResult') as async_result:
+            async_result.return_value.configure_mock(
+                state='SUCCESS', result={'total': 1, 'done': 1},
+                **{'successful.return_value': True, 'failed.return_value': False, 'ready.return_value': True}
+            )
+            response = self.client.get('/dashboard/drafts/t1/status/')
+            self.assertEqual(response.json()['progress'], {'total': 1, 'done': 1})
+
+            self.client.force_login(User.objects.create_user('otro', password='x'))
+            self.assertEqual(self.client.get('/dashboard/drafts/t1/status/').status_code, 404)
+            self.assertEqual(self.client.get('/dashboard/drafts/desconocida/status/').status_code, 404)
+
+    def test_nothing_pending_does_not_enqueue(self):
+        with patch('core.tasks.generate_drafts.delay') as delay:
+            response = self.client.post('/dashboard/reddit/generate-drafts/')
+
+        self.assertIsNone(response.json()['task_id'])
+        delay.assert_not_called()
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SyncTasksTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cm', password='x')
+        self.post = make_post(self.user, 1)
+        self.schedule = SyncSchedule.objects.create(user=self.user, platform=REDDIT, interval_minutes=15)
+
+        bot = patch('dashboard.sync.RedditBot')
+        self.bot = bot.start().return_value
+        self.addCleanup(bot.stop)
+        self.bot.get_subreddit_posts.return_value = []
+        self.bot.get_post_comments.return_value = []
+
+    def test_dispatch_enqueues_only_due_schedules(self):
+        other = User.objects.create_user('otro', password='x')
+        SyncSchedule.objects.create(
+            user=other, platform=REDDIT, last_started_at=timezone.now() - timedelta(minutes=5)
+        )
+        SyncSchedule.objects.create(user=other, platform='youtube', enabled=False)
+
+        with patch('core.tasks.sync_platform.delay') as delay:
+            self.assertEqual(dispatch_due_syncs(), 1)
+        delay.assert_called_once_with(self.user.id, REDDIT)
+
+    def test_run_records_duration_and_skips_locked_targets(self):
+        second = make_post(self.user, 2)
+        with sync.target_lock(f'{REDDIT}:post:{second.post_id}'):
+            result = sync_platform(self.user.id, REDDIT)
+
+        self.assertEqual(result['targets'], 2)
+        self.assertEqual(result['skipped'], 1)
+        self.bot.get_post_comments.assert_called_once_with(self.post.post_id)
+
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.last_status, SyncSchedule.Status.OK)
+        self.assertIsNotNone(self.schedule.last_duration_ms)
+        self.assertIsNotNone(self.schedule.last_finished_at)
+
+    def test_overlapping_run_is_skipped(self):
+        with sync.target_lock(f'{REDDIT}:user:{self.user.id}'):
+            self.assertEqual(sync_platform(self.user.id, REDDIT), {'skipped': True})
+
+        self.bot.get_subreddit_posts.assert_not_called()
+        self.schedule.refresh_from_db()
+        self.assertIsNone(self.schedule.last_started_at)
+
+    def test_manual_sync_conflicts_with_running_sync(self):
+        self.client.force_login(self.user)
+        with sync.target_lock(f'{REDDIT}:post:{self.post.post_id}'):
+            response = self.client.post(f'/dashboard/reddit/post/{self.post.post_id}/sync-comments/')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(response.json()['success'])
+
+    def test_rate_limited_run_keeps_partial_result_and_is_retried(self):
+        self.bot.get_post_comments.side_effect = RateLimited('reddit:bot', 12.5)
+
+        with patch.object(sync_platform, 'retry', side_effect=Retry()) as retry:
+            with self.assertRaises(Retry):
+                sync_platform(self.user.id, REDDIT)
+
+        self.assertEqual(retry.call_args.kwargs['countdown'], 13)
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.last_status, SyncSchedule.Status.ERROR)
+        self.assertEqual(self.schedule.last_result['targets'], 1)
+        self.assertIn('reddit:bot', self.schedule.last_error)
+
+    def test_manual_sync_without_quota_returns_retry_after(self):
+        self.client.force_login(self.user)
+        self.bot.get_post_comments.side_effect = RateLimited('reddit:bot', 4.2)
+
+        response = self.client.post(f'/dashboard/reddit/post/{self.post.post_id}/sync-comments/')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '5')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class PublishTasksTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('cm', password='x')
+        comment = make_comment(make_post(user, 1), 1)
+        self.response = Response.objects.create(comment=comment, generated_text='a', tone='friendly')
+
+    def test_drain_reschedules_itself_for_pending_retries(self):
+        Response.objects.filter(pk=self.response.pk).update(
+            status='queued', next_attempt_at=timezone.now() + timedelta(seconds=90)
+        )
+        with patch('core.tasks.drain_publish_outbox.apply_async') as apply_async, \
+                patch('dashboard.publishing.RedditBot'):
+            result = drain_publish_outbox(REDDIT)
+
+        self.assertEqual(result['published'], 0)
+        countdown = apply_async.call_args.kwargs['countdown']
+        self.assertTrue(85 <= countdown <= 90)
+
+    def test_beat_dispatches_only_platforms_with_due_responses(self):
+        with patch('core.tasks.drain_publish_outbox.delay') as delay:
+            self.assertEqual(dispatch_publish_outbox(), [])
+            Response.objects.filter(pk=self.response.pk).update(status='queued', next_attempt_at=timezone.now())
+            self.assertEqual(dispatch_publish_outbox(), [REDDIT])
+        delay.assert_called_once_with(REDDIT)
@@ -1,13 +1,33 @@
 from django.contrib import admin
-from .models import RedditPost, Comment, Response
+from .models import RedditPost, Comment, Response, SubredditCursor, CommentCluster, SyncSchedule
 
 
 @admin.register(RedditPost)
 class RedditPostAdmin(admin.ModelAdmin):
-    list_display = ('title', 'subreddit', 'author', 'created_at', 'is_active', 'unread_comments_count')
+    list_display = ('title', 'subreddit', 'author', 'created_at', 'is_active', 'comments_total', 'unread_total')
     list_filter = ('subreddit', 'is_active', 'created_at')
     search_fields = ('title', 'author', 'post_id')
-    readonly_fields = ('post_id', 'created_at', 'last_checked')
+    readonly_fields = ('post_id', 'created_at', 'last_checked', 'comments_total', 'unread_total')
+
+
+@admin.register(SubredditCursor)
+class SubredditCursorAdmin(admin.ModelAdmin):
+    list_display = ('subreddit', 'fullname', 'updated_at')
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(SyncSchedule)
+class SyncScheduleAdmin(admin.ModelAdmin):
+    list_display = ('user', 'platform', 'interval_minutes', 'enabled', 'last_started_at', 'last_duration_ms', 'last_status')
+    list_filter = ('platform', 'enabled', 'last_status')
+    readonly_fields = ('last_started_at', 'last_finished_at', 'last_duration_ms', 'last_status', 'last_result', 'last_error')
+
+
+@admin.register(CommentCluster)
+class CommentClusterAdmin(admin.ModelAdmin):
+    list_display = ('id', 'scope', 'created_at')
+    search_fields = ('scope',)
+    readonly_fields = ('scope', 'signature', 'created_at')
 
 
 @admin.register(Comment)
@@ -15,7 +35,7 @@ class CommentAdmin(admin.ModelAdmin):
     list_display = ('author', 'post', 'created_at', 'get_status')
     list_filter = ('created_at', 'fetched_at')
     search_fields = ('author', 'content', 'comment_id')
-    readonly_fields = ('comment_id', 'created_at', 'fetched_at')
+    readonly_fields = ('comment_id', 'created_at', 'fetched_at', 'cluster')
 
     def get_status(self, obj):
         try:
@@ -39,17 +59,17 @@ from .models import YouTubeVideo, YouTubeComment, YouTubeResponse
 
 @admin.register(YouTubeVideo)
 class YouTubeVideoAdmin(admin.ModelAdmin):
-    list_display = ('title', 'channel_title', 'published_at', 'view_count', 'comment_count', 'is_active')
+    list_display = ('title', 'channel_title', 'published_at', 'view_count', 'comment_count', 'unread_total', 'is_active')
     list_filter = ('is_active', 'published_at')
     search_fields = ('title', 'video_id', 'channel_title')
-    readonly_fields = ('video_id', 'published_at', 'last_checked')
+    readonly_fields = ('video_id', 'published_at', 'last_checked', 'comments_total', 'unread_total')
 
 @admin.register(YouTubeComment)
 class YouTubeCommentAdmin(admin.ModelAdmin):
     list_display = ('author', 'video', 'published_at', 'like_count', 'get_status')
     list_filter = ('is_reply', 'published_at')
     search_fields = ('author', 'content', 'comment_id')
-    readonly_fields = ('comment_id', 'published_at', 'fetched_at')
+    readonly_fields = ('comment_id', 'published_at', 'fetched_at', 'cluster')
     
     def get_status(self, obj):
         return obj.status_badge['text']
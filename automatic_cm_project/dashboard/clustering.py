@@ -0,0 +1,221 @@
+import hashlib
+import random
+from collections import defaultdict
+from django.db import transaction
+from ai_manager.reply_cache import normalize_comment
+from .counters import refresh_reddit_counters, refresh_youtube_counters
+from .models import (
+    Comment, Response, YouTubeComment, YouTubeResponse, CommentCluster, LSHBucket
+)
+from .snapshots import invalidate_dashboard_snapshot, REDDIT, YOUTUBE
+
+# MinHash: NUM_PERM permutaciones agrupadas en BANDS bandas de ROWS filas.
+# Con 16 bandas de 4 filas, dos comentarios con similitud 0.7 coinciden en
+# al menos una banda con probabilidad ~0.98 y con similitud 0.3 ~0.12
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+
+# Similitud de Jaccard estimada mínima para unirse a un cluster
+CLUSTER_THRESHOLD = 0.7
+
+# Claves por consulta IN (límite de parámetros de SQLite)
+LOOKUP_BATCH_SIZE = 500
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(2024)  # Semilla fija: las firmas guardadas deben seguir siendo comparables
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+# Modelo de comentario, campo del padre y relación con la respuesta de cada plataforma
+CLUSTER_TARGETS = {
+    REDDIT: (Comment, Response, 'post', 'response'),
+    YOUTUBE: (YouTubeComment, YouTubeResponse, 'video', 'youtube_response'),
+}
+
+COUNTER_REFRESHERS = {
+    REDDIT: refresh_reddit_counters,
+    YOUTUBE: refresh_youtube_counters,
+}
+
+
+def _shingles(text):
+    """Conjunto de n-gramas de caracteres del texto normalizado"""
+    text = normalize_comment(text)
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def comment_signature(text):
+    """
+    Firma MinHash del comentario
+
+    Args:
+        text (str): Contenido del comentario
+
+    Returns:
+        list: NUM_PERM enteros
+    """
+    hashes = [_hash64(shingle) for shingle in _shingles(text)]
+    return [
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def estimate_similarity(signature, other):
+    """Similitud de Jaccard estimada entre dos firmas"""
+    return sum(x == y for x, y in zip(signature, other)) / NUM_PERM
+
+
+def band_keys(signature):
+    """Una clave por banda: dos firmas son candidatas si comparten alguna"""
+    return [
+        f"{band}:{hashlib.blake2b(repr(signature[band * ROWS:(band + 1) * ROWS]).encode(), digest_size=8).hexdigest()}"
+        for band in range(BANDS)
+    ]
+
+
+def _scope(platform, parent):
+    return f"{platform}:{parent.pk}"
+
+
+def cluster_new_comments(platform, parent):
+    """
+    Asigna un cluster a los comentarios del post/video que aún no tienen uno.
+    Cada comentario solo se compara contra los clusters que comparten alguna
+    banda LSH con él (consulta por índice), no contra todo el hilo.
+
+    Args:
+        platform (str): REDDIT o YOUTUBE
+        parent (RedditPost | YouTubeVideo): Post o video de los comentarios
+
+    Returns:
+        int: Comentarios asignados
+    """
+    comment_model, _, parent_field, _ = CLUSTER_TARGETS[platform]
+    scope = _scope(platform, parent)
+
+    comments = list(
+        comment_model.objects.filter(
+            **{parent_field: parent, 'cluster__isnull': True}
+        ).order_by('pk').only('pk', 'content')
+    )
+    if not comments:
+        return 0
+
+    signatures = {comment.pk: comment_signature(comment.content) for comment in comments}
+    keys = {pk: band_keys(signature) for pk, signature in signatures.items()}
+
+    # Buckets existentes que comparten alguna banda con los comentarios nuevos
+    buckets = defaultdict(set)
+    all_keys = list({key for comment_keys in keys.values() for key in comment_keys})
+    for start in range(0, len(all_keys), LOOKUP_BATCH_SIZE):
+        for key, cluster_id in LSHBucket.objects.filter(
+            scope=scope, key__in=all_keys[start:start + LOOKUP_BATCH_SIZE]
+        ).values_list('key', 'cluster_id'):
+            buckets[key].add(cluster_id)
+
+    candidate_ids = list(set().union(*buckets.values()))
+    cluster_signatures = {}
+    for start in range(0, len(candidate_ids), LOOKUP_BATCH_SIZE):
+        cluster_signatures.update(
+            CommentCluster.objects.filter(
+                pk__in=candidate_ids[start:start + LOOKUP_BATCH_SIZE]
+            ).values_list('pk', 'signature')
+        )
+
+    # Los clusters creados en esta corrida se referencian como ('new', índice)
+    new_clusters = []
+    assignments = []
+    for comment in comments:
+        signature = signatures[comment.pk]
+        candidates = set().union(*(buckets.get(key, ()) for key in keys[comment.pk]))
+
+        best, best_similarity = None, CLUSTER_THRESHOLD
+        for ref in candidates:
+            similarity = estimate_similarity(signature, cluster_signatures[ref])
+            if similarity >= best_similarity:
+                best, best_similarity = ref, similarity
+
+        if best is None:
+            best = ('new', len(new_clusters))
+            new_clusters.append(CommentCluster(scope=scope, signature=signature))
+            cluster_signatures[best] = signature
+            for key in keys[comment.pk]:
+                buckets[key].add(best)
+
+        assignments.append((comment, best))
+
+    with transaction.atomic():
+        CommentCluster.objects.bulk_create(new_clusters)
+        LSHBucket.objects.bulk_create([
+            LSHBucket(cluster=cluster, scope=scope, key=key)
+            for cluster in new_clusters
+            for key in band_keys(cluster.signature)
+        ], batch_size=LOOKUP_BATCH_SIZE)
+
+        for comment, ref in assignments:
+            comment.cluster_id = new_clusters[ref[1]].pk if isinstance(ref, tuple) else ref
+        comment_model.objects.bulk_update(
+            [comment for comment, _ in assignments], ['cluster'], batch_size=LOOKUP_BATCH_SIZE
+        )
+
+    return len(assignments)
+
+
+def pending_cluster_members(platform, cluster_id):
+    """Comentarios del cluster que todavía no tienen respuesta"""
+    comment_model, _, _, response_field = CLUSTER_TARGETS[platform]
+    return comment_model.objects.filter(
+        cluster_id=cluster_id, **{f'{response_field}__isnull': True}
+    )
+
+
+def apply_draft_to_cluster(platform, cluster_id, text, tone):
+    """
+    Crea el mismo borrador para todos los comentarios del cluster sin respuesta
+
+    Args:
+        platform (str): REDDIT o YOUTUBE
+        cluster_id (int): Cluster de comentarios casi idénticos
+        text (str): Texto del borrador
+        tone (str): Tono del borrador
+
+    Returns:
+        int: Borradores creados
+    """
+    _, response_model, parent_field, _ = CLUSTER_TARGETS[platform]
+    members = list(
+        pending_cluster_members(platform, cluster_id).values_list(
+            'pk', f'{parent_field}_id', f'{parent_field}__user_id'
+        )
+    )
+    if not members:
+        return 0
+
+    # bulk_create no envía señales: los contadores se actualizan en la misma transacción
+    pending = pending_cluster_members(platform, cluster_id).filter(pk__in=[pk for pk, _, _ in members])
+    with transaction.atomic():
+        # Los miembros respondidos mientras tanto se omiten por el conflicto:
+        # solo cuentan los que dejaron de estar pendientes con este INSERT
+        before = pending.count()
+        response_model.objects.bulk_create([
+            response_model(comment_id=pk, generated_text=text, tone=tone, status='pending')
+            for pk, _, _ in members
+        ], ignore_conflicts=True)
+        created = before - pending.count()
+        COUNTER_REFRESHERS[platform]({parent_id for _, parent_id, _ in members})
+
+    for user_id in {user_id for _, _, user_id in members}:
+        invalidate_dashboard_snapshot(user_id, platform)
+
+    return created
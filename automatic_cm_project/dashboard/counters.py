@@ -0,0 +1,67 @@
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from .models import (
+    RedditPost, Comment, Response,
+    YouTubeVideo, YouTubeComment, YouTubeResponse
+)
+
+
+def _count_subquery(queryset, fk_field):
+    """Subconsulta que cuenta las filas de `queryset` agrupadas por `fk_field`"""
+    counted = queryset.order_by().values(fk_field).annotate(
+        total=Count('pk')
+    ).values('total')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def refresh_reddit_counters(post_ids=None):
+    """
+    Recalcula comments_total y unread_total de los posts indicados
+    con un único UPDATE (todos los posts si post_ids es None)
+
+    Args:
+        post_ids (iterable, optional): IDs (pk) de los posts a recalcular
+
+    Returns:
+        int: Número de posts actualizados
+    """
+    comments = Comment.objects.filter(post=OuterRef('pk'))
+    unread = comments.filter(
+        Q(response__isnull=True) | Q(response__status=Response.Status.PENDING)
+    )
+
+    posts = RedditPost.objects.all()
+    if post_ids is not None:
+        posts = posts.filter(pk__in=list(post_ids))
+
+    return posts.update(
+        comments_total=_count_subquery(comments, 'post'),
+        unread_total=_count_subquery(unread, 'post')
+    )
+
+
+def refresh_youtube_counters(video_ids=None):
+    """
+    Recalcula comments_total y unread_total de los videos indicados
+    con un único UPDATE (todos los videos si video_ids es None)
+
+    Args:
+        video_ids (iterable, optional): IDs (pk) de los videos a recalcular
+
+    Returns:
+        int: Número de videos actualizados
+    """
+    comments = YouTubeComment.objects.filter(video=OuterRef('pk'))
+    unread = comments.filter(
+        Q(youtube_response__isnull=True) |
+        Q(youtube_response__status=YouTubeResponse.Status.PENDING)
+    )
+
+    videos = YouTubeVideo.objects.all()
+    if video_ids is not None:
+        videos = videos.filter(pk__in=list(video_ids))
+
+    return videos.update(
+        comments_total=_count_subquery(comments, 'video'),
+        unread_total=_count_subquery(unread, 'video')
+    )
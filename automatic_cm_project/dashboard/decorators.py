@@ -0,0 +1,37 @@
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from ai_manager.scheduler import get_scheduler, INTERACTIVE
+
+
+def busy_response(eta_seconds, waiting=None):
+    """
+    Respuesta 429 con el tiempo estimado de espera (cuerpo y cabecera
+    Retry-After) cuando el servidor de modelos está saturado
+    """
+    response = JsonResponse({
+        'success': False,
+        'queued': waiting,
+        'eta_seconds': eta_seconds,
+        'error': f"El servidor de IA está ocupado, intenta de nuevo en {eta_seconds} s"
+    }, status=429)
+    response['Retry-After'] = str(eta_seconds)
+    return response
+
+
+def admission_control(view):
+    """
+    Rechaza con 429 las generaciones interactivas cuando la cola del
+    servidor de modelos supera LLM_MAX_INTERACTIVE_QUEUE, indicando el
+    tiempo estimado de espera (cuerpo y cabecera Retry-After).
+    Para vistas asíncronas; solo aplica a POST.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method == 'POST':
+            admission = await sync_to_async(get_scheduler().admit)(INTERACTIVE)
+            if not admission['admitted']:
+                return busy_response(admission['eta_seconds'], admission['waiting'])
+        return await view(request, *args, **kwargs)
+
+    return wrapper
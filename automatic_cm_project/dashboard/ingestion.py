@@ -0,0 +1,216 @@
+from datetime import timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .clustering import cluster_new_comments
+from .counters import refresh_reddit_counters, refresh_youtube_counters
+from .models import Comment, YouTubeComment
+from .snapshots import invalidate_dashboard_snapshot, REDDIT, YOUTUBE
+
+# Filas por INSERT en bulk_create
+INGEST_BATCH_SIZE = 500
+
+
+def _aware(value):
+    """Las fechas de los bots llegan sin zona horaria (UTC)"""
+    if value is not None and timezone.is_naive(value):
+        return timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def _bulk_upsert(model, rows, mutable_fields, batch_size):
+    """
+    Inserta filas nuevas y actualiza los campos mutables de las existentes
+    con bulk_create(update_conflicts=True). Debe llamarse dentro de una transacción.
+
+    Args:
+        model (Model): Modelo de comentario
+        rows (list): Instancias sin guardar, una por comment_id
+        mutable_fields (list): Campos que se actualizan si el comentario ya existe
+        batch_size (int): Filas por INSERT
+
+    Returns:
+        dict: {'inserted': int, 'updated': int}
+    """
+    # Si el mismo comentario llega dos veces, se queda la última versión
+    by_id = {row.comment_id: row for row in rows}
+
+    # Prefetch de los comentarios existentes, por bloques para no exceder
+    # el límite de parámetros de SQLite
+    ids = list(by_id)
+    existing = {}
+    for start in range(0, len(ids), batch_size):
+        existing.update(
+            (values[0], values[1:])
+            for values in model.objects.filter(
+                comment_id__in=ids[start:start + batch_size]
+            ).values_list('comment_id', *mutable_fields)
+        )
+
+    new_rows = []
+    changed_rows = []
+    for comment_id, row in by_id.items():
+        if comment_id not in existing:
+            new_rows.append(row)
+        elif tuple(getattr(row, f) for f in mutable_fields) != existing[comment_id]:
+            changed_rows.append(row)
+
+    if new_rows or changed_rows:
+        model.objects.bulk_create(
+            new_rows + changed_rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['comment_id'],
+            update_fields=mutable_fields
+        )
+
+    return {'inserted': len(new_rows), 'updated': len(changed_rows)}
+
+
+def ingest_reddit_comments(post, comments_data, batch_size=INGEST_BATCH_SIZE):
+    """
+    Guarda en bloque los comentarios obtenidos por RedditBot.get_post_comments
+
+    Args:
+        post (RedditPost): Post al que pertenecen los comentarios
+        comments_data (list): Comentarios tal como los retorna el bot
+        batch_size (int): Filas por INSERT
+
+    Returns:
+        dict: {'inserted': int, 'updated': int}
+    """
+    rows = [
+        Comment(
+            post=post,
+            comment_id=data['comment_id'],
+            author=data['author'],
+            content=data['content'],
+            permalink=data['permalink'],
+            parent_id=data['parent_id'],
+            created_at=_aware(data['created_at'])
+        )
+        for data in comments_data
+    ]
+
+    # bulk_create no envía señales: los contadores se actualizan en la misma transacción
+    # (solo cambian si hay comentarios nuevos)
+    with transaction.atomic():
+        result = _bulk_upsert(Comment, rows, ['content'], batch_size)
+        if result['inserted']:
+            refresh_reddit_counters([post.pk])
+
+    if result['inserted']:
+        invalidate_dashboard_snapshot(post.user_id, REDDIT)
+        cluster_new_comments(REDDIT, post)
+
+    return result
+
+
+def youtube_comment_watermark(video):
+    """
+    Retorna (published_at, comment_id) del comentario top-level más reciente
+    guardado para el video, o None si aún no hay comentarios
+
+    Args:
+        video (YouTubeVideo): Video a consultar
+
+    Returns:
+        tuple: Watermark para YouTubeBot.get_video_comments
+    """
+    return YouTubeComment.objects.filter(
+        video=video, is_reply=False
+    ).order_by('-published_at', '-comment_id').values_list(
+        'published_at', 'comment_id'
+    ).first()
+
+
+def active_youtube_threads(video, now=None):
+    """
+    Hilos (comentarios top-level) del video con actividad en los últimos
+    SYNC_REPLY_WINDOW_DAYS: publicados o con alguna respuesta en ese periodo,
+    del más activo al menos activo
+
+    Args:
+        video (YouTubeVideo): Video a consultar
+        now (datetime, optional): Fin del periodo
+
+    Returns:
+        QuerySet: Comentarios top-level anotados con 'last_activity'
+    """
+    since = (now or timezone.now()) - timedelta(days=settings.SYNC_REPLY_WINDOW_DAYS)
+    last_reply = YouTubeComment.objects.filter(
+        video=video, parent_id=OuterRef('comment_id')
+    ).order_by('-published_at').values('published_at')[:1]
+    return YouTubeComment.objects.filter(video=video, is_reply=False).annotate(
+        last_activity=Greatest('published_at', Coalesce(Subquery(last_reply), 'published_at'))
+    ).filter(last_activity__gte=since).order_by('-last_activity')
+
+
+def youtube_reply_counts(video, now=None):
+    """
+    Retorna cuántas respuestas hay guardadas de los hilos activos del video
+    (ver active_youtube_threads, hasta SYNC_REPLY_MAX_THREADS), para detectar
+    respuestas nuevas a hilos anteriores al watermark. Los hilos sin
+    actividad reciente solo se revisan en la resincronización completa.
+
+    Args:
+        video (YouTubeVideo): Video a consultar
+        now (datetime, optional): Momento de la sincronización
+
+    Returns:
+        dict: {comment_id: respuestas guardadas} para YouTubeBot.get_video_comments
+    """
+    thread_ids = list(
+        active_youtube_threads(video, now).values_list('comment_id', flat=True)[:settings.SYNC_REPLY_MAX_THREADS]
+    )
+    replies = dict(
+        YouTubeComment.objects.filter(video=video, is_reply=True, parent_id__in=thread_ids)
+        .values_list('parent_id').annotate(total=Count('pk')).order_by()
+    )
+    return {thread_id: replies.get(thread_id, 0) for thread_id in thread_ids}
+
+
+def ingest_youtube_comments(video, comments_data, batch_size=INGEST_BATCH_SIZE):
+    """
+    Guarda en bloque los comentarios obtenidos por YouTubeBot.get_video_comments
+
+    Args:
+        video (YouTubeVideo): Video al que pertenecen los comentarios
+        comments_data (list): Comentarios tal como los retorna el bot
+        batch_size (int): Filas por INSERT
+
+    Returns:
+        dict: {'inserted': int, 'updated': int}
+    """
+    rows = [
+        YouTubeComment(
+            video=video,
+            comment_id=data['comment_id'],
+            author=data['author'],
+            author_channel_id=data['author_channel_id'],
+            content=data['content'],
+            like_count=data['like_count'],
+            parent_id=data['parent_id'],
+            is_reply=data['is_reply'],
+            published_at=_aware(data['published_at']),
+            updated_at=_aware(data['updated_at'])
+        )
+        for data in comments_data
+    ]
+
+    # bulk_create no envía señales: los contadores se actualizan en la misma transacción
+    # (solo cambian si hay comentarios nuevos)
+    with transaction.atomic():
+        result = _bulk_upsert(
+            YouTubeComment, rows, ['content', 'like_count', 'updated_at'], batch_size
+        )
+        if result['inserted']:
+            refresh_youtube_counters([video.pk])
+
+    if result['inserted']:
+        invalidate_dashboard_snapshot(video.user_id, YOUTUBE)
+        cluster_new_comments(YOUTUBE, video)
+
+    return result
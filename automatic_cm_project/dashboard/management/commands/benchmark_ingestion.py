@@ -0,0 +1,121 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models.signals import post_save, post_delete
+from dashboard.counters import refresh_youtube_counters
+from dashboard.ingestion import ingest_youtube_comments
+from dashboard.models import YouTubeVideo, YouTubeComment
+from dashboard.signals import youtube_comment_changed
+from dashboard.snapshots import invalidate_dashboard_snapshot, YOUTUBE
+
+
+@contextmanager
+def comment_signals_muted():
+    """
+    Desconecta el receiver de YouTubeComment (contadores y snapshot por
+    fila), que no existía cuando la sincronización usaba get_or_create
+    """
+    for signal in (post_save, post_delete):
+        signal.disconnect(youtube_comment_changed, sender=YouTubeComment)
+    try:
+        yield
+    finally:
+        for signal in (post_save, post_delete):
+            signal.connect(youtube_comment_changed, sender=YouTubeComment)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara filas/segundo de la sincronización de comentarios: '
+        'get_or_create por fila vs. ingestión en bloque'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Comentarios por corrida')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        user, _ = User.objects.get_or_create(username='benchmark_ingestion')
+
+        try:
+            legacy = self._run(user, rows, self._legacy_ingest)
+            bulk = self._run(user, rows, ingest_youtube_comments)
+            resync = self._run(user, rows, ingest_youtube_comments, resync=True)
+        finally:
+            user.delete()
+
+        self.stdout.write(f'Comentarios por corrida: {rows}')
+        self.stdout.write(f'get_or_create por fila:      {legacy:10.0f} filas/s')
+        self.stdout.write(f'Ingestión en bloque (nuevos): {bulk:10.0f} filas/s')
+        self.stdout.write(f'Ingestión en bloque (resync): {resync:10.0f} filas/s')
+
+    def _run(self, user, rows, ingest, resync=False):
+        """Crea un video temporal, ingiere `rows` comentarios y retorna filas/s"""
+        video = YouTubeVideo.objects.create(
+            user=user,
+            video_id=f'benchmark-{time.time_ns()}',
+            title='Benchmark',
+            url='https://www.youtube.com/',
+            thumbnail_url='https://www.youtube.com/',
+            channel_title='Benchmark',
+            published_at=datetime(2024, 1, 1)
+        )
+        comments_data = self._fake_comments(video.video_id, rows)
+
+        try:
+            if resync:
+                ingest(video, comments_data)
+                for data in comments_data:
+                    data['like_count'] += 1
+
+            start = time.perf_counter()
+            ingest(video, comments_data)
+            elapsed = time.perf_counter() - start
+        finally:
+            video.delete()
+
+        return rows / elapsed if elapsed else float('inf')
+
+    def _fake_comments(self, prefix, rows):
+        base = datetime(2024, 1, 1)
+        return [{
+            'comment_id': f'{prefix}-{i}',
+            'author': f'Usuario {i}',
+            'author_channel_id': '',
+            'content': f'Comentario de prueba {i}',
+            'like_count': 0,
+            'published_at': base + timedelta(seconds=i),
+            'updated_at': base + timedelta(seconds=i),
+            'parent_id': None,
+            'is_reply': False
+        } for i in range(rows)]
+
+    def _legacy_ingest(self, video, comments_data):
+        """
+        Ruta anterior de sync_comments_yt: un get_or_create por comentario.
+        Sin las señales por fila; contadores y snapshot se actualizan una
+        vez al final, igual que en la ingestión en bloque.
+        """
+        with comment_signals_muted():
+            self._get_or_create_each(video, comments_data)
+        refresh_youtube_counters([video.pk])
+        invalidate_dashboard_snapshot(video.user_id, YOUTUBE)
+
+    def _get_or_create_each(self, video, comments_data):
+        for comment_data in comments_data:
+            YouTubeComment.objects.get_or_create(
+                comment_id=comment_data['comment_id'],
+                defaults={
+                    'video': video,
+                    'author': comment_data['author'],
+                    'author_channel_id': comment_data['author_channel_id'],
+                    'content': comment_data['content'],
+                    'like_count': comment_data['like_count'],
+                    'parent_id': comment_data['parent_id'],
+                    'is_reply': comment_data['is_reply'],
+                    'published_at': comment_data['published_at'],
+                    'updated_at': comment_data['updated_at']
+                }
+            )
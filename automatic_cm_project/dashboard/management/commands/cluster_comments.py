@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from dashboard.clustering import cluster_new_comments
+from dashboard.models import RedditPost, YouTubeVideo
+from dashboard.snapshots import REDDIT, YOUTUBE
+
+
+class Command(BaseCommand):
+    help = 'Agrupa en clusters de casi duplicados los comentarios que aún no tienen uno'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--platform',
+            choices=['reddit', 'youtube', 'all'],
+            default='all',
+            help='Plataforma a procesar (por defecto todas)'
+        )
+
+    def handle(self, *args, **options):
+        platform = options['platform']
+
+        if platform in ('reddit', 'all'):
+            posts = RedditPost.objects.filter(comments__cluster__isnull=True).distinct()
+            clustered = sum(cluster_new_comments(REDDIT, post) for post in posts)
+            self.stdout.write(f'Comentarios de Reddit agrupados: {clustered}')
+
+        if platform in ('youtube', 'all'):
+            videos = YouTubeVideo.objects.filter(youtube_comments__cluster__isnull=True).distinct()
+            clustered = sum(cluster_new_comments(YOUTUBE, video) for video in videos)
+            self.stdout.write(f'Comentarios de YouTube agrupados: {clustered}')
+
+        self.stdout.write(self.style.SUCCESS('Clusters actualizados'))
@@ -0,0 +1,84 @@
+import asyncio
+import statistics
+import time
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga contra un servidor en ejecución: lanza generaciones '
+        'concurrentes y mide la latencia de una página del dashboard mientras tanto'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000')
+        parser.add_argument('--sessionid', required=True, help='Cookie de sesión de un usuario autenticado')
+        parser.add_argument('--comment-id', required=True, help='Comentario de Reddit a regenerar')
+        parser.add_argument('--concurrency', type=int, default=20, help='Generaciones simultáneas')
+        parser.add_argument('--probe-path', default='/dashboard/reddit/', help='Página a medir durante la carga')
+        parser.add_argument('--probe-interval', type=float, default=0.5, help='Segundos entre mediciones')
+
+    def handle(self, *args, **options):
+        asyncio.run(self._run(options))
+
+    async def _run(self, options):
+        cookies = {'sessionid': options['sessionid']}
+        async with httpx.AsyncClient(base_url=options['base_url'], cookies=cookies, timeout=None) as http:
+            # Token CSRF de la página del comentario
+            page = await http.get(f"/dashboard/reddit/comment/{options['comment_id']}/")
+            csrf_token = http.cookies.get('csrftoken')
+            if page.status_code != 200 or not csrf_token:
+                raise CommandError('No se pudo abrir el comentario: revisa --sessionid y --comment-id')
+
+            baseline = [await self._probe(http, options['probe_path']) for _ in range(5)]
+
+            done = asyncio.Event()
+            start = time.perf_counter()
+            generations = [
+                asyncio.create_task(self._generate(http, options['comment_id'], csrf_token))
+                for _ in range(options['concurrency'])
+            ]
+            probes_task = asyncio.create_task(
+                self._probe_until(http, options['probe_path'], options['probe_interval'], done)
+            )
+
+            results = await asyncio.gather(*generations)
+            elapsed = time.perf_counter() - start
+            done.set()
+            under_load = await probes_task
+
+        failed = sum(1 for status in results if status != 200)
+        self.stdout.write(f"Generaciones: {len(results)} en {elapsed:.1f} s ({failed} con error)")
+        self._report('Dashboard sin carga', baseline)
+        self._report('Dashboard durante la carga', under_load)
+
+    async def _generate(self, http, comment_id, csrf_token):
+        response = await http.post(
+            f'/dashboard/reddit/comment/{comment_id}/generate/',
+            data={'tone': 'friendly', 'regenerate': '1'},
+            headers={'X-CSRFToken': csrf_token}
+        )
+        return response.status_code
+
+    async def _probe(self, http, path):
+        """Milisegundos de respuesta de la página"""
+        start = time.perf_counter()
+        await http.get(path)
+        return (time.perf_counter() - start) * 1000
+
+    async def _probe_until(self, http, path, interval, done):
+        samples = []
+        while not done.is_set():
+            samples.append(await self._probe(http, path))
+            await asyncio.sleep(interval)
+        return samples
+
+    def _report(self, label, samples):
+        if not samples:
+            self.stdout.write(f'{label:28} sin mediciones')
+            return
+        p95 = sorted(samples)[max(0, int(len(samples) * 0.95) - 1)]
+        self.stdout.write(
+            f'{label:28} mediana {statistics.median(samples):7.0f} ms   p95 {p95:7.0f} ms   ({len(samples)} muestras)'
+        )
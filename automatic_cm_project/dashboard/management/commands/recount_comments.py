@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from dashboard.counters import refresh_reddit_counters, refresh_youtube_counters
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los contadores comments_total y unread_total de posts y videos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--platform',
+            choices=['reddit', 'youtube', 'all'],
+            default='all',
+            help='Plataforma a recalcular (por defecto todas)'
+        )
+
+    def handle(self, *args, **options):
+        platform = options['platform']
+
+        with transaction.atomic():
+            if platform in ('reddit', 'all'):
+                updated = refresh_reddit_counters()
+                self.stdout.write(f'Posts de Reddit recalculados: {updated}')
+
+            if platform in ('youtube', 'all'):
+                updated = refresh_youtube_counters()
+                self.stdout.write(f'Videos de YouTube recalculados: {updated}')
+
+        self.stdout.write(self.style.SUCCESS('Contadores actualizados'))
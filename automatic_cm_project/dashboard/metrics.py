@@ -0,0 +1,209 @@
+from datetime import timedelta
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+from .models import (
+    RedditPost, Comment, Response,
+    YouTubeVideo, YouTubeComment, YouTubeResponse
+)
+
+# Semanas que se muestran en la gráfica de actividad
+ACTIVITY_WEEKS = 4
+
+# Número de posts/videos en la gráfica de engagement
+TOP_POSTS_LIMIT = 5
+
+
+def _truncate_title(title, length=30):
+    """Recorta el título para las etiquetas de las gráficas"""
+    return title[:length] + '...' if len(title) > length else title
+
+
+def get_reddit_metrics(user, now=None):
+    """
+    Calcula todas las métricas del gestor de Reddit con un número
+    constante de consultas agregadas (3), sin importar cuántos posts haya.
+
+    Args:
+        user (User): Usuario dueño de los posts
+        now (datetime, optional): Instante de referencia para las ventanas de tiempo
+
+    Returns:
+        dict: Métricas listas para el contexto del template
+    """
+    now = now or timezone.now()
+    seven_days_ago = now - timedelta(days=7)
+
+    posts = RedditPost.objects.filter(user=user, is_active=True)
+
+    # Consulta 1: posts totales, últimos 7 días, actividad semanal y tasa de respuesta
+    week_counts = {}
+    for i in range(ACTIVITY_WEEKS - 1, -1, -1):
+        week_start = now - timedelta(days=7 * i + 7)
+        week_end = now - timedelta(days=7 * i)
+        week_counts[f'week_{i}'] = Count(
+            'id',
+            filter=Q(created_at__gte=week_start, created_at__lt=week_end)
+        )
+
+    post_stats = posts.annotate(
+        has_response=Exists(
+            Response.objects.filter(comment__post=OuterRef('pk'))
+        )
+    ).aggregate(
+        total_posts=Count('id'),
+        posts_7d=Count('id', filter=Q(created_at__gte=seven_days_ago)),
+        posts_with_responses=Count('id', filter=Q(has_response=True)),
+        **week_counts
+    )
+
+    # Consulta 2: comentarios, pendientes y estado de las respuestas
+    # (las respuestas cuentan para todos los posts del usuario, activos o no)
+    active = Q(post__is_active=True)
+    unread = Q(response__isnull=True) | Q(response__status=Response.Status.PENDING)
+    comment_stats = Comment.objects.filter(post__user=user).aggregate(
+        total_comments=Count('id', filter=active),
+        total_unread=Count('id', filter=active & unread),
+        pending_responses=Count(
+            'response', filter=Q(response__status=Response.Status.PENDING)
+        ),
+        published_responses=Count(
+            'response', filter=Q(response__status=Response.Status.PUBLISHED)
+        ),
+    )
+
+    # Consulta 3: top posts por número de comentarios
+    top_posts = posts.annotate(
+        comment_count=Count('comments')
+    ).order_by('-comment_count').values('title', 'comment_count')[:TOP_POSTS_LIMIT]
+
+    total_posts = post_stats['total_posts']
+    total_comments = comment_stats['total_comments']
+
+    avg_comments = total_comments / total_posts if total_posts > 0 else 0
+    response_rate = (
+        post_stats['posts_with_responses'] / total_posts * 100
+        if total_posts > 0 else 0
+    )
+
+    activity_data = [{
+        'week': f'Semana {ACTIVITY_WEEKS - i}',
+        'posts': post_stats[f'week_{i}']
+    } for i in range(ACTIVITY_WEEKS - 1, -1, -1)]
+
+    engagement_data = [{
+        'title': _truncate_title(post['title']),
+        'comments': post['comment_count']
+    } for post in top_posts]
+
+    return {
+        'total_posts': total_posts,
+        'total_comments': total_comments,
+        'total_unread': comment_stats['total_unread'],
+        'pending_responses': comment_stats['pending_responses'],
+        'published_responses': comment_stats['published_responses'],
+        'posts_7d': post_stats['posts_7d'],
+        'avg_comments': round(avg_comments, 2),
+        'activity_data': activity_data,
+        'engagement_data': engagement_data,
+        'response_rate': round(response_rate, 1)
+    }
+
+
+def get_youtube_metrics(user, now=None):
+    """
+    Calcula todas las métricas del gestor de YouTube con un número
+    constante de consultas agregadas (3), sin importar cuántos videos haya.
+
+    Args:
+        user (User): Usuario dueño de los videos
+        now (datetime, optional): Instante de referencia para las ventanas de tiempo
+
+    Returns:
+        dict: Métricas listas para el contexto del template
+    """
+    now = now or timezone.now()
+    seven_days_ago = now - timedelta(days=7)
+
+    videos = YouTubeVideo.objects.filter(user=user, is_active=True)
+
+    # Consulta 1: videos totales, últimos 7 días, actividad semanal y tasa de respuesta
+    week_counts = {}
+    for i in range(ACTIVITY_WEEKS - 1, -1, -1):
+        week_start = now - timedelta(days=7 * i + 7)
+        week_end = now - timedelta(days=7 * i)
+        week_counts[f'week_{i}'] = Count(
+            'id',
+            filter=Q(published_at__gte=week_start, published_at__lt=week_end)
+        )
+
+    video_stats = videos.annotate(
+        has_response=Exists(
+            YouTubeResponse.objects.filter(comment__video=OuterRef('pk'))
+        )
+    ).aggregate(
+        total_videos=Count('id'),
+        videos_7d=Count('id', filter=Q(published_at__gte=seven_days_ago)),
+        videos_with_responses=Count('id', filter=Q(has_response=True)),
+        **week_counts
+    )
+
+    # Consulta 2: comentarios (solo top-level), pendientes y estado de las respuestas
+    active = Q(video__is_active=True)
+    unread = (
+        Q(youtube_response__isnull=True) |
+        Q(youtube_response__status=YouTubeResponse.Status.PENDING)
+    )
+    comment_stats = YouTubeComment.objects.filter(video__user=user).aggregate(
+        total_comments=Count('id', filter=active & Q(is_reply=False)),
+        total_unread=Count('id', filter=active & unread),
+        pending_responses=Count(
+            'youtube_response',
+            filter=Q(youtube_response__status=YouTubeResponse.Status.PENDING)
+        ),
+        published_responses=Count(
+            'youtube_response',
+            filter=Q(youtube_response__status=YouTubeResponse.Status.PUBLISHED)
+        ),
+    )
+
+    # Consulta 3: top videos por número de comentarios
+    top_videos = videos.annotate(
+        total_youtube_comments=Count('youtube_comments'),
+        top_level_comments=Count(
+            'youtube_comments', filter=Q(youtube_comments__is_reply=False)
+        )
+    ).order_by('-total_youtube_comments').values(
+        'title', 'top_level_comments'
+    )[:TOP_POSTS_LIMIT]
+
+    total_videos = video_stats['total_videos']
+    total_comments = comment_stats['total_comments']
+
+    avg_comments = total_comments / total_videos if total_videos > 0 else 0
+    response_rate = (
+        video_stats['videos_with_responses'] / total_videos * 100
+        if total_videos > 0 else 0
+    )
+
+    activity_data = [{
+        'week': f'Semana {ACTIVITY_WEEKS - i}',
+        'videos': video_stats[f'week_{i}']
+    } for i in range(ACTIVITY_WEEKS - 1, -1, -1)]
+
+    engagement_data = [{
+        'title': _truncate_title(video['title']),
+        'comments': video['top_level_comments']
+    } for video in top_videos]
+
+    return {
+        'total_videos': total_videos,
+        'total_comments': total_comments,
+        'total_unread': comment_stats['total_unread'],
+        'pending_responses': comment_stats['pending_responses'],
+        'published_responses': comment_stats['published_responses'],
+        'videos_7d': video_stats['videos_7d'],
+        'avg_comments': round(avg_comments, 2),
+        'activity_data': activity_data,
+        'engagement_data': engagement_data,
+        'response_rate': round(response_rate, 1)
+    }
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:56
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_counters(apps, schema_editor):
+    RedditPost = apps.get_model('dashboard', 'RedditPost')
+    YouTubeVideo = apps.get_model('dashboard', 'YouTubeVideo')
+
+    posts = RedditPost.objects.annotate(
+        total=Count('comments'),
+        unread=Count('comments', filter=(
+            Q(comments__response__isnull=True) |
+            Q(comments__response__status='pending')
+        ))
+    )
+    for post in posts:
+        post.comments_total = post.total
+        post.unread_total = post.unread
+    RedditPost.objects.bulk_update(posts, ['comments_total', 'unread_total'], batch_size=500)
+
+    videos = YouTubeVideo.objects.annotate(
+        total=Count('youtube_comments'),
+        unread=Count('youtube_comments', filter=(
+            Q(youtube_comments__youtube_response__isnull=True) |
+            Q(youtube_comments__youtube_response__status='pending')
+        ))
+    )
+    for video in videos:
+        video.comments_total = video.total
+        video.unread_total = video.unread
+    YouTubeVideo.objects.bulk_update(videos, ['comments_total', 'unread_total'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_youtubecomment_youtuberesponse_youtubevideo_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='redditpost',
+            name='comments_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='redditpost',
+            name='unread_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='youtubevideo',
+            name='comments_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='youtubevideo',
+            name='unread_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
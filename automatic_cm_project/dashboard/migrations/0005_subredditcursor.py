@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_comment_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubredditCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subreddit', models.CharField(max_length=100, unique=True)),
+                ('fullname', models.CharField(max_length=100)),
+                ('created_utc', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Subreddit Cursor',
+                'verbose_name_plural': 'Subreddit Cursors',
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_subredditcursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentCluster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(db_index=True, max_length=50)),
+                ('signature', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Comment Cluster',
+                'verbose_name_plural': 'Comment Clusters',
+            },
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='cluster',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reddit_comments', to='dashboard.commentcluster'),
+        ),
+        migrations.AddField(
+            model_name='youtubecomment',
+            name='cluster',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='youtube_comments', to='dashboard.commentcluster'),
+        ),
+        migrations.CreateModel(
+            name='LSHBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=50)),
+                ('key', models.CharField(max_length=40)),
+                ('cluster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='dashboard.commentcluster')),
+            ],
+            options={
+                'verbose_name': 'LSH Bucket',
+                'verbose_name_plural': 'LSH Buckets',
+                'indexes': [models.Index(fields=['scope', 'key'], name='dashboard_l_scope_a8c28d_idx')],
+            },
+        ),
+    ]
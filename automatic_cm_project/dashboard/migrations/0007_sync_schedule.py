@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_comment_clusters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(choices=[('reddit', 'Reddit'), ('youtube', 'YouTube')], max_length=20)),
+                ('interval_minutes', models.PositiveIntegerField(default=15)),
+                ('enabled', models.BooleanField(default=True)),
+                ('last_started_at', models.DateTimeField(blank=True, null=True)),
+                ('last_finished_at', models.DateTimeField(blank=True, null=True)),
+                ('last_duration_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('last_status', models.CharField(blank=True, choices=[('ok', 'Completada'), ('error', 'Con error')], max_length=20)),
+                ('last_result', models.JSONField(blank=True, default=dict)),
+                ('last_error', models.TextField(blank=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_schedules', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Sync Schedule',
+                'verbose_name_plural': 'Sync Schedules',
+                'constraints': [models.UniqueConstraint(fields=('user', 'platform'), name='unique_sync_schedule')],
+            },
+        ),
+    ]
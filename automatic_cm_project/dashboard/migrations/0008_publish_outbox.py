@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_sync_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='response',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='response',
+            name='publish_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='response',
+            name='publish_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='youtuberesponse',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='youtuberesponse',
+            name='publish_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='youtuberesponse',
+            name='publish_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='response',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pendiente'), ('queued', 'En cola'), ('published', 'Publicado'), ('failed', 'Error al publicar'), ('rejected', 'Rechazado')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='youtuberesponse',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pendiente'), ('queued', 'En cola'), ('published', 'Publicado'), ('failed', 'Error al publicar'), ('rejected', 'Rechazado')], default='pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_publish_outbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='response',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pendiente'), ('approved', 'Aprobado'), ('queued', 'En cola'), ('published', 'Publicado'), ('failed', 'Error al publicar'), ('rejected', 'Rechazado')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='youtuberesponse',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pendiente'), ('approved', 'Aprobado'), ('queued', 'En cola'), ('published', 'Publicado'), ('failed', 'Error al publicar'), ('rejected', 'Rechazado')], default='pending', max_length=20),
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from datetime import timedelta
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -17,6 +18,10 @@ class RedditPost(models.Model):
 
     is_own_post = models.BooleanField(default=False)  # Para identificar posts creados por la app
     image = models.ImageField(upload_to='reddit_images/', null=True, blank=True)  # Para imágenes
+
+    # Contadores desnormalizados (ver dashboard/counters.py)
+    comments_total = models.PositiveIntegerField(default=0)
+    unread_total = models.PositiveIntegerField(default=0)
     
     def can_edit(self):
         """Verifica si el post puede ser editado"""
@@ -33,15 +38,104 @@ class RedditPost(models.Model):
     
     @property
     def unread_comments_count(self):
-        """Cuenta comentarios sin respuesta o pendientes"""
-        return self.comments.filter(
-            models.Q(response__isnull=True) | 
-            models.Q(response__status='pending')
-        ).count()
+        """Comentarios sin respuesta o pendientes (contador almacenado)"""
+        return self.unread_total
     
     def __str__(self):
         return f"{self.title[:50]}..."
 
+class SubredditCursor(models.Model):
+    """Post más reciente ya sincronizado de cada subreddit"""
+    subreddit = models.CharField(max_length=100, unique=True)
+    fullname = models.CharField(max_length=100)
+    created_utc = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Subreddit Cursor'
+        verbose_name_plural = 'Subreddit Cursors'
+    
+    def as_dict(self):
+        """Formato que espera RedditBot.get_subreddit_posts"""
+        return {'fullname': self.fullname, 'created_utc': self.created_utc}
+    
+    def __str__(self):
+        return f"r/{self.subreddit} → {self.fullname}"
+
+class SyncSchedule(models.Model):
+    """Sincronización periódica (Celery beat) de una plataforma para un usuario"""
+    
+    class Platform(models.TextChoices):
+        REDDIT = 'reddit', 'Reddit'
+        YOUTUBE = 'youtube', 'YouTube'
+    
+    class Status(models.TextChoices):
+        OK = 'ok', 'Completada'
+        ERROR = 'error', 'Con error'
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sync_schedules')
+    platform = models.CharField(max_length=20, choices=Platform.choices)
+    interval_minutes = models.PositiveIntegerField(default=15)
+    enabled = models.BooleanField(default=True)
+    
+    # Última corrida (automática o manual)
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_finished_at = models.DateTimeField(null=True, blank=True)
+    last_duration_ms = models.PositiveIntegerField(null=True, blank=True)
+    last_status = models.CharField(max_length=20, choices=Status.choices, blank=True)
+    last_result = models.JSONField(default=dict, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'platform'], name='unique_sync_schedule')
+        ]
+        verbose_name = 'Sync Schedule'
+        verbose_name_plural = 'Sync Schedules'
+    
+    def is_due(self, now=None):
+        """Indica si ya pasó el intervalo desde el inicio de la última corrida"""
+        if not self.enabled:
+            return False
+        if self.last_started_at is None:
+            return True
+        now = now or timezone.now()
+        return now - self.last_started_at >= timedelta(minutes=self.interval_minutes)
+    
+    @property
+    def last_duration_seconds(self):
+        return None if self.last_duration_ms is None else self.last_duration_ms / 1000
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.get_platform_display()} cada {self.interval_minutes} min"
+
+class CommentCluster(models.Model):
+    """Grupo de comentarios casi idénticos de un mismo post o video (ver dashboard/clustering.py)"""
+    scope = models.CharField(max_length=50, db_index=True)  # 'reddit:<pk del post>' o 'youtube:<pk del video>'
+    signature = models.JSONField()  # Firma MinHash del primer comentario del grupo
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Comment Cluster'
+        verbose_name_plural = 'Comment Clusters'
+    
+    def __str__(self):
+        return f"Cluster {self.pk} ({self.scope})"
+
+class LSHBucket(models.Model):
+    """Banda LSH de la firma de un cluster, para buscar candidatos sin recorrer todos"""
+    cluster = models.ForeignKey(CommentCluster, on_delete=models.CASCADE, related_name='buckets')
+    scope = models.CharField(max_length=50)
+    key = models.CharField(max_length=40)  # '<banda>:<hash de la banda>'
+    
+    class Meta:
+        indexes = [models.Index(fields=['scope', 'key'])]
+        verbose_name = 'LSH Bucket'
+        verbose_name_plural = 'LSH Buckets'
+    
+    def __str__(self):
+        return f"{self.scope} {self.key}"
+
 class Comment(models.Model):
     """Comentario en un post de Reddit"""
     post = models.ForeignKey(RedditPost, on_delete=models.CASCADE, related_name='comments')
@@ -52,6 +146,9 @@ class Comment(models.Model):
     parent_id = models.CharField(max_length=100, null=True, blank=True)
     created_at = models.DateTimeField()
     fetched_at = models.DateTimeField(auto_now_add=True)
+    cluster = models.ForeignKey(
+        CommentCluster, on_delete=models.SET_NULL, null=True, blank=True, related_name='reddit_comments'
+    )
     
     class Meta:
         ordering = ['-created_at']
@@ -66,8 +163,14 @@ class Comment(models.Model):
                 return {'text': 'Publicado', 'class': 'status-published'}
             elif self.response.status == 'pending':
                 return {'text': 'Pendiente', 'class': 'status-pending'}
+            elif self.response.status == 'approved':
+                return {'text': 'Aprobado', 'class': 'status-approved'}
             elif self.response.status == 'rejected':
                 return {'text': 'Rechazado', 'class': 'status-rejected'}
+            elif self.response.status == 'queued':
+                return {'text': 'En cola', 'class': 'status-queued'}
+            elif self.response.status == 'failed':
+                return {'text': 'Error al publicar', 'class': 'status-failed'}
         except Response.DoesNotExist:
             return {'text': 'Nuevo', 'class': 'status-new'}
     
@@ -79,7 +182,10 @@ class Response(models.Model):
     
     class Status(models.TextChoices):
         PENDING = 'pending', 'Pendiente'
+        APPROVED = 'approved', 'Aprobado'
+        QUEUED = 'queued', 'En cola'
         PUBLISHED = 'published', 'Publicado'
+        FAILED = 'failed', 'Error al publicar'
         REJECTED = 'rejected', 'Rechazado'
     
     class Tone(models.TextChoices):
@@ -96,6 +202,11 @@ class Response(models.Model):
     published_at = models.DateTimeField(null=True, blank=True)
     reddit_reply_id = models.CharField(max_length=100, null=True, blank=True)
     
+    # Cola de publicación (ver dashboard/publishing.py)
+    publish_attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    publish_error = models.TextField(blank=True)
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Response'
@@ -110,7 +221,9 @@ class Response(models.Model):
         """Marca la respuesta como publicada"""
         self.status = self.Status.PUBLISHED
         self.published_at = timezone.now()
-        self.save()
+        # Atómico para que los contadores del post se actualicen junto al estado
+        with transaction.atomic():
+            self.save()
     
     def __str__(self):
         return f"Response to {self.comment.author} - {self.status}"
@@ -129,6 +242,10 @@ class YouTubeVideo(models.Model):
     comment_count = models.IntegerField(default=0)
     last_checked = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+
+    # Contadores desnormalizados (ver dashboard/counters.py)
+    comments_total = models.PositiveIntegerField(default=0)
+    unread_total = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['-published_at']
@@ -137,11 +254,8 @@ class YouTubeVideo(models.Model):
     
     @property
     def unread_comments_count(self):
-        """Cuenta comentarios sin respuesta o pendientes"""
-        return self.youtube_comments.filter(
-            models.Q(youtube_response__isnull=True) | 
-            models.Q(youtube_response__status='pending')
-        ).count()
+        """Comentarios sin respuesta o pendientes (contador almacenado)"""
+        return self.unread_total
     
     def __str__(self):
         return f"{self.title[:50]}..."
@@ -160,6 +274,9 @@ class YouTubeComment(models.Model):
     published_at = models.DateTimeField()
     updated_at = models.DateTimeField()
     fetched_at = models.DateTimeField(auto_now_add=True)
+    cluster = models.ForeignKey(
+        CommentCluster, on_delete=models.SET_NULL, null=True, blank=True, related_name='youtube_comments'
+    )
     
     class Meta:
         ordering = ['-published_at']
@@ -174,8 +291,14 @@ class YouTubeComment(models.Model):
                 return {'text': 'Publicado', 'class': 'status-published'}
             elif self.youtube_response.status == 'pending':
                 return {'text': 'Pendiente', 'class': 'status-pending'}
+            elif self.youtube_response.status == 'approved':
+                return {'text': 'Aprobado', 'class': 'status-approved'}
             elif self.youtube_response.status == 'rejected':
                 return {'text': 'Rechazado', 'class': 'status-rejected'}
+            elif self.youtube_response.status == 'queued':
+                return {'text': 'En cola', 'class': 'status-queued'}
+            elif self.youtube_response.status == 'failed':
+                return {'text': 'Error al publicar', 'class': 'status-failed'}
         except YouTubeResponse.DoesNotExist:
             return {'text': 'Nuevo', 'class': 'status-new'}
     
@@ -188,7 +311,10 @@ class YouTubeResponse(models.Model):
     
     class Status(models.TextChoices):
         PENDING = 'pending', 'Pendiente'
+        APPROVED = 'approved', 'Aprobado'
+        QUEUED = 'queued', 'En cola'
         PUBLISHED = 'published', 'Publicado'
+        FAILED = 'failed', 'Error al publicar'
         REJECTED = 'rejected', 'Rechazado'
     
     class Tone(models.TextChoices):
@@ -205,6 +331,11 @@ class YouTubeResponse(models.Model):
     published_at = models.DateTimeField(null=True, blank=True)
     youtube_reply_id = models.CharField(max_length=100, null=True, blank=True)
     
+    # Cola de publicación (ver dashboard/publishing.py)
+    publish_attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    publish_error = models.TextField(blank=True)
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'YouTube Response'
@@ -219,7 +350,9 @@ class YouTubeResponse(models.Model):
         """Marca la respuesta como publicada"""
         self.status = self.Status.PUBLISHED
         self.published_at = timezone.now()
-        self.save()
+        # Atómico para que los contadores del post se actualicen junto al estado
+        with transaction.atomic():
+            self.save()
     
     def __str__(self):
         return f"Response to {self.comment.author} - {self.status}"
\ No newline at end of file
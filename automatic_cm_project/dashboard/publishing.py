@@ -0,0 +1,322 @@
+import re
+import time
+import random
+import logging
+from datetime import timedelta
+import httplib2
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from googleapiclient.errors import HttpError
+from praw.exceptions import RedditAPIException
+from prawcore.exceptions import RequestException, ServerError, TooManyRequests
+from bots.quota import seconds_until_quota_reset
+from bots.rate_limit import RateLimited
+from bots.reddit_bot import RedditBot
+from bots.youtube_bot import YouTubeBot
+from .counters import refresh_reddit_counters, refresh_youtube_counters
+from .models import Response, YouTubeResponse
+from .snapshots import invalidate_dashboard_snapshot, REDDIT, YOUTUBE
+from .sync import target_lock
+
+logger = logging.getLogger(__name__)
+
+# Por plataforma: modelo de respuesta, campo del ID publicado, post/video
+# dueño (desde la respuesta) y recálculo de contadores
+OUTBOX_TARGETS = {
+    REDDIT: (Response, 'reddit_reply_id', 'comment__post', refresh_reddit_counters),
+    YOUTUBE: (YouTubeResponse, 'youtube_reply_id', 'comment__video', refresh_youtube_counters),
+}
+
+QUEUED = Response.Status.QUEUED
+PUBLISHED = Response.Status.PUBLISHED
+FAILED = Response.Status.FAILED
+
+# Mismo formato que usa PRAW para leer los errores RATELIMIT de Reddit
+# ("Take a break for 9 minutes before trying again")
+RATELIMIT_REGEX = re.compile(r"([0-9]{1,3}) (milliseconds?|seconds?|minutes?)")
+
+YOUTUBE_RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+
+class RetryLater(Exception):
+    """Error transitorio: la publicación se reintenta más tarde"""
+
+    def __init__(self, message, delay=None, rate_limited=False):
+        """
+        Args:
+            message (str): Causa del error
+            delay (float, optional): Segundos que la plataforma pide esperar
+            rate_limited (bool): La plataforma limitó la cuenta (afecta a toda la cola)
+        """
+        super().__init__(message)
+        self.delay = delay
+        self.rate_limited = rate_limited
+
+
+def reddit_rate_limit_delay(exception):
+    """
+    Segundos de espera que indica un error RATELIMIT de Reddit
+
+    Args:
+        exception (RedditAPIException): Error de la API
+
+    Returns:
+        int: Segundos a esperar o None si no es un error de rate limit
+    """
+    for item in exception.items:
+        if item.error_type != 'RATELIMIT':
+            continue
+        match = RATELIMIT_REGEX.search(item.message or '')
+        if not match:
+            return settings.PUBLISH_RATE_LIMIT_DELAY
+        amount, unit = int(match.group(1)), match.group(2)
+        if unit.startswith('minute'):
+            return amount * 60 + 1
+        if unit.startswith('millisecond'):
+            return 1
+        return amount + 1
+    return None
+
+
+def _youtube_error_reasons(error):
+    details = error.error_details if isinstance(error.error_details, list) else []
+    return {detail.get('reason') for detail in details if isinstance(detail, dict)}
+
+
+def as_retry(platform, error):
+    """
+    Clasifica un error de publicación
+
+    Args:
+        platform (str): REDDIT o YOUTUBE
+        error (Exception): Error que lanzó el cliente
+
+    Returns:
+        RetryLater: Si el error es transitorio; None si reintentar no sirve
+            (comentario borrado, hilo bloqueado, permisos, ...)
+    """
+    if isinstance(error, RetryLater):
+        return error
+    if isinstance(error, RateLimited):
+        # Nuestro propio rate limiter: la cuenta completa debe esperar
+        return RetryLater(str(error), error.retry_after, rate_limited=True)
+
+    if platform == REDDIT:
+        if isinstance(error, RedditAPIException):
+            delay = reddit_rate_limit_delay(error)
+            return None if delay is None else RetryLater(str(error), delay, rate_limited=True)
+        if isinstance(error, TooManyRequests):
+            delay = float(error.retry_after) if error.retry_after else None
+            return RetryLater(str(error), delay, rate_limited=True)
+        if isinstance(error, (ServerError, RequestException)):
+            return RetryLater(str(error))
+    elif isinstance(error, HttpError):
+        status = error.resp.status
+        reasons = _youtube_error_reasons(error)
+        if 'quotaExceeded' in reasons:
+            return RetryLater(str(error), seconds_until_quota_reset(), rate_limited=True)
+        if status == 429 or reasons & YOUTUBE_RATE_LIMIT_REASONS:
+            retry_after = error.resp.get('retry-after')
+            return RetryLater(str(error), float(retry_after) if retry_after else None, rate_limited=True)
+        if status >= 500:
+            return RetryLater(str(error))
+        return None
+    elif isinstance(error, httplib2.HttpLib2Error):
+        return RetryLater(str(error))
+
+    # Errores de red (conexión rechazada, timeout)
+    if isinstance(error, OSError):
+        return RetryLater(str(error))
+    return None
+
+
+def backoff_delay(attempts):
+    """
+    Espera exponencial (con jitter) tras `attempts` intentos fallidos
+
+    Returns:
+        float: Segundos hasta el siguiente intento
+    """
+    delay = min(settings.PUBLISH_BACKOFF_MAX, settings.PUBLISH_BACKOFF_BASE * 2 ** (attempts - 1))
+    # El jitter evita que las respuestas que fallaron juntas se reintenten juntas
+    return random.uniform(delay / 2, delay)
+
+
+def enqueue(platform, response_ids):
+    """
+    Pone en la cola de publicación las respuestas indicadas que todavía
+    no se publicaron ni están en cola
+
+    Args:
+        platform (str): REDDIT o YOUTUBE
+        response_ids (iterable): IDs (pk) de las respuestas
+
+    Returns:
+        int: Respuestas encoladas
+    """
+    model, _, parent_field, refresh_counters = OUTBOX_TARGETS[platform]
+    responses = model.objects.filter(pk__in=list(response_ids)).exclude(status__in=[PUBLISHED, QUEUED])
+
+    # update() no envía señales: los contadores se actualizan en la misma transacción
+    with transaction.atomic():
+        owners = set(responses.values_list(parent_field, f'{parent_field}__user'))
+        queued = responses.update(
+            status=QUEUED,
+            publish_attempts=0,
+            publish_error='',
+            next_attempt_at=timezone.now()
+        )
+        refresh_counters({parent_id for parent_id, _ in owners})
+
+    for user_id in {user_id for _, user_id in owners}:
+        invalidate_dashboard_snapshot(user_id, platform)
+
+    logger.info(f"{queued} respuestas en cola de publicación ({platform})")
+    return queued
+
+
+def _record_failure(response, error, retry=True):
+    """
+    Programa el siguiente intento o, si el error no es transitorio o se
+    agotaron los intentos (PUBLISH_MAX_ATTEMPTS), marca la respuesta como fallida
+
+    Returns:
+        str: Nuevo estado de la respuesta
+    """
+    response.publish_attempts += 1
+    response.publish_error = str(error)
+    if not retry or response.publish_attempts >= settings.PUBLISH_MAX_ATTEMPTS:
+        response.status = FAILED
+        response.next_attempt_at = None
+    else:
+        response.next_attempt_at = timezone.now() + timedelta(seconds=backoff_delay(response.publish_attempts))
+    response.save(update_fields=['status', 'publish_attempts', 'publish_error', 'next_attempt_at'])
+    return response.status
+
+
+def pause_outbox(platform, delay):
+    """
+    Posterga toda la cola de la plataforma (la cuenta está limitada)
+
+    Args:
+        platform (str): REDDIT o YOUTUBE
+        delay (float): Segundos a esperar
+    """
+    model = OUTBOX_TARGETS[platform][0]
+    resume_at = timezone.now() + timedelta(seconds=delay)
+    model.objects.filter(status=QUEUED, next_attempt_at__lt=resume_at).update(next_attempt_at=resume_at)
+    logger.warning(f"Cola de publicación de {platform} en pausa {delay:.0f} s por rate limit")
+
+
+def seconds_until_next(platform):
+    """
+    Segundos hasta el próximo intento pendiente de la cola
+
+    Returns:
+        float: Segundos (0 si ya hay respuestas listas) o None si la cola está vacía
+    """
+    model = OUTBOX_TARGETS[platform][0]
+    next_at = model.objects.filter(status=QUEUED).aggregate(next_at=Min('next_attempt_at'))['next_at']
+    if next_at is None:
+        return None
+    return max(0.0, (next_at - timezone.now()).total_seconds())
+
+
+def drain_outbox(platform, bot=None, time_budget=None):
+    """
+    Publica, una a una, las respuestas en cola cuyo intento ya llegó. Los
+    errores transitorios se reintentan con espera exponencial; cuando la
+    plataforma pide esperar (rate limit) se duerme si la espera es corta
+    (PUBLISH_MAX_INLINE_SLEEP) o se pausa la cola completa.
+
+    Args:
+        platform (str): REDDIT o YOUTUBE
+        bot (RedditBot | YouTubeBot, optional): Cliente a reutilizar
+        time_budget (float, optional): Segundos máximos de la corrida (PUBLISH_DRAIN_SECONDS)
+
+    Returns:
+        dict: {'published', 'retrying', 'failed', 'next_in'} donde next_in son
+            los segundos hasta el siguiente intento (None si la cola quedó vacía)
+
+    Raises:
+        SyncInProgress: Si otro worker ya está publicando en esa plataforma
+    """
+    time_budget = time_budget or settings.PUBLISH_DRAIN_SECONDS
+    lock_timeout = time_budget + settings.PUBLISH_MAX_INLINE_SLEEP * 2
+    with target_lock(f"{platform}:outbox", timeout=lock_timeout):
+        return _drain_outbox(platform, bot, time.monotonic() + time_budget)
+
+
+def _drain_outbox(platform, bot, deadline):
+    model, reply_field, _, _ = OUTBOX_TARGETS[platform]
+    bot = bot or (RedditBot() if platform == REDDIT else YouTubeBot())
+    result = {'published': 0, 'retrying': 0, 'failed': 0}
+
+    while time.monotonic() < deadline:
+        response = model.objects.filter(
+            status=QUEUED, next_attempt_at__lte=timezone.now()
+        ).select_related('comment').order_by('next_attempt_at', 'pk').first()
+        if response is None:
+            break
+
+        try:
+            reply_id = bot.reply_to_comment(
+                comment_id=response.comment.comment_id,
+                text=response.final_text,
+                raise_errors=True
+            )
+        except Exception as e:
+            retry = as_retry(platform, e)
+            if retry is not None and retry.rate_limited:
+                delay = retry.delay or settings.PUBLISH_RATE_LIMIT_DELAY
+                if delay <= settings.PUBLISH_MAX_INLINE_SLEEP:
+                    logger.info(f"Rate limit de {platform}: esperando {delay:.0f} s")
+                    time.sleep(delay)
+                    continue
+                pause_outbox(platform, delay)
+                break
+            elif _record_failure(response, e, retry=retry is not None) == FAILED:
+                result['failed'] += 1
+            else:
+                result['retrying'] += 1
+            continue
+
+        setattr(response, reply_field, reply_id)
+        response.next_attempt_at = None
+        response.publish_error = ''
+        response.publish()
+        result['published'] += 1
+
+    result['next_in'] = seconds_until_next(platform)
+    logger.info(f"Cola de publicación de {platform}: {result}")
+    return result
+
+
+def outbox_summary(platform, user_id):
+    """
+    Estado de la cola de publicación de un usuario
+
+    Returns:
+        dict: {'queued', 'failed', 'next_attempt_at'}
+    """
+    model, _, parent_field, _ = OUTBOX_TARGETS[platform]
+    return model.objects.filter(**{f'{parent_field}__user_id': user_id}).aggregate(
+        queued=Count('pk', filter=Q(status=QUEUED)),
+        failed=Count('pk', filter=Q(status=FAILED)),
+        next_attempt_at=Min('next_attempt_at', filter=Q(status=QUEUED))
+    )
+
+
+def publish_status(platform, response):
+    """Estado de publicación de una respuesta (para el polling de la UI)"""
+    return {
+        'status': response.status,
+        'status_display': response.get_status_display(),
+        'reply_id': getattr(response, OUTBOX_TARGETS[platform][1]),
+        'published_at': response.published_at,
+        'attempts': response.publish_attempts,
+        'next_attempt_at': response.next_attempt_at,
+        'error': response.publish_error,
+    }
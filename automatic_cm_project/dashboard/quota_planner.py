@@ -0,0 +1,157 @@
+import math
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+from bots.quota import QUOTA_COSTS, seconds_until_quota_reset
+from bots.rate_limit import RateLimited
+from bots.youtube_bot import MAX_IDS_PER_REQUEST
+from .ingestion import active_youtube_threads
+from .models import YouTubeResponse
+
+logger = logging.getLogger(__name__)
+
+# Comentarios por página de commentThreads.list
+COMMENT_PAGE_SIZE = 100
+
+
+def publish_reserve():
+    """Unidades de cuota reservadas para publicar las respuestas en cola"""
+    queued = YouTubeResponse.objects.filter(status=YouTubeResponse.Status.QUEUED).count()
+    return queued * QUOTA_COSTS['youtube.comments.insert']
+
+
+def available_units(ledger, now=None):
+    """Unidades que quedan en el día sin tocar la reserva de publicaciones"""
+    return ledger.remaining(now) - publish_reserve()
+
+
+def ensure_sync_quota(ledger, now=None):
+    """
+    Verifica que una sincronización de YouTube no consuma la cuota
+    reservada para las publicaciones en cola
+
+    Raises:
+        RateLimited: Hasta el reinicio de la cuota si no queda presupuesto
+    """
+    if available_units(ledger, now) <= 0:
+        raise RateLimited(f"youtube-quota:{ledger.account}", seconds_until_quota_reset(now))
+
+
+class YouTubeSyncPlanner:
+    """
+    Presupuesto de cuota de una corrida programada de YouTube.
+
+    Lo que queda del día, descontada la reserva para las publicaciones en
+    cola, se reparte en partes iguales entre las corridas que faltan hasta
+    el reinicio. Dentro de la corrida los videos se sincronizan en orden de
+    velocidad de comentarios (comentarios en las últimas
+    SYNC_VELOCITY_WINDOW_HOURS) mientras alcance el presupuesto; el resto
+    se difiere a la siguiente corrida. El costo de cada video incluye la
+    búsqueda de respuestas nuevas en sus hilos activos.
+    """
+
+    def __init__(self, schedule, ledger, now=None):
+        """
+        Args:
+            schedule (SyncSchedule): Usuario e intervalo de la corrida
+            ledger (QuotaLedger): Cuota de la cuenta que sincroniza
+            now (datetime, optional): Inicio de la corrida
+        """
+        self.now = now or timezone.now()
+        self.schedule = schedule
+        self.ledger = ledger
+        self.used_at_start = ledger.used(self.now)
+        self.reserved = publish_reserve()
+
+        available = ledger.daily_quota - self.used_at_start - self.reserved
+        runs_left = max(1, math.ceil(seconds_until_quota_reset(self.now) / (schedule.interval_minutes * 60)))
+        self.budget = math.ceil(available / runs_left) if available > 0 else 0
+
+    def spent(self):
+        """Unidades consumidas desde el inicio de la corrida (según el ledger)"""
+        return max(0, self.ledger.used(self.now) - self.used_at_start)
+
+    def left(self):
+        """Presupuesto que le queda a la corrida"""
+        return self.budget - self.spent()
+
+    def videos_sync_cost(self):
+        """
+        Unidades estimadas para sincronizar la lista de videos del canal:
+        channels.list más una página de playlistItems.list y un lote de
+        videos.list por cada MAX_IDS_PER_REQUEST videos conocidos (y uno más
+        para los nuevos)
+        """
+        videos = self.schedule.user.youtube_videos.count()
+        batches = videos // MAX_IDS_PER_REQUEST + 1
+        return 1 + 2 * batches
+
+    def can_sync_videos(self):
+        """True si el presupuesto alcanza para sincronizar la lista de videos"""
+        return self.videos_sync_cost() <= self.left()
+
+    def reply_check_cost(self, video, new_replies):
+        """
+        Unidades estimadas para buscar respuestas nuevas en los hilos activos
+        del video (ver youtube_reply_counts): un lote de commentThreads.list
+        por cada MAX_IDS_PER_REQUEST hilos y un comments.list por cada hilo
+        que se espera con respuestas nuevas
+
+        Args:
+            video (YouTubeVideo): Video a sincronizar
+            new_replies (float): Respuestas esperadas desde la corrida anterior
+        """
+        threads = min(
+            active_youtube_threads(video, self.now).count(), settings.SYNC_REPLY_MAX_THREADS
+        )
+        if not threads:
+            return 0
+        return math.ceil(threads / MAX_IDS_PER_REQUEST) + min(threads, math.ceil(new_replies))
+
+    def allocate(self, videos):
+        """
+        Elige los videos cuyos comentarios se sincronizan en esta corrida
+
+        Args:
+            videos (QuerySet): Videos candidatos (YouTubeVideo)
+
+        Returns:
+            tuple: (videos a sincronizar por velocidad descendente, videos diferidos)
+        """
+        window_hours = settings.SYNC_VELOCITY_WINDOW_HOURS
+        since = self.now - timedelta(hours=window_hours)
+        recent = Q(youtube_comments__published_at__gte=since)
+        videos = videos.annotate(
+            velocity=Count('youtube_comments', filter=recent),
+            reply_velocity=Count('youtube_comments', filter=recent & Q(youtube_comments__is_reply=True))
+        ).order_by('-velocity', '-published_at')
+
+        # Comentarios nuevos esperados desde la corrida anterior
+        share = self.schedule.interval_minutes / 60 / window_hours
+        left = self.left()
+        selected, deferred = [], 0
+        for video in videos:
+            cost = max(1, math.ceil(video.velocity * share / COMMENT_PAGE_SIZE))
+            cost += self.reply_check_cost(video, video.reply_velocity * share)
+            if cost > left:
+                deferred += 1
+                continue
+            selected.append(video)
+            left -= cost
+        return selected, deferred
+
+    def summary(self):
+        """
+        Resumen de la corrida
+
+        Returns:
+            dict: {'budget', 'spent', 'reserved', 'remaining'}
+        """
+        return {
+            'budget': self.budget,
+            'spent': self.spent(),
+            'reserved': self.reserved,
+            'remaining': self.ledger.remaining(self.now),
+        }
@@ -0,0 +1,96 @@
+import logging
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import F
+from .models import Response
+from .publishing import OUTBOX_TARGETS, enqueue
+from .snapshots import invalidate_dashboard_snapshot
+
+logger = logging.getLogger(__name__)
+
+APPROVE = 'approve'
+REJECT = 'reject'
+PUBLISH = 'publish'
+
+Status = Response.Status
+
+# Estados desde los que se permite cada acción: las respuestas publicadas
+# o en cola de publicación se omiten
+ALLOWED_FROM = {
+    APPROVE: {Status.PENDING, Status.FAILED},
+    REJECT: {Status.PENDING, Status.APPROVED, Status.FAILED},
+    PUBLISH: {Status.PENDING, Status.APPROVED, Status.FAILED},
+}
+
+NEW_STATUS = {
+    APPROVE: Status.APPROVED,
+    REJECT: Status.REJECTED,
+}
+
+
+def review_responses(platform, user, action, response_ids, edited_texts=None):
+    """
+    Aprueba, rechaza o publica varias respuestas a la vez: una consulta
+    para verificar que todas son del usuario, un bulk_update con los
+    cambios y, al publicar, un solo paso a la cola de publicación, todo
+    en la misma transacción. Quien llama lanza el worker que drena la cola
+    (core.tasks.drain_publish_outbox)
+
+    Args:
+        platform (str): REDDIT o YOUTUBE
+        user (User): Moderador que hace la revisión
+        action (str): APPROVE, REJECT o PUBLISH
+        response_ids (iterable): IDs (pk) de las respuestas
+        edited_texts (dict, optional): {response_id: texto editado} a guardar
+            junto con la acción
+
+    Returns:
+        dict: {'updated': respuestas cambiadas o encoladas, 'skipped': omitidas por su estado}
+
+    Raises:
+        ValueError: Acción desconocida, IDs inválidos, texto vacío o demasiadas respuestas
+        PermissionDenied: Si alguna respuesta no existe o no es del usuario
+    """
+    if action not in ALLOWED_FROM:
+        raise ValueError(f"Acción no soportada: {action}")
+
+    edits = {int(pk): str(text).strip() for pk, text in (edited_texts or {}).items()}
+    if not all(edits.values()):
+        raise ValueError('El texto no puede estar vacío')
+
+    ids = {int(pk) for pk in response_ids} | set(edits)
+    if len(ids) > settings.BULK_REVIEW_MAX_RESPONSES:
+        raise ValueError(f"Máximo {settings.BULK_REVIEW_MAX_RESPONSES} respuestas por petición")
+    if not ids:
+        return {'updated': 0, 'skipped': 0}
+
+    model, _, parent_field, refresh_counters = OUTBOX_TARGETS[platform]
+    with transaction.atomic():
+        # Una sola consulta: solo vuelven las respuestas del usuario
+        responses = list(
+            model.objects.select_for_update()
+            .filter(pk__in=ids, **{f'{parent_field}__user': user})
+            .annotate(parent_id=F(parent_field))
+            .only('pk', 'status', 'edited_text')
+        )
+        if len(responses) != len(ids):
+            raise PermissionDenied('No autorizado')
+
+        targets = [response for response in responses if response.status in ALLOWED_FROM[action]]
+        for response in targets:
+            if response.pk in edits:
+                response.edited_text = edits[response.pk]
+            if action in NEW_STATUS:
+                response.status = NEW_STATUS[action]
+        # bulk_update no envía señales: los contadores se actualizan aquí
+        model.objects.bulk_update(targets, ['status', 'edited_text'])
+
+        if action == PUBLISH:
+            enqueue(platform, [response.pk for response in targets])
+        refresh_counters({response.parent_id for response in responses})
+
+    invalidate_dashboard_snapshot(user.id, platform)
+
+    logger.info(f"Revisión en bloque ({platform}, {action}): {len(targets)} de {len(responses)} respuestas")
+    return {'updated': len(targets), 'skipped': len(responses) - len(targets)}
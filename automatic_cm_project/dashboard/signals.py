@@ -0,0 +1,66 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .counters import refresh_reddit_counters, refresh_youtube_counters
+from .models import (
+    RedditPost, Comment, Response,
+    YouTubeVideo, YouTubeComment, YouTubeResponse
+)
+from .snapshots import invalidate_dashboard_snapshot, REDDIT, YOUTUBE
+
+
+@receiver([post_save, post_delete], sender=RedditPost)
+def reddit_post_changed(sender, instance, **kwargs):
+    """Invalida el snapshot de Reddit cuando cambia un post"""
+    invalidate_dashboard_snapshot(instance.user_id, REDDIT)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def reddit_comment_changed(sender, instance, **kwargs):
+    """Actualiza contadores e invalida el snapshot cuando cambia un comentario"""
+    user_id = RedditPost.objects.filter(
+        pk=instance.post_id
+    ).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        refresh_reddit_counters([instance.post_id])
+        invalidate_dashboard_snapshot(user_id, REDDIT)
+
+
+@receiver([post_save, post_delete], sender=Response)
+def reddit_response_changed(sender, instance, **kwargs):
+    """Actualiza contadores e invalida el snapshot cuando cambia una respuesta"""
+    owner = Comment.objects.filter(
+        pk=instance.comment_id
+    ).values_list('post_id', 'post__user_id').first()
+    if owner is not None:
+        post_id, user_id = owner
+        refresh_reddit_counters([post_id])
+        invalidate_dashboard_snapshot(user_id, REDDIT)
+
+
+@receiver([post_save, post_delete], sender=YouTubeVideo)
+def youtube_video_changed(sender, instance, **kwargs):
+    """Invalida el snapshot de YouTube cuando cambia un video"""
+    invalidate_dashboard_snapshot(instance.user_id, YOUTUBE)
+
+
+@receiver([post_save, post_delete], sender=YouTubeComment)
+def youtube_comment_changed(sender, instance, **kwargs):
+    """Actualiza contadores e invalida el snapshot cuando cambia un comentario"""
+    user_id = YouTubeVideo.objects.filter(
+        pk=instance.video_id
+    ).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        refresh_youtube_counters([instance.video_id])
+        invalidate_dashboard_snapshot(user_id, YOUTUBE)
+
+
+@receiver([post_save, post_delete], sender=YouTubeResponse)
+def youtube_response_changed(sender, instance, **kwargs):
+    """Actualiza contadores e invalida el snapshot cuando cambia una respuesta"""
+    owner = YouTubeComment.objects.filter(
+        pk=instance.comment_id
+    ).values_list('video_id', 'video__user_id').first()
+    if owner is not None:
+        video_id, user_id = owner
+        refresh_youtube_counters([video_id])
+        invalidate_dashboard_snapshot(user_id, YOUTUBE)
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.core.cache import cache
+from .metrics import get_reddit_metrics, get_youtube_metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+REDDIT = 'reddit'
+YOUTUBE = 'youtube'
+
+# Función que calcula las métricas de cada plataforma
+SNAPSHOT_BUILDERS = {
+    REDDIT: get_reddit_metrics,
+    YOUTUBE: get_youtube_metrics,
+}
+
+
+def _snapshot_key(user_id, platform):
+    return f'dashboard:snapshot:{platform}:{user_id}'
+
+
+def get_dashboard_snapshot(user, platform):
+    """
+    Retorna las métricas del dashboard de un usuario desde la caché.
+    Si no existen (o Redis no está disponible) se calculan y se guardan
+    por DASHBOARD_SNAPSHOT_TTL segundos como máximo.
+
+    Args:
+        user (User): Usuario dueño del dashboard
+        platform (str): 'reddit' o 'youtube'
+
+    Returns:
+        dict: Métricas del dashboard
+    """
+    key = _snapshot_key(user.pk, platform)
+
+    try:
+        snapshot = cache.get(key)
+    except Exception as e:
+        logger.warning(f"No se pudo leer el snapshot {key}: {str(e)}")
+        snapshot = None
+
+    if snapshot is not None:
+        return snapshot
+
+    snapshot = SNAPSHOT_BUILDERS[platform](user)
+
+    try:
+        cache.set(key, snapshot, timeout=settings.DASHBOARD_SNAPSHOT_TTL)
+    except Exception as e:
+        logger.warning(f"No se pudo guardar el snapshot {key}: {str(e)}")
+
+    return snapshot
+
+
+def invalidate_dashboard_snapshot(user_id, platform):
+    """
+    Elimina el snapshot del dashboard para que se recalcule en la próxima carga
+
+    Args:
+        user_id (int): ID del usuario
+        platform (str): 'reddit' o 'youtube'
+    """
+    key = _snapshot_key(user_id, platform)
+    try:
+        cache.delete(key)
+    except Exception as e:
+        logger.warning(f"No se pudo invalidar el snapshot {key}: {str(e)}")
@@ -136,9 +136,260 @@ function hideLoading(button) {
     button.innerHTML = originalContent;
 }
 
+// ============================================
+// STREAMING (SERVER-SENT EVENTS)
+// ============================================
+// Envía un POST y procesa la respuesta text/event-stream a medida que llega
+// (EventSource solo admite GET, por eso se usa fetch + ReadableStream)
+async function streamSSE(url, { body, csrfToken, onToken, onDone, onError }) {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': csrfToken,
+            'Content-Type': 'application/x-www-form-urlencoded'
+        },
+        body: body
+    });
+
+    // Servidor de modelos saturado: el cuerpo trae el tiempo estimado de espera
+    if (response.status === 429) {
+        if (onError) onError(await response.json());
+        return;
+    }
+
+    if (!response.ok || !response.body) {
+        throw new Error(`HTTP ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Los eventos se separan con una línea en blanco
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            raw.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            if (!data) continue;
+
+            const payload = JSON.parse(data);
+            if (event === 'done' && onDone) onDone(payload);
+            else if (event === 'error' && onError) onError(payload);
+            else if (onToken) onToken(payload.token);
+        }
+    }
+}
+
+// ============================================
+// BORRADORES EN SEGUNDO PLANO
+// ============================================
+// Encola la generación de borradores y muestra el progreso en el botón
+function generateDrafts(url, button, csrfToken) {
+    if (!confirm('¿Generar borradores para todos los comentarios sin respuesta?')) {
+        return;
+    }
+
+    showLoading(button);
+
+    fetch(url, {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': csrfToken,
+            'Content-Type': 'application/x-www-form-urlencoded'
+        },
+        body: 'tone=friendly'
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            showMessage('❌ Error al encolar borradores', 'error');
+            hideLoading(button);
+        } else if (!data.task_id) {
+            showMessage('✅ No hay comentarios sin respuesta', 'success');
+            hideLoading(button);
+        } else {
+            const eta = data.eta_seconds ? ` (~${Math.ceil(data.eta_seconds / 60)} min)` : '';
+            showMessage(`⏳ Generando ${data.pending} borradores en segundo plano${eta}`, 'info');
+            pollDraftGeneration(data.task_id, button);
+        }
+    })
+    .catch(error => {
+        showMessage('❌ Error de conexión', 'error');
+        console.error('Error:', error);
+        hideLoading(button);
+    });
+}
+
+function pollDraftGeneration(taskId, button) {
+    fetch(`/dashboard/drafts/${taskId}/status/`)
+    .then(response => response.json())
+    .then(data => {
+        const progress = data.progress || {};
+        if (progress.total) {
+            button.innerHTML = `<span class="spinner"></span> ${progress.done}/${progress.total}`;
+        }
+
+        if (!data.ready) {
+            setTimeout(() => pollDraftGeneration(taskId, button), 2000);
+        } else if (data.success) {
+            showMessage(`✅ ${progress.created} borradores generados, ${progress.failed} con error`, 'success');
+            setTimeout(() => location.reload(), 1500);
+        } else {
+            showMessage('❌ Error al generar borradores', 'error');
+            hideLoading(button);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        setTimeout(() => pollDraftGeneration(taskId, button), 5000);
+    });
+}
+
+// ============================================
+// COLA DE PUBLICACIÓN
+// ============================================
+// Encola la publicación de todas las respuestas aprobadas; un worker las
+// publica al ritmo que permite la plataforma y el botón muestra cuántas faltan
+function publishAll(url, platform, button, csrfToken) {
+    if (!confirm('¿Publicar todas las respuestas aprobadas?')) {
+        return;
+    }
+
+    showLoading(button);
+
+    fetch(url, {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': csrfToken,
+            'Content-Type': 'application/x-www-form-urlencoded'
+        }
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            showMessage('❌ Error al encolar la publicación', 'error');
+            hideLoading(button);
+        } else if (!data.queued) {
+            showMessage('✅ No hay respuestas aprobadas', 'success');
+            hideLoading(button);
+        } else {
+            showMessage(`⏳ Publicando ${data.queued} respuestas en segundo plano`, 'info');
+            pollOutbox(platform, button);
+        }
+    })
+    .catch(error => {
+        showMessage('❌ Error de conexión', 'error');
+        console.error('Error:', error);
+        hideLoading(button);
+    });
+}
+
+function pollOutbox(platform, button) {
+    fetch(`/dashboard/outbox/${platform}/status/`)
+    .then(response => response.json())
+    .then(data => {
+        if (data.queued) {
+            button.innerHTML = `<span class="spinner"></span> ${data.queued} en cola`;
+            setTimeout(() => pollOutbox(platform, button), 3000);
+        } else {
+            const failed = data.failed ? ` (${data.failed} con error)` : '';
+            showMessage(`✅ Publicación terminada${failed}`, 'success');
+            setTimeout(() => location.reload(), 1500);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        setTimeout(() => pollOutbox(platform, button), 5000);
+    });
+}
+
+// Consulta el estado de una respuesta en cola hasta que se publique o falle
+function waitForPublish(statusUrl, onDone) {
+    fetch(statusUrl)
+    .then(response => response.json())
+    .then(data => {
+        if (data.status === 'queued') {
+            setTimeout(() => waitForPublish(statusUrl, onDone), 2000);
+        } else {
+            onDone(data);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        setTimeout(() => waitForPublish(statusUrl, onDone), 5000);
+    });
+}
+
+// ============================================
+// REVISIÓN EN BLOQUE
+// ============================================
+const BULK_CONFIRMATIONS = {
+    approve: '¿Aprobar',
+    reject: '¿Rechazar',
+    publish: '¿Publicar'
+};
+
+// Aplica una acción (approve, reject o publish) a las respuestas marcadas
+// con una sola petición
+function bulkReview(url, action, csrfToken) {
+    const ids = Array.from(document.querySelectorAll('.bulk-select:checked')).map(input => Number(input.value));
+    if (!ids.length) {
+        showMessage('Selecciona al menos una respuesta', 'warning');
+        return;
+    }
+    if (!confirm(`${BULK_CONFIRMATIONS[action]} ${ids.length} respuesta${ids.length === 1 ? '' : 's'}?`)) {
+        return;
+    }
+
+    fetch(url, {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': csrfToken,
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ action: action, response_ids: ids })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            const skipped = data.skipped ? ` (${data.skipped} omitidas por su estado)` : '';
+            showMessage(`✅ ${data.updated} respuestas actualizadas${skipped}`, 'success');
+            setTimeout(() => location.reload(), 1500);
+        } else {
+            showMessage(`❌ ${data.error || 'Error al actualizar respuestas'}`, 'error');
+        }
+    })
+    .catch(error => {
+        showMessage('❌ Error de conexión', 'error');
+        console.error('Error:', error);
+    });
+}
+
+function toggleBulkSelection(checked) {
+    document.querySelectorAll('.bulk-select').forEach(input => input.checked = checked);
+}
+
 // ============================================
 // UTILIDADES GLOBALES
 // ============================================
 window.showMessage = showMessage;
 window.showLoading = showLoading;
-window.hideLoading = hideLoading;
\ No newline at end of file
+window.hideLoading = hideLoading;
+window.streamSSE = streamSSE;
+window.generateDrafts = generateDrafts;
+window.publishAll = publishAll;
+window.waitForPublish = waitForPublish;
+window.bulkReview = bulkReview;
+window.toggleBulkSelection = toggleBulkSelection;
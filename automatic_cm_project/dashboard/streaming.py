@@ -0,0 +1,74 @@
+import json
+import logging
+from django.http import StreamingHttpResponse
+
+logger = logging.getLogger(__name__)
+
+
+def sse_event(data, event=None):
+    """Formatea un evento server-sent events"""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+async def astream_generation(tokens, save):
+    """
+    Reenvía los tokens generados como eventos SSE y, al terminar,
+    guarda el texto completo. Si la generación falla a mitad se envía el
+    evento 'error' y no se guarda el texto parcial
+
+    Args:
+        tokens (async iterable): Fragmentos de texto producidos por el generador
+        save (coroutine function): Recibe el texto final y retorna la respuesta guardada
+
+    Yields:
+        str: Eventos 'token' (implícitos), 'done' o 'error'
+    """
+    parts = []
+    try:
+        async for token in tokens:
+            parts.append(token)
+            yield sse_event({'token': token})
+
+        generated_text = ''.join(parts).strip()
+        response = await save(generated_text)
+
+        yield sse_event({
+            'response_id': response.id,
+            'response_text': generated_text
+        }, event='done')
+    except Exception as e:
+        logger.error(f"Error al transmitir respuesta: {str(e)}")
+        yield sse_event({'error': str(e)}, event='error')
+
+
+async def aprime(tokens):
+    """
+    Espera el primer fragmento del generador antes de abrir el stream, de
+    modo que los errores previos a la generación (cola del servidor de
+    modelos saturada) se respondan con un código HTTP y no dentro del SSE
+
+    Args:
+        tokens (async iterable): Fragmentos de texto producidos por el generador
+
+    Returns:
+        async iterable: Los mismos fragmentos, empezando por el primero
+    """
+    tokens = aiter(tokens)
+    first = await anext(tokens, None)
+
+    async def primed():
+        if first is not None:
+            yield first
+        async for token in tokens:
+            yield token
+
+    return primed()
+
+
+def sse_response(events):
+    """StreamingHttpResponse con las cabeceras necesarias para SSE"""
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Evitar buffering en nginx
+    return response
@@ -0,0 +1,318 @@
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from bots.rate_limit import RateLimited
+from bots.reddit_bot import RedditBot
+from bots.youtube_bot import YouTubeBot
+from .ingestion import (
+    ingest_reddit_comments, ingest_youtube_comments, youtube_comment_watermark, youtube_reply_counts
+)
+from .models import RedditPost, SubredditCursor, YouTubeVideo, SyncSchedule
+from .quota_planner import YouTubeSyncPlanner, ensure_sync_quota
+from .snapshots import REDDIT, YOUTUBE
+
+logger = logging.getLogger(__name__)
+
+SUBREDDIT = 'ACM_Magneto'
+
+LOCK_PREFIX = 'sync:lock'
+
+
+class SyncInProgress(Exception):
+    """Otra sincronización del mismo objetivo está en curso"""
+
+
+@contextmanager
+def target_lock(target, timeout=None):
+    """
+    Lock distribuido (caché compartida) para que dos sincronizaciones del
+    mismo objetivo no corran a la vez en distintos procesos. El lock expira
+    solo tras SYNC_LOCK_TIMEOUT segundos si el worker muere.
+
+    Args:
+        target (str): Objetivo ('reddit:post:<id>', 'youtube:channel', ...)
+        timeout (int, optional): Segundos de vida del lock
+
+    Raises:
+        SyncInProgress: Si el objetivo ya está bloqueado
+    """
+    key = f"{LOCK_PREFIX}:{target}"
+    token = uuid.uuid4().hex
+    if not cache.add(key, token, timeout=timeout or settings.SYNC_LOCK_TIMEOUT):
+        raise SyncInProgress(f"Ya hay una sincronización en curso ({target})")
+    try:
+        yield
+    finally:
+        # Solo se libera si sigue siendo nuestro (pudo expirar y tomarlo otro)
+        if cache.get(key) == token:
+            cache.delete(key)
+
+
+def sync_reddit_posts(user, bot=None, subreddit_name=SUBREDDIT):
+    """
+    Descarga los posts nuevos del subreddit desde el último cursor
+
+    Args:
+        user (User): Dueño de los posts nuevos
+        bot (RedditBot, optional): Cliente a reutilizar
+        subreddit_name (str): Subreddit a sincronizar
+
+    Returns:
+        dict: {'synced': posts nuevos}
+    """
+    with target_lock(f"{REDDIT}:subreddit:{subreddit_name}"):
+        bot = bot or RedditBot()
+
+        # Con cursor se descargan todos los posts nuevos desde la última sincronización
+        cursor = SubredditCursor.objects.filter(subreddit=subreddit_name).first()
+        if cursor:
+            posts_data = bot.get_subreddit_posts(
+                subreddit_name, limit=None, cursor=cursor.as_dict()
+            )
+        else:
+            posts_data = bot.get_subreddit_posts(subreddit_name, limit=25)
+
+        synced_count = 0
+        for post_data in posts_data:
+            post, created = RedditPost.objects.get_or_create(
+                post_id=post_data['post_id'],
+                defaults={
+                    'user': user,
+                    'title': post_data['title'],
+                    'url': post_data['url'],
+                    'permalink': post_data['permalink'],
+                    'subreddit': post_data['subreddit'],
+                    'author': post_data['author'],
+                    'created_at': post_data['created_at']
+                }
+            )
+            if created:
+                synced_count += 1
+
+        # Avanzar el cursor al post más reciente una vez guardados todos
+        if posts_data:
+            SubredditCursor.objects.update_or_create(
+                subreddit=subreddit_name,
+                defaults={
+                    'fullname': posts_data[0]['fullname'],
+                    'created_utc': posts_data[0]['created_utc']
+                }
+            )
+
+    return {'synced': synced_count}
+
+
+def sync_reddit_comments(post, bot=None):
+    """
+    Descarga e inserta en bloque los comentarios de un post
+
+    Returns:
+        dict: {'inserted', 'updated'} (ver ingest_reddit_comments)
+    """
+    with target_lock(f"{REDDIT}:post:{post.post_id}"):
+        bot = bot or RedditBot()
+        return ingest_reddit_comments(post, bot.get_post_comments(post.post_id))
+
+
+def sync_youtube_videos(user, bot=None):
+    """
+    Descarga todos los videos del canal y actualiza las estadísticas de los existentes
+
+    Args:
+        user (User): Dueño de los videos nuevos
+        bot (YouTubeBot, optional): Cliente a reutilizar
+
+    Returns:
+        dict: {'synced': videos nuevos}
+
+    Raises:
+        RateLimited: Si solo queda la cuota reservada para publicar
+    """
+    with target_lock(f"{YOUTUBE}:channel"):
+        bot = bot or YouTubeBot()
+        ensure_sync_quota(bot.account.quota)
+        # Todos los videos del canal (paginado y en lotes de 50)
+        videos_data = bot.get_channel_videos(max_results=None)
+
+        synced_count = 0
+        for video_data in videos_data:
+            video, created = YouTubeVideo.objects.get_or_create(
+                video_id=video_data['video_id'],
+                defaults={
+                    'user': user,
+                    'title': video_data['title'],
+                    'description': video_data['description'],
+                    'url': video_data['url'],
+                    'thumbnail_url': video_data['thumbnail_url'],
+                    'channel_title': video_data['channel_title'],
+                    'published_at': video_data['published_at'],
+                    'view_count': video_data['view_count'],
+                    'comment_count': video_data['comment_count']
+                }
+            )
+
+            # Actualizar estadísticas si ya existe
+            if not created:
+                video.view_count = video_data['view_count']
+                video.comment_count = video_data['comment_count']
+                video.save()
+            else:
+                synced_count += 1
+
+    return {'synced': synced_count}
+
+
+def sync_youtube_comments(video, mode='incremental', bot=None):
+    """
+    Descarga e inserta en bloque los comentarios de un video
+
+    Args:
+        video (YouTubeVideo): Video a sincronizar
+        mode (str): 'incremental' solo trae comentarios más nuevos que el
+            último guardado y las respuestas nuevas a hilos con actividad
+            reciente (ver youtube_reply_counts);
+            'full' vuelve a descargar todo para reparar
+        bot (YouTubeBot, optional): Cliente a reutilizar
+
+    Returns:
+        dict: {'inserted', 'updated'} (ver ingest_youtube_comments)
+
+    Raises:
+        RateLimited: Si solo queda la cuota reservada para publicar
+    """
+    with target_lock(f"{YOUTUBE}:video:{video.video_id}"):
+        bot = bot or YouTubeBot()
+        ensure_sync_quota(bot.account.quota)
+        watermark, reply_counts = None, None
+        if mode != 'full':
+            watermark = youtube_comment_watermark(video)
+            reply_counts = youtube_reply_counts(video)
+        comments_data = bot.get_video_comments(
+            video.video_id,
+            max_results=None,
+            watermark=watermark,
+            reply_counts=reply_counts
+        )
+        return ingest_youtube_comments(video, comments_data)
+
+
+def _recent_parents(schedule, now):
+    """Posts o videos activos del usuario cuyos comentarios se sincronizan"""
+    since = now - timedelta(days=settings.SYNC_COMMENTS_WINDOW_DAYS)
+    if schedule.platform == REDDIT:
+        return RedditPost.objects.filter(user=schedule.user, is_active=True, created_at__gte=since)
+    return YouTubeVideo.objects.filter(user=schedule.user, is_active=True, published_at__gte=since)
+
+
+def run_scheduled_sync(schedule):
+    """
+    Sincroniza posts/videos y luego los comentarios de los recientes para
+    un usuario y plataforma. Los objetivos bloqueados por otra corrida se
+    omiten. En YouTube solo se sincroniza lo que cabe en el presupuesto de
+    cuota de la corrida (ver YouTubeSyncPlanner) y el resto se difiere.
+    Guarda la duración y el resultado en el SyncSchedule.
+
+    Args:
+        schedule (SyncSchedule): Usuario y plataforma a sincronizar
+
+    Returns:
+        dict: {'posts', 'comments_inserted', 'comments_updated', 'targets', 'skipped',
+            'failed', 'deferred'} y, en YouTube, 'quota' (ver YouTubeSyncPlanner.summary)
+
+    Raises:
+        SyncInProgress: Si la corrida anterior del mismo usuario y plataforma sigue en curso
+        RateLimited: Si se agotó el cupo de llamadas a la plataforma (el
+            resultado parcial queda guardado en el SyncSchedule)
+    """
+    with target_lock(f"{schedule.platform}:user:{schedule.user_id}"):
+        return _run_scheduled_sync(schedule)
+
+
+def _run_scheduled_sync(schedule):
+    now = timezone.now()
+    start = time.perf_counter()
+    schedule.last_started_at = now
+    schedule.save(update_fields=['last_started_at'])
+
+    result = {
+        'posts': 0, 'comments_inserted': 0, 'comments_updated': 0,
+        'targets': 0, 'skipped': 0, 'failed': 0, 'deferred': 0
+    }
+    error = ''
+    rate_limited = None
+    planner = None
+    try:
+        if schedule.platform == REDDIT:
+            bot = RedditBot()
+            sync_parents, sync_comments = sync_reddit_posts, sync_reddit_comments
+        else:
+            bot = YouTubeBot()
+            sync_parents, sync_comments = sync_youtube_videos, sync_youtube_comments
+            planner = YouTubeSyncPlanner(schedule, bot.account.quota, now)
+
+        try:
+            if planner is None or planner.can_sync_videos():
+                result['posts'] = sync_parents(schedule.user, bot=bot)['synced']
+            else:
+                result['deferred'] += 1
+        except SyncInProgress as e:
+            logger.info(str(e))
+            result['skipped'] += 1
+
+        parents = _recent_parents(schedule, now)
+        if planner is not None:
+            # Los videos con más comentarios recientes primero, hasta agotar el presupuesto
+            parents, over_budget = planner.allocate(parents)
+            result['deferred'] += over_budget
+
+        for parent in parents:
+            if planner is not None and planner.left() <= 0:
+                # Las páginas reales superaron la estimación: el resto espera a la siguiente corrida
+                result['deferred'] += 1
+                continue
+            result['targets'] += 1
+            try:
+                ingested = sync_comments(parent, bot=bot)
+            except SyncInProgress as e:
+                logger.info(str(e))
+                result['skipped'] += 1
+                continue
+            except RateLimited:
+                # Sin cupo de llamadas el resto también fallaría: se corta la corrida
+                raise
+            except Exception as e:
+                # Un post o video con error no detiene el resto
+                logger.error(f"Error al sincronizar comentarios de {parent.pk} ({schedule.platform}): {str(e)}")
+                result['failed'] += 1
+                continue
+            result['comments_inserted'] += ingested['inserted']
+            result['comments_updated'] += ingested['updated']
+    except RateLimited as e:
+        logger.warning(f"Sincronización de {schedule} diferida: {str(e)}")
+        error = str(e)
+        rate_limited = e
+    except Exception as e:
+        logger.error(f"Error en la sincronización de {schedule}: {str(e)}")
+        error = str(e)
+
+    if planner is not None:
+        result['quota'] = planner.summary()
+        if result['deferred']:
+            logger.info(f"Sincronización de {schedule}: {result['deferred']} objetivos diferidos por cuota ({result['quota']})")
+
+    schedule.last_finished_at = timezone.now()
+    schedule.last_duration_ms = round((time.perf_counter() - start) * 1000)
+    schedule.last_status = SyncSchedule.Status.ERROR if error or result['failed'] else SyncSchedule.Status.OK
+    schedule.last_result = result
+    schedule.last_error = error
+    schedule.save(update_fields=[
+        'last_finished_at', 'last_duration_ms', 'last_status', 'last_result', 'last_error'
+    ])
+    if rate_limited:
+        raise rate_limited
+    return result
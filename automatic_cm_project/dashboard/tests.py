@@ -1,3 +1,799 @@
-from django.test import TestCase
+import asyncio
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+import httplib2
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from googleapiclient.errors import HttpError
+from praw.exceptions import RedditAPIException
+from ai_manager import reply_cache
+from ai_manager.circuit_breaker import get_circuit_breaker
+from ai_manager.response_generator import GenerationInterrupted
+from ai_manager.scheduler import QueueTimeout
+from bots.quota import QuotaLedger
+from bots.rate_limit import RateLimited
+from . import clustering, publishing, sync
+from .clustering import apply_draft_to_cluster, comment_signature, estimate_similarity
+from .ingestion import ingest_youtube_comments, youtube_reply_counts
+from .metrics import get_reddit_metrics
+from .quota_planner import YouTubeSyncPlanner, ensure_sync_quota
+from .models import (
+    RedditPost, Comment, Response, YouTubeVideo, YouTubeComment, YouTubeResponse, SyncSchedule
+)
+from .snapshots import get_dashboard_snapshot, REDDIT, YOUTUBE
 
-# Create your tests here.
+LOCMEM_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+}
+
+
+def make_post(user, index, created_at=None, **kwargs):
+    return RedditPost.objects.create(
+        user=user,
+        post_id=f'p{index}',
+        title=f'Post {index}',
+        url='https://reddit.com/',
+        permalink='https://reddit.com/',
+        subreddit='ACM_Magneto',
+        author='autor',
+        created_at=created_at or timezone.now(),
+        **kwargs
+    )
+
+
+def make_comment(post, index):
+    return Comment.objects.create(
+        post=post,
+        comment_id=f'{post.post_id}c{index}',
+        author='usuario',
+        content='Hola',
+        permalink='https://reddit.com/',
+        created_at=timezone.now()
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RedditMetricsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cm', password='x')
+
+    def test_metrics_values(self):
+        now = timezone.now()
+        recent = make_post(self.user, 1, created_at=now - timedelta(days=1))
+        old = make_post(self.user, 2, created_at=now - timedelta(days=20))
+        inactive = make_post(self.user, 3, is_active=False)
+
+        c1 = make_comment(recent, 1)
+        c2 = make_comment(recent, 2)
+        make_comment(recent, 3)
+        c4 = make_comment(old, 1)
+        c5 = make_comment(inactive, 1)
+
+        Response.objects.create(comment=c1, generated_text='a', tone='friendly', status='published')
+        Response.objects.create(comment=c2, generated_text='b', tone='friendly', status='rejected')
+        Response.objects.create(comment=c4, generated_text='c', tone='friendly', status='pending')
+        Response.objects.create(comment=c5, generated_text='d', tone='friendly', status='pending')
+
+        metrics = get_reddit_metrics(self.user, now=now)
+
+        self.assertEqual(metrics['total_posts'], 2)
+        self.assertEqual(metrics['total_comments'], 4)
+        # c3 sin respuesta y c4 pendiente
+        self.assertEqual(metrics['total_unread'], 2)
+        self.assertEqual(metrics['pending_responses'], 2)
+        self.assertEqual(metrics['published_responses'], 1)
+        self.assertEqual(metrics['posts_7d'], 1)
+        self.assertEqual(metrics['avg_comments'], 2.0)
+        self.assertEqual(metrics['response_rate'], 100.0)
+        self.assertEqual(
+            [week['posts'] for week in metrics['activity_data']],
+            [0, 1, 0, 1]
+        )
+        self.assertEqual(metrics['engagement_data'][0], {'title': 'Post 1', 'comments': 3})
+
+    def test_query_count_is_constant(self):
+        make_post(self.user, 0)
+        with self.assertNumQueries(3):
+            get_reddit_metrics(self.user)
+
+        for i in range(1, 50):
+            post = make_post(self.user, i)
+            for j in range(3):
+                make_comment(post, j)
+        with self.assertNumQueries(3):
+            metrics = get_reddit_metrics(self.user)
+
+        self.assertEqual(metrics['total_posts'], 50)
+        self.assertEqual(metrics['total_comments'], 147)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DashboardSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cm', password='x')
+        self.post = make_post(self.user, 1)
+        self.comment = make_comment(self.post, 1)
+
+    def test_steady_state_is_cached(self):
+        get_dashboard_snapshot(self.user, REDDIT)
+        with self.assertNumQueries(0):
+            snapshot = get_dashboard_snapshot(self.user, REDDIT)
+        self.assertEqual(snapshot['total_comments'], 1)
+
+    def test_signals_invalidate_snapshot(self):
+        self.assertEqual(get_dashboard_snapshot(self.user, REDDIT)['total_unread'], 1)
+
+        response = Response.objects.create(
+            comment=self.comment, generated_text='a', tone='friendly', status='published'
+        )
+        self.assertEqual(get_dashboard_snapshot(self.user, REDDIT)['total_unread'], 0)
+
+        response.delete()
+        make_comment(self.post, 2)
+        snapshot = get_dashboard_snapshot(self.user, REDDIT)
+        self.assertEqual(snapshot['total_unread'], 2)
+        self.assertEqual(snapshot['total_comments'], 2)
+
+
+    def test_open_breaker_shows_warning(self):
+        self.client.force_login(self.user)
+        self.assertNotContains(self.client.get('/dashboard/reddit/'), 'El servidor de IA no responde')
+
+        get_circuit_breaker().open('Error en la API: 503')
+        self.assertContains(self.client.get('/dashboard/reddit/'), 'El servidor de IA no responde')
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CommentCountersTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cm', password='x')
+        self.post = make_post(self.user, 1)
+
+    def assertCounters(self, comments_total, unread_total):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_total, comments_total)
+        self.assertEqual(self.post.unread_total, unread_total)
+
+    def test_counters_follow_comments_and_responses(self):
+        first = make_comment(self.post, 1)
+        make_comment(self.post, 2)
+        self.assertCounters(2, 2)
+
+        response = Response.objects.create(comment=first, generated_text='a', tone='friendly')
+        self.assertCounters(2, 2)
+
+        response.publish()
+        self.assertCounters(2, 1)
+
+        first.delete()
+        self.assertCounters(1, 1)
+
+    def test_recount_command_repairs_counters(self):
+        make_comment(self.post, 1)
+        RedditPost.objects.filter(pk=self.post.pk).update(comments_total=99, unread_total=99)
+
+        call_command('recount_comments', stdout=StringIO())
+        self.assertCounters(1, 1)
+
+    def test_manager_renders_without_per_post_queries(self):
+        for i in range(2, 12):
+            post = make_post(self.user, i)
+            make_comment(post, 1)
+        self.client.force_login(self.user)
+        self.client.get('/dashboard/reddit/')
+
+        # Con el snapshot en caché solo quedan sesión, usuario, la lista de posts
+        # y la última sincronización automática
+        with self.assertNumQueries(4):
+            response = self.client.get('/dashboard/reddit/')
+        self.assertContains(response, '1 nuevo')
+
+
+def youtube_comment_data(index, like_count=0):
+    published = timezone.now().replace(microsecond=0)
+    return {
+        'comment_id': f'yt{index}',
+        'author': 'usuario',
+        'author_channel_id': '',
+        'content': f'Comentario {index}',
+        'like_count': like_count,
+        'published_at': published,
+        'updated_at': published,
+        'parent_id': None,
+        'is_reply': False
+    }
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CommentIngestionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cm', password='x')
+        self.video = YouTubeVideo.objects.create(
+            user=self.user,
+            video_id='v1',
+            title='Video',
+            url='https://www.youtube.com/',
+            thumbnail_url='https://www.youtube.com/',
+            channel_title='Canal',
+            published_at=timezone.now()
+        )
+
+    def test_inserts_then_upserts_changed_rows(self):
+        data = [youtube_comment_data(i) for i in range(5)]
+        result = ingest_youtube_comments(self.video, data, batch_size=2)
+        self.assertEqual(result, {'inserted': 5, 'updated': 0})
+
+        data[0]['like_count'] = 10
+        data.append(youtube_comment_data(5))
+        result = ingest_youtube_comments(self.video, data, batch_size=2)
+        self.assertEqual(result, {'inserted': 1, 'updated': 1})
+
+        self.assertEqual(YouTubeComment.objects.get(comment_id='yt0').like_count, 10)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.comments_total, 6)
+        self.assertEqual(self.video.unread_total, 6)
+
+    def test_query_count_does_not_grow_per_row(self):
+        data = [youtube_comment_data(i) for i in range(60)]
+        # savepoint + prefetch + INSERT + UPDATE de contadores + release
+        # (el clustering se prueba en CommentClusteringTests)
+        with patch('dashboard.ingestion.cluster_new_comments'), self.assertNumQueries(5):
+            ingest_youtube_comments(self.video, data)
+
+    def test_incremental_sync_sends_stored_replies_per_thread(self):
+        data = [youtube_comment_data(i) for i in range(3)]
+        reply = youtube_comment_data(3)
+        reply.update(parent_id='yt0', is_reply=True)
+        ingest_youtube_comments(self.video, data + [reply])
+        bot = patch('dashboard.sync.YouTubeBot').start().return_value
+        self.addCleanup(patch.stopall)
+        bot.account.quota = QuotaLedger('canal', daily_quota=100)
+        bot.get_video_comments.return_value = []
+
+        sync.sync_youtube_comments(self.video)
+        sync.sync_youtube_comments(self.video, mode='full')
+
+        incremental, full = bot.get_video_comments.call_args_list
+        self.assertEqual(incremental.kwargs['reply_counts'], {'yt0': 1, 'yt1': 0, 'yt2': 0})
+        self.assertIsNone(full.kwargs['reply_counts'])
+
+    @override_settings(SYNC_REPLY_WINDOW_DAYS=7, SYNC_REPLY_MAX_THREADS=2)
+    def test_reply_check_is_bounded_to_recently_active_threads(self):
+        old = timezone.now() - timedelta(days=30)
+        data = [youtube_comment_data(i) for i in range(6)]
+        for thread in data[:4]:
+            thread.update(published_at=old, updated_at=old)
+        # yt0 es viejo pero recibió una respuesta reciente; yt1..yt3 están quietos
+        reply = youtube_comment_data(6)
+        reply.update(parent_id='yt0', is_reply=True)
+        ingest_youtube_comments(self.video, data + [reply])
+
+        counts = youtube_reply_counts(self.video)
+
+        # Hasta SYNC_REPLY_MAX_THREADS hilos, los más activos primero
+        self.assertEqual(len(counts), 2)
+        self.assertEqual(set(counts) & {'yt1', 'yt2', 'yt3'}, set())
+        with self.settings(SYNC_REPLY_MAX_THREADS=10):
+            self.assertEqual(youtube_reply_counts(self.video), {'yt0': 1, 'yt4': 0, 'yt5': 0})
+
+
+async def fake_stream(*args, **kwargs):
+    for token in ['Hola', ' amigo ']:
+        yield token
+
+
+async def broken_stream(*args, **kwargs):
+    yield 'Hola'
+    raise GenerationInterrupted('La generación se interrumpió, intenta de nuevo')
+
+
+async def saturated_stream(*args, **kwargs):
+    raise QueueTimeout('Sin turno en el servidor de modelos', 20)
+    yield
+
+
+async def slow_chat(self, messages, **kwargs):
+    """Servidor de modelos simulado: cada generación tarda 0.3 s"""
+    await asyncio.sleep(0.3)
+    return {'message': {'content': 'Con gusto'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class GenerateResponseStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cm', password='x')
+        self.client.force_login(self.user)
+        self.comment = make_comment(make_post(self.user, 1), 1)
+
+    async def test_streams_tokens_and_saves_response(self):
+        await self.async_client.aforce_login(self.user)
+        with patch('dashboard.views.ResponseGenerator.agenerate_stream', side_effect=fake_stream):
+            response = await self.async_client.post(
+                f'/dashboard/reddit/comment/{self.comment.comment_id}/generate/stream/',
+                {'tone': 'formal'}
+            )
+            body = ''.join([chunk.decode() async for chunk in response.streaming_content])
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('data: {"token": "Hola"}\n\n', body)
+        self.assertIn('event: done', body)
+
+        saved = await Response.objects.aget(comment=self.comment)
+        self.assertEqual(saved.generated_text, 'Hola amigo')
+        self.assertEqual(saved.tone, 'formal')
+        self.assertEqual(saved.status, Response.Status.PENDING)
+
+    async def test_failed_stream_sends_error_without_saving(self):
+        await self.async_client.aforce_login(self.user)
+        with patch('dashboard.views.ResponseGenerator.agenerate_stream', side_effect=broken_stream):
+            response = await self.async_client.post(
+                f'/dashboard/reddit/comment/{self.comment.comment_id}/generate/stream/'
+            )
+            body = ''.join([chunk.decode() async for chunk in response.streaming_content])
+
+        self.assertIn('data: {"token": "Hola"}\n\n', body)
+        self.assertIn('event: error', body)
+        self.assertNotIn('event: done', body)
+        self.assertFalse(await Response.objects.filter(comment=self.comment).aexists())
+
+    def test_other_users_comment_is_forbidden(self):
+        other = User.objects.create_user('otro', password='x')
+        self.client.force_login(other)
+        response = self.client.post(
+            f'/dashboard/reddit/comment/{self.comment.comment_id}/generate/stream/'
+        )
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(LLM_MAX_INTERACTIVE_QUEUE=1)
+    def test_full_queue_returns_429_with_eta(self):
+        cache.set('ai:sched:waiting:interactive', 1)
+        with patch('dashboard.views.ResponseGenerator.agenerate_stream') as stream:
+            response = self.client.post(
+                f'/dashboard/reddit/comment/{self.comment.comment_id}/generate/stream/'
+            )
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(response.json()['eta_seconds'], 0)
+        self.assertEqual(response['Retry-After'], str(response.json()['eta_seconds']))
+        stream.assert_not_called()
+
+    def test_queue_timeout_while_waiting_returns_429_without_saving(self):
+        url = f'/dashboard/reddit/comment/{self.comment.comment_id}/generate/'
+        with patch('dashboard.views.ResponseGenerator.agenerate', side_effect=QueueTimeout('cola', 20)):
+            response = self.client.post(url)
+        with patch('dashboard.views.ResponseGenerator.agenerate_stream', side_effect=saturated_stream):
+            stream_response = self.client.post(url + 'stream/')
+
+        for response in (response, stream_response):
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '20')
+        self.assertFalse(Response.objects.filter(comment=self.comment).exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AsyncGenerationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reply_cache._reply_cache = None
+        self.user = User.objects.create_user('cm', password='x')
+        self.post = make_post(self.user, 1)
+        self.comments = [make_comment(self.post, i) for i in range(8)]
+
+    async def test_generations_do_not_starve_dashboard(self):
+        await self.async_client.aforce_login(self.user)
+        finished = []
+
+        async def generate(comment):
+            response = await self.async_client.post(
+                f'/dashboard/reddit/comment/{comment.comment_id}/generate/',
+                {'tone': 'friendly', 'regenerate': '1'}
+            )
+            finished.append('generate')
+            return response
+
+        async def dashboard():
+            # Llega cuando todas las generaciones ya esperan al modelo
+            await asyncio.sleep(0.05)
+            response = await self.async_client.get('/dashboard/reddit/')
+            finished.append('dashboard')
+            return response
+
+        with patch('ai_manager.llm_client.AsyncOllamaClient.chat', slow_chat):
+            responses = await asyncio.gather(
+                *(generate(comment) for comment in self.comments), dashboard()
+            )
+
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertEqual(finished[0], 'dashboard')
+        self.assertEqual(await Response.objects.filter(generated_text='Con gusto').acount(), 8)
+
+    def test_job_post_form_page_renders(self):
+        self.client.force_login(self.user)
+
+        page = self.client.get(reverse('generate_job_post'))
+        invalid = self.client.post(reverse('generate_job_post'), {'job_title': ''})
+
+        self.assertEqual(page.status_code, 200)
+        self.assertTemplateUsed(page, 'dashboard/generate_job_post.html')
+        self.assertEqual(invalid.status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CommentClusteringTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cm', password='x')
+        self.video = YouTubeVideo.objects.create(
+            user=self.user,
+            video_id='v1',
+            title='Video',
+            url='https://www.youtube.com/',
+            thumbnail_url='https://www.youtube.com/',
+            channel_title='Canal',
+            published_at=timezone.now()
+        )
+
+    def ingest(self, contents, start=0):
+        data = []
+        for i, content in enumerate(contents, start):
+            comment = youtube_comment_data(i)
+            comment['content'] = content
+            data.append(comment)
+        ingest_youtube_comments(self.video, data)
+
+    def cluster_of(self, index):
+        return YouTubeComment.objects.get(comment_id=f'yt{index}').cluster_id
+
+    def test_signature_similarity(self):
+        base = comment_signature('Quiero participar en el sorteo, ojalá gane!')
+        near = comment_signature('quiero participar en el sorteo ojala gane')
+        other = comment_signature('¿A qué hora empieza la transmisión de mañana?')
+
+        self.assertGreater(estimate_similarity(base, near), 0.7)
+        self.assertLess(estimate_similarity(base, other), 0.3)
+
+    def test_near_duplicates_share_cluster_across_syncs(self):
+        self.ingest([
+            'Quiero participar en el sorteo, ojalá gane!',
+            '¿A qué hora empieza la transmisión de mañana?',
+            'Quiero participar en el sorteo!! ojalá gane',
+        ])
+        self.ingest(['quiero participar en el sorteo ojala gane 🙏'], start=3)
+
+        self.assertEqual(self.cluster_of(0), self.cluster_of(2))
+        self.assertEqual(self.cluster_of(0), self.cluster_of(3))
+        self.assertNotEqual(self.cluster_of(0), self.cluster_of(1))
+
+    def test_draft_applied_to_every_pending_member(self):
+        self.ingest(['Gracias por el video!', 'gracias por el video', 'Gracias por el video!!!'])
+        answered = YouTubeComment.objects.get(comment_id='yt0')
+        YouTubeResponse.objects.create(comment=answered, generated_text='previa', tone='formal')
+
+        created = apply_draft_to_cluster('youtube', answered.cluster_id, '¡Gracias a ti!', 'friendly')
+
+        self.assertEqual(created, 2)
+        self.assertEqual(
+            YouTubeResponse.objects.filter(generated_text='¡Gracias a ti!').count(), 2
+        )
+        self.assertEqual(YouTubeResponse.objects.get(comment=answered).generated_text, 'previa')
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.unread_total, 3)
+
+    def test_members_answered_meanwhile_are_not_counted(self):
+        self.ingest(['Gracias por el video!', 'gracias por el video', 'Gracias por el video!!!'])
+        cluster_id = YouTubeComment.objects.get(comment_id='yt0').cluster_id
+        pending_cluster_members = clustering.pending_cluster_members
+
+        def answered_meanwhile(platform, cluster_id):
+            # El moderador responde yt1 después de que se listaron los miembros
+            if not YouTubeResponse.objects.exists() and racing.call_count > 1:
+                YouTubeResponse.objects.create(
+                    comment=YouTubeComment.objects.get(comment_id='yt1'), generated_text='manual', tone='formal'
+                )
+            return pending_cluster_members(platform, cluster_id)
+
+        with patch('dashboard.clustering.pending_cluster_members', side_effect=answered_meanwhile) as racing:
+            created = apply_draft_to_cluster('youtube', cluster_id, '¡Gracias a ti!', 'friendly')
+
+        self.assertEqual(created, 2)
+        self.assertEqual(YouTubeResponse.objects.get(comment__comment_id='yt1').generated_text, 'manual')
+
+
+@override_settings(CACHES=LOCMEM_CACHE, PUBLISH_MAX_INLINE_SLEEP=10)
+class PublishingOutboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cm', password='x')
+        self.post = make_post(self.user, 1)
+        self.responses = [
+            Response.objects.create(comment=make_comment(self.post, i), generated_text=f'r{i}', tone='friendly')
+            for i in range(2)
+        ]
+        self.bot = patch('dashboard.publishing.RedditBot').start().return_value
+        self.addCleanup(patch.stopall)
+
+    def queue_all(self):
+        publishing.enqueue(REDDIT, [r.pk for r in self.responses])
+
+    def test_publish_view_queues_instead_of_calling_reddit(self):
+        self.client.force_login(self.user)
+        with patch('core.tasks.drain_publish_outbox.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(f'/dashboard/reddit/response/{self.responses[0].pk}/publish/')
+
+        self.assertEqual(response.status_code, 202)
+        delay.assert_called_once_with(REDDIT)
+        self.bot.reply_to_comment.assert_not_called()
+
+        status = self.client.get(f'/dashboard/reddit/response/{self.responses[0].pk}/status/').json()
+        self.assertEqual(status['status'], 'queued')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.unread_total, 1)
+
+    def test_batch_publish_queues_approved_responses(self):
+        Response.objects.filter(pk=self.responses[0].pk).update(status='approved')
+        self.client.force_login(self.user)
+        with patch('core.tasks.drain_publish_outbox.delay'):
+            response = self.client.post(f'/dashboard/reddit/post/{self.post.post_id}/publish-responses/')
+
+        self.assertEqual(response.json()['queued'], 1)
+        summary = self.client.get('/dashboard/outbox/reddit/status/').json()
+        self.assertEqual(summary['queued'], 1)
+
+    def test_drain_publishes_and_backs_off_transient_errors(self):
+        self.queue_all()
+        self.bot.reply_to_comment.side_effect = [ConnectionResetError('reset'), 'reply1']
+
+        result = publishing.drain_outbox(REDDIT)
+
+        self.assertEqual((result['published'], result['retrying']), (1, 1))
+        self.assertGreater(result['next_in'], 0)
+        retried, published = (Response.objects.get(pk=r.pk) for r in self.responses)
+        self.assertEqual(retried.status, 'queued')
+        self.assertEqual(retried.publish_attempts, 1)
+        self.assertGreater(retried.next_attempt_at, timezone.now())
+        self.assertEqual(published.status, 'published')
+        self.assertEqual(published.reddit_reply_id, 'reply1')
+
+    def test_rate_limit_pauses_the_whole_queue(self):
+        self.queue_all()
+        self.bot.reply_to_comment.side_effect = RedditAPIException(
+            [['RATELIMIT', 'Take a break for 9 minutes before trying again.', 'ratelimit']]
+        )
+
+        result = publishing.drain_outbox(REDDIT)
+
+        self.assertEqual(self.bot.reply_to_comment.call_count, 1)
+        self.assertGreater(result['next_in'], 8 * 60)
+        for response in Response.objects.filter(pk__in=[r.pk for r in self.responses]):
+            self.assertEqual(response.status, 'queued')
+            self.assertEqual(response.publish_attempts, 0)
+
+    def test_short_rate_limit_is_slept_in_the_worker(self):
+        self.queue_all()
+        self.bot.reply_to_comment.side_effect = [
+            RedditAPIException([['RATELIMIT', 'Take a break for 5 seconds before trying again.', 'ratelimit']]),
+            'reply0', 'reply1'
+        ]
+
+        with patch('dashboard.publishing.time.sleep') as sleep:
+            result = publishing.drain_outbox(REDDIT)
+
+        sleep.assert_called_once_with(6)
+        self.assertEqual(result['published'], 2)
+        self.assertIsNone(result['next_in'])
+
+    @override_settings(PUBLISH_MAX_ATTEMPTS=2)
+    def test_permanent_errors_and_exhausted_retries_fail(self):
+        self.queue_all()
+        Response.objects.filter(pk=self.responses[1].pk).update(publish_attempts=1)
+        self.bot.reply_to_comment.side_effect = [
+            RedditAPIException([['DELETED_COMMENT', 'that comment has been deleted', 'parent']]),
+            ConnectionResetError('reset'),
+        ]
+
+        result = publishing.drain_outbox(REDDIT)
+
+        self.assertEqual(result['failed'], 2)
+        self.assertEqual(
+            set(Response.objects.values_list('status', flat=True)), {'failed'}
+        )
+
+    def test_youtube_quota_waits_for_daily_reset(self):
+        error = HttpError(
+            httplib2.Response({'status': 403}),
+            b'{"error": {"message": "quota", "errors": [{"reason": "quotaExceeded"}]}}'
+        )
+        retry = publishing.as_retry(YOUTUBE, error)
+
+        self.assertTrue(retry.rate_limited)
+        self.assertLessEqual(retry.delay, 25 * 60 * 60)
+        self.assertIsNone(publishing.as_retry(YOUTUBE, HttpError(httplib2.Response({'status': 400}), b'{}')))
+
+    def test_own_rate_limiter_pauses_the_account(self):
+        retry = publishing.as_retry(REDDIT, RateLimited('reddit:bot', 90))
+
+        self.assertTrue(retry.rate_limited)
+        self.assertEqual(retry.delay, 90)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class BulkReviewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cm', password='x')
+        self.post = make_post(self.user, 1)
+        self.client.force_login(self.user)
+
+    def make_responses(self, count, start=0):
+        return [
+            Response.objects.create(comment=make_comment(self.post, i), generated_text=f'r{i}', tone='friendly')
+            for i in range(start, start + count)
+        ]
+
+    def bulk(self, action, responses, **payload):
+        return self.client.post(
+            '/dashboard/reddit/responses/bulk/',
+            data={'action': action, 'response_ids': [r.pk for r in responses], **payload},
+            content_type='application/json'
+        )
+
+    def test_queries_do_not_grow_with_the_number_of_responses(self):
+        few, many = self.make_responses(2), self.make_responses(20, start=2)
+
+        with CaptureQueriesContext(connection) as few_queries:
+            self.bulk('approve', few)
+        with CaptureQueriesContext(connection) as many_queries:
+            response = self.bulk('approve', many)
+
+        self.assertEqual(response.json(), {'success': True, 'updated': 20, 'skipped': 0})
+        self.assertEqual(len(few_queries), len(many_queries))
+        self.assertEqual(Response.objects.filter(status='approved').count(), 22)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.unread_total, 0)
+
+    def test_foreign_response_rejects_the_whole_request(self):
+        mine = self.make_responses(1)
+        other_post = make_post(User.objects.create_user('otro', password='x'), 2)
+        theirs = Response.objects.create(comment=make_comment(other_post, 1), generated_text='x', tone='friendly')
+
+        response = self.bulk('reject', mine + [theirs])
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Response.objects.filter(status='rejected').exists())
+
+    def test_publish_saves_edits_and_queues_in_one_step(self):
+        approved, published = self.make_responses(2)
+        Response.objects.filter(pk=published.pk).update(status='published')
+
+        with patch('core.tasks.drain_publish_outbox.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.bulk('publish', [approved, published], edited_texts={str(approved.pk): ' Editada '})
+
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(response.json()['skipped'], 1)
+        delay.assert_called_once_with(REDDIT)
+        approved.refresh_from_db()
+        self.assertEqual((approved.status, approved.edited_text), ('queued', 'Editada'))
+
+    def test_invalid_action_is_a_bad_request(self):
+        self.assertEqual(self.bulk('delete', self.make_responses(1)).status_code, 400)
+
+
+# Intervalo mayor que un día: la corrida recibe todo el presupuesto restante
+SINGLE_RUN_INTERVAL = 60 * 48
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class YouTubeQuotaPlannerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cm', password='x')
+        self.schedule = SyncSchedule.objects.create(
+            user=self.user, platform=YOUTUBE, interval_minutes=SINGLE_RUN_INTERVAL
+        )
+        self.ledger = QuotaLedger('canal', daily_quota=100)
+        self.videos = []
+        next_comment = 0
+        for index, recent_comments in enumerate([2, 9, 0]):
+            video = YouTubeVideo.objects.create(
+                user=self.user,
+                video_id=f'v{index}',
+                title=f'Video {index}',
+                url='https://www.youtube.com/',
+                thumbnail_url='https://www.youtube.com/',
+                channel_title='Canal',
+                published_at=timezone.now()
+            )
+            data = [youtube_comment_data(next_comment + i) for i in range(recent_comments)]
+            ingest_youtube_comments(video, data)
+            next_comment += recent_comments
+            self.videos.append(video)
+
+    def spend(self, units):
+        for _ in range(units):
+            self.ledger.record('youtube.videos.list')
+
+    def queue_reply(self):
+        comment = YouTubeComment.objects.filter(video=self.videos[1]).first()
+        YouTubeResponse.objects.create(
+            comment=comment, generated_text='Gracias', tone='friendly', status=YouTubeResponse.Status.QUEUED
+        )
+
+    def test_ledger_records_unit_cost_per_method(self):
+        self.ledger.record('youtube.commentThreads.list')
+        self.ledger.record('youtube.comments.insert')
+
+        usage = self.ledger.usage()
+        self.assertEqual(usage['used'], 51)
+        self.assertEqual(usage['remaining'], 49)
+        self.assertEqual(usage['by_method'], {'youtube.commentThreads.list': 1, 'youtube.comments.insert': 50})
+
+    def test_videos_with_more_recent_comments_go_first(self):
+        # v1 y v0: una página de comentarios y un lote de hilos activos cada uno
+        self.spend(96)
+
+        selected, deferred = YouTubeSyncPlanner(self.schedule, self.ledger).allocate(
+            YouTubeVideo.objects.filter(user=self.user)
+        )
+
+        self.assertEqual(selected, [self.videos[1], self.videos[0]])
+        self.assertEqual(deferred, 1)
+
+    @override_settings(SYNC_REPLY_MAX_THREADS=100)
+    def test_reply_check_of_many_stored_threads_is_budgeted(self):
+        video = YouTubeVideo.objects.create(
+            user=self.user,
+            video_id='v3',
+            title='Video 3',
+            url='https://www.youtube.com/',
+            thumbnail_url='https://www.youtube.com/',
+            channel_title='Canal',
+            published_at=timezone.now()
+        )
+        ingest_youtube_comments(video, [youtube_comment_data(100 + i) for i in range(120)])
+        candidates = YouTubeVideo.objects.filter(pk=video.pk)
+
+        # 3 páginas de comentarios nuevos + 2 lotes de commentThreads.list (100 hilos activos)
+        self.spend(96)
+        self.assertEqual(YouTubeSyncPlanner(self.schedule, self.ledger).allocate(candidates), ([], 1))
+        self.ledger = QuotaLedger('otro-canal', daily_quota=100)
+        self.spend(95)
+        self.assertEqual(YouTubeSyncPlanner(self.schedule, self.ledger).allocate(candidates), ([video], 0))
+
+    def test_queued_publishes_keep_their_units(self):
+        self.queue_reply()
+        self.spend(45)
+
+        planner = YouTubeSyncPlanner(self.schedule, self.ledger)
+
+        self.assertEqual((planner.reserved, planner.budget), (50, 5))
+        self.spend(5)
+        with self.assertRaises(RateLimited):
+            ensure_sync_quota(self.ledger)
+
+    def test_scheduled_run_defers_what_does_not_fit(self):
+        self.spend(98)
+        bot = patch('dashboard.sync.YouTubeBot').start().return_value
+        self.addCleanup(patch.stopall)
+        bot.account.quota = self.ledger
+        # Una página de comentarios y un lote de hilos activos por video
+        bot.get_video_comments.side_effect = lambda *args, **kwargs: self.spend(2) or []
+
+        result = sync.run_scheduled_sync(self.schedule)
+
+        # La lista de videos (3 unidades) no cabe; los comentarios, por velocidad, hasta agotar las 2 unidades
+        bot.get_channel_videos.assert_not_called()
+        self.assertEqual(
+            [call.args[0] for call in bot.get_video_comments.call_args_list],
+            [self.videos[1].video_id]
+        )
+        self.assertEqual(result['deferred'], 3)
+        self.assertEqual(result['quota']['spent'], 2)
@@ -24,9 +24,22 @@ urlpatterns = [
     
     # Generación y gestión de respuestas
     path('reddit/comment/<str:comment_id>/generate/', views.generate_response, name='generate_response'),
+    path('reddit/comment/<str:comment_id>/generate/stream/', views.generate_response_stream, name='generate_response_stream'),
     path('reddit/response/<int:response_id>/update/', views.update_response, name='update_response'),
     path('reddit/response/<int:response_id>/publish/', views.publish_response, name='publish_response'),
+    path('reddit/response/<int:response_id>/status/', views.publish_response_status, name='publish_response_status'),
     path('reddit/response/<int:response_id>/reject/', views.reject_response, name='reject_response'),
+    path('reddit/response/<int:response_id>/apply-to-similar/', views.apply_response_to_cluster, name='apply_response_to_cluster'),
+    path('reddit/responses/bulk/', views.bulk_review_responses, name='bulk_review_responses'),
+    
+    # Borradores en segundo plano
+    path('reddit/generate-drafts/', views.generate_drafts_reddit, name='generate_drafts_reddit'),
+    path('reddit/post/<str:post_id>/generate-drafts/', views.generate_drafts_post, name='generate_drafts_post'),
+    path('drafts/<str:task_id>/status/', views.draft_generation_status, name='draft_generation_status'),
+    
+    # Cola de publicación
+    path('reddit/post/<str:post_id>/publish-responses/', views.publish_post_responses, name='publish_post_responses'),
+    path('outbox/<str:platform>/status/', views.outbox_status, name='outbox_status'),
     
     # ===== YOUTUBE =====
     # Vista principal
@@ -44,7 +57,18 @@ urlpatterns = [
     
     # Generación y gestión de respuestas
     path('youtube/comment/<str:comment_id>/generate/', views_youtube.generate_response_yt, name='generate_response_yt'),
+    path('youtube/comment/<str:comment_id>/generate/stream/', views_youtube.generate_response_stream_yt, name='generate_response_stream_yt'),
     path('youtube/response/<int:response_id>/update/', views_youtube.update_response_yt, name='update_response_yt'),
     path('youtube/response/<int:response_id>/publish/', views_youtube.publish_response_yt, name='publish_response_yt'),
+    path('youtube/response/<int:response_id>/status/', views_youtube.publish_response_status_yt, name='publish_response_status_yt'),
     path('youtube/response/<int:response_id>/reject/', views_youtube.reject_response_yt, name='reject_response_yt'),
+    path('youtube/response/<int:response_id>/apply-to-similar/', views_youtube.apply_response_to_cluster_yt, name='apply_response_to_cluster_yt'),
+    path('youtube/responses/bulk/', views_youtube.bulk_review_responses_yt, name='bulk_review_responses_yt'),
+    
+    # Borradores en segundo plano
+    path('youtube/generate-drafts/', views_youtube.generate_drafts_yt, name='generate_drafts_yt'),
+    path('youtube/video/<str:video_id>/generate-drafts/', views_youtube.generate_drafts_video_yt, name='generate_drafts_video_yt'),
+    
+    # Cola de publicación
+    path('youtube/video/<str:video_id>/publish-responses/', views_youtube.publish_video_responses_yt, name='publish_video_responses_yt'),
 ]
\ No newline at end of file
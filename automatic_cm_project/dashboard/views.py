@@ -1,85 +1,49 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.utils import timezone
 from django.contrib import messages
-from .models import RedditPost, Comment, Response
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from .models import RedditPost, Comment, Response, SyncSchedule
 from ai_manager.response_generator import ResponseGenerator
+from ai_manager.scheduler import QueueTimeout
+from bots.rate_limit import RateLimited
 from bots.reddit_bot import RedditBot
+import math
 import logging
 from django.core.files.storage import FileSystemStorage
 from ai_manager.post_generator import PostGenerator
 from .forms import CreatePostForm, GenerateJobPostForm, EditPostForm
+from celery.result import AsyncResult
+from core.tasks import drain_publish_outbox, draft_task_owner, start_draft_generation, start_publishing
+from .clustering import apply_draft_to_cluster, pending_cluster_members
+from .decorators import admission_control, busy_response
+from .publishing import publish_status, outbox_summary
+from .review import PUBLISH, review_responses
+from .streaming import aprime, astream_generation, sse_response
+from .sync import sync_reddit_posts, sync_reddit_comments, SyncInProgress
+from .snapshots import get_dashboard_snapshot, REDDIT, YOUTUBE
 
 logger = logging.getLogger(__name__)
 
 @login_required
 def reddit_manager(request):
     """Vista principal - Lista de posts del subreddit"""
-    from datetime import timedelta
-    from django.db.models import Count
     import json
     
     posts = RedditPost.objects.filter(user=request.user, is_active=True)
     
-    # Calcular métricas
-    total_posts = posts.count()
-    total_comments = sum(post.comments.count() for post in posts)
-    total_unread = sum(post.unread_comments_count for post in posts)
-    
-    # Respuestas pendientes y publicadas
-    pending_responses = Response.objects.filter(
-        comment__post__user=request.user,
-        status='pending'
-    ).count()
-    
-    published_responses = Response.objects.filter(
-        comment__post__user=request.user,
-        status='published'
-    ).count()
-    
-    # Posts de los últimos 7 días
-    seven_days_ago = timezone.now() - timedelta(days=7)
-    posts_7d = posts.filter(created_at__gte=seven_days_ago).count()
-    
-    # Promedio de comentarios por post
-    avg_comments = total_comments / total_posts if total_posts > 0 else 0
-    
-    # === DATOS PARA GRÁFICAS ===
-    # Actividad semanal (últimas 4 semanas)
-    activity_data = []
-    for i in range(3, -1, -1):
-        week_start = timezone.now() - timedelta(days=7*i + 7)
-        week_end = timezone.now() - timedelta(days=7*i)
-        week_posts = posts.filter(created_at__gte=week_start, created_at__lt=week_end).count()
-        activity_data.append({
-            'week': f'Semana {4-i}',
-            'posts': week_posts
-        })
-    
-    # Engagement por post (top 5 posts con más comentarios)
-    top_posts = posts.annotate(comment_count=Count('comments')).order_by('-comment_count')[:5]
-    engagement_data = [{
-        'title': post.title[:30] + '...' if len(post.title) > 30 else post.title,
-        'comments': post.comments.count()
-    } for post in top_posts]
-    
-    # Tasa de respuesta
-    posts_with_responses = posts.filter(comments__response__isnull=False).distinct().count()
-    response_rate = (posts_with_responses / total_posts * 100) if total_posts > 0 else 0
+    # Métricas desde la caché (se recalculan con consultas agregadas si no existen)
+    metrics = get_dashboard_snapshot(request.user, REDDIT)
     
     context = {
         'posts': posts,
-        'total_posts': total_posts,
-        'total_comments': total_comments,
-        'total_unread': total_unread,
-        'pending_responses': pending_responses,
-        'published_responses': published_responses,
-        'posts_7d': posts_7d,
-        'avg_comments': round(avg_comments, 2),
-        'activity_data': json.dumps(activity_data),
-        'engagement_data': json.dumps(engagement_data),
-        'response_rate': round(response_rate, 1)
+        'sync_schedule': SyncSchedule.objects.filter(user=request.user, platform=REDDIT).first(),
+        **metrics,
+        'activity_data': json.dumps(metrics['activity_data']),
+        'engagement_data': json.dumps(metrics['engagement_data'])
     }
     
     return render(request, 'dashboard/reddit_manager.html', context)
@@ -89,32 +53,30 @@ def sync_posts(request):
     """Sincroniza posts del subreddit con la base de datos"""
     if request.method == 'POST':
         try:
-            bot = RedditBot()
-            subreddit_name = "ACM_Magneto"
-            posts_data = bot.get_subreddit_posts(subreddit_name, limit=25)
-            
-            synced_count = 0
-            for post_data in posts_data:
-                post, created = RedditPost.objects.get_or_create(
-                    post_id=post_data['post_id'],
-                    defaults={
-                        'user': request.user,
-                        'title': post_data['title'],
-                        'url': post_data['url'],
-                        'permalink': post_data['permalink'],
-                        'subreddit': post_data['subreddit'],
-                        'author': post_data['author'],
-                        'created_at': post_data['created_at']
-                    }
-                )
-                if created:
-                    synced_count += 1
+            # La sincronización periódica queda activada para el usuario
+            SyncSchedule.objects.get_or_create(user=request.user, platform=REDDIT)
+            synced_count = sync_reddit_posts(request.user)['synced']
             
             messages.success(request, f'Se sincronizaron {synced_count} posts nuevos')
             return JsonResponse({
                 'success': True,
                 'synced_count': synced_count
             })
+        except SyncInProgress as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=409)
+        except RateLimited as e:
+            # Sin cupo de llamadas a la plataforma: el usuario reintenta después
+            retry_after = math.ceil(e.retry_after)
+            response = JsonResponse({
+                'success': False,
+                'retry_after': retry_after,
+                'error': str(e)
+            }, status=429)
+            response['Retry-After'] = str(retry_after)
+            return response
         except Exception as e:
             logger.error(f"Error al sincronizar posts: {str(e)}")
             return JsonResponse({
@@ -128,7 +90,7 @@ def sync_posts(request):
 def post_detail(request, post_id):
     """Vista de comentarios de un post específico"""
     post = get_object_or_404(RedditPost, post_id=post_id, user=request.user)
-    comments = post.comments.all().order_by('-created_at')
+    comments = post.comments.select_related('response').order_by('-created_at')
     
     context = {
         'post': post,
@@ -144,29 +106,29 @@ def sync_comments(request, post_id):
     if request.method == 'POST':
         try:
             post = get_object_or_404(RedditPost, post_id=post_id, user=request.user)
-            bot = RedditBot()
-            comments_data = bot.get_post_comments(post_id)
-            
-            synced_count = 0
-            for comment_data in comments_data:
-                comment, created = Comment.objects.get_or_create(
-                    comment_id=comment_data['comment_id'],
-                    defaults={
-                        'post': post,
-                        'author': comment_data['author'],
-                        'content': comment_data['content'],
-                        'permalink': comment_data['permalink'],
-                        'parent_id': comment_data['parent_id'],
-                        'created_at': comment_data['created_at']
-                    }
-                )
-                if created:
-                    synced_count += 1
+            # Inserción/actualización en bloque
+            result = sync_reddit_comments(post)
             
             return JsonResponse({
                 'success': True,
-                'synced_count': synced_count
+                'synced_count': result['inserted'],
+                'updated_count': result['updated']
             })
+        except SyncInProgress as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=409)
+        except RateLimited as e:
+            # Sin cupo de llamadas a la plataforma: el usuario reintenta después
+            retry_after = math.ceil(e.retry_after)
+            response = JsonResponse({
+                'success': False,
+                'retry_after': retry_after,
+                'error': str(e)
+            }, status=429)
+            response['Retry-After'] = str(retry_after)
+            return response
         except Exception as e:
             logger.error(f"Error al sincronizar comentarios: {str(e)}")
             return JsonResponse({
@@ -176,6 +138,73 @@ def sync_comments(request, post_id):
     
     return JsonResponse({'success': False}, status=400)
 
+@login_required
+def generate_drafts_post(request, post_id):
+    """Encola la generación de borradores para los comentarios sin respuesta de un post"""
+    if request.method == 'POST':
+        try:
+            post = get_object_or_404(RedditPost, post_id=post_id, user=request.user)
+            tone = request.POST.get('tone', 'friendly')
+            job = start_draft_generation(REDDIT, request.user.id, post.pk, tone)
+            
+            return JsonResponse({'success': True, **job})
+        except Exception as e:
+            logger.error(f"Error al encolar borradores: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+    
+    return JsonResponse({'success': False}, status=400)
+
+@login_required
+def generate_drafts_reddit(request):
+    """Encola la generación de borradores para todos los comentarios sin respuesta del usuario"""
+    if request.method == 'POST':
+        try:
+            tone = request.POST.get('tone', 'friendly')
+            job = start_draft_generation(REDDIT, request.user.id, tone=tone)
+            
+            return JsonResponse({'success': True, **job})
+        except Exception as e:
+            logger.error(f"Error al encolar borradores: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+    
+    return JsonResponse({'success': False}, status=400)
+
+@login_required
+def draft_generation_status(request, task_id):
+    """Progreso de una tarea de generación de borradores (solo para quien la encoló)"""
+    if draft_task_owner(task_id) != request.user.id:
+        raise Http404('Tarea no encontrada')
+    
+    result = AsyncResult(task_id)
+    
+    if result.successful():
+        progress = result.result
+    elif isinstance(result.info, dict):
+        progress = result.info
+    else:
+        progress = {}
+    
+    return JsonResponse({
+        'success': not result.failed(),
+        'state': result.state,
+        'ready': result.ready(),
+        'progress': progress
+    })
+
+@login_required
+def outbox_status(request, platform):
+    """Respuestas del usuario en cola de publicación y con error (para el polling de la UI)"""
+    if platform not in (REDDIT, YOUTUBE):
+        raise Http404('Plataforma no soportada')
+    
+    return JsonResponse({'success': True, **outbox_summary(platform, request.user.id)})
+
 @login_required
 def comment_detail(request, comment_id):
     """Vista de detalle de un comentario con opciones de respuesta"""
@@ -194,7 +223,11 @@ def comment_detail(request, comment_id):
     context = {
         'comment': comment,
         'response': response,
-        'available_tones': ['formal', 'friendly', 'informative']
+        'available_tones': ['formal', 'friendly', 'informative'],
+        # Comentarios casi idénticos que todavía no tienen respuesta
+        'similar_pending': pending_cluster_members(REDDIT, comment.cluster_id).exclude(
+            pk=comment.pk
+        ).count() if comment.cluster_id else 0
     }
     
     return render(request, 'dashboard/comment_detail.html', context)
@@ -215,10 +248,10 @@ def delete_comment(request, comment_id):
             
             post_id = comment.post.post_id
             reddit_deleted = False
+            bot = RedditBot()
             
             # Intentar eliminar el comentario original de Reddit
             try:
-                bot = RedditBot()
                 reddit_deleted = bot.delete_comment(comment_id)
                 if reddit_deleted:
                     logger.info(f"Comentario {comment_id} eliminado de Reddit")
@@ -230,7 +263,6 @@ def delete_comment(request, comment_id):
                 response = comment.response
                 if response and response.reddit_reply_id:
                     try:
-                        bot = RedditBot()
                         bot.delete_comment(response.reddit_reply_id)
                         logger.info(f"Respuesta {response.reddit_reply_id} eliminada de Reddit")
                     except Exception as e:
@@ -259,31 +291,38 @@ def delete_comment(request, comment_id):
     return JsonResponse({'success': False}, status=400)
 
 @login_required
-def generate_response(request, comment_id):
-    """Genera una respuesta con IA para un comentario"""
+@admission_control
+async def generate_response(request, comment_id):
+    """Genera una respuesta con IA para un comentario (vista asíncrona)"""
     if request.method == 'POST':
         try:
-            comment = get_object_or_404(Comment, comment_id=comment_id)
+            comment = await aget_object_or_404(
+                Comment.objects.select_related('post'), comment_id=comment_id
+            )
+            user = await request.auser()
             
             # Verificar permisos
-            if comment.post.user != request.user:
+            if comment.post.user_id != user.pk:
                 return JsonResponse({
                     'success': False,
                     'error': 'No autorizado'
                 }, status=403)
             
             tone = request.POST.get('tone', 'friendly')
+            # Forzar una nueva generación en lugar de usar la caché
+            regenerate = request.POST.get('regenerate') == '1'
             
-            # Generar respuesta
+            # Generar respuesta (la espera al modelo no bloquea un hilo)
             generator = ResponseGenerator()
-            generated_text = generator.generate(
+            generated_text = await generator.agenerate(
                 comment_text=comment.content,
                 tone=tone,
-                context=f"Post: {comment.post.title}"
+                context=f"Post: {comment.post.title}",
+                regenerate=regenerate
             )
             
             # Guardar o actualizar respuesta
-            response, created = Response.objects.update_or_create(
+            response, created = await Response.objects.aupdate_or_create(
                 comment=comment,
                 defaults={
                     'generated_text': generated_text,
@@ -300,6 +339,9 @@ def generate_response(request, comment_id):
                 'tone': tone
             })
             
+        except QueueTimeout as e:
+            # La cola se saturó mientras esperaba turno: no se guarda la respuesta de respaldo
+            return busy_response(e.eta_seconds)
         except Exception as e:
             logger.error(f"Error al generar respuesta: {str(e)}")
             return JsonResponse({
@@ -309,6 +351,56 @@ def generate_response(request, comment_id):
     
     return JsonResponse({'success': False}, status=400)
 
+@login_required
+@admission_control
+async def generate_response_stream(request, comment_id):
+    """Genera una respuesta con IA transmitiendo los tokens (SSE)"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False}, status=400)
+    
+    comment = await aget_object_or_404(
+        Comment.objects.select_related('post'), comment_id=comment_id
+    )
+    user = await request.auser()
+    
+    # Verificar permisos
+    if comment.post.user_id != user.pk:
+        return JsonResponse({
+            'success': False,
+            'error': 'No autorizado'
+        }, status=403)
+    
+    tone = request.POST.get('tone', 'friendly')
+    regenerate = request.POST.get('regenerate') == '1'
+    generator = ResponseGenerator()
+    tokens = generator.agenerate_stream(
+        comment_text=comment.content,
+        tone=tone,
+        context=f"Post: {comment.post.title}",
+        regenerate=regenerate
+    )
+    
+    async def save(generated_text):
+        # Guardar o actualizar respuesta cuando termina el stream
+        response, created = await Response.objects.aupdate_or_create(
+            comment=comment,
+            defaults={
+                'generated_text': generated_text,
+                'tone': tone,
+                'status': 'pending',
+                'edited_text': None
+            }
+        )
+        return response
+    
+    try:
+        # El turno en el servidor de modelos se obtiene antes de abrir el stream
+        tokens = await aprime(tokens)
+    except QueueTimeout as e:
+        return busy_response(e.eta_seconds)
+    
+    return sse_response(astream_generation(tokens, save))
+
 @login_required
 def update_response(request, response_id):
     """Actualiza el texto de una respuesta (edición manual)"""
@@ -350,7 +442,7 @@ def update_response(request, response_id):
 
 @login_required
 def publish_response(request, response_id):
-    """Publica la respuesta en Reddit"""
+    """Pone la respuesta en la cola de publicación de Reddit"""
     if request.method == 'POST':
         try:
             response = get_object_or_404(Response, id=response_id)
@@ -362,38 +454,129 @@ def publish_response(request, response_id):
                     'error': 'No autorizado'
                 }, status=403)
             
-            # Verificar que no esté ya publicada
+            # Verificar que no esté ya publicada ni en cola
             if response.status == 'published':
                 return JsonResponse({
                     'success': False,
                     'error': 'Esta respuesta ya fue publicada'
                 }, status=400)
+            if response.status == 'queued':
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Esta respuesta ya está en cola de publicación'
+                }, status=400)
             
-            # Publicar en Reddit
-            bot = RedditBot()
-            reply_id = bot.reply_to_comment(
-                comment_id=response.comment.comment_id,
-                text=response.final_text
-            )
+            # El worker de la cola publica en Reddit y reintenta si falla
+            start_publishing(REDDIT, [response.id])
             
-            if reply_id:
-                response.reddit_reply_id = reply_id
-                response.publish()
+            return JsonResponse({
+                'success': True,
+                'status': 'queued',
+                'message': 'Respuesta en cola de publicación'
+            }, status=202)
                 
-                messages.success(request, '¡Respuesta publicada exitosamente en Reddit!')
-                return JsonResponse({
-                    'success': True,
-                    'message': 'Respuesta publicada exitosamente',
-                    'reply_id': reply_id
-                })
-            else:
+        except Exception as e:
+            logger.error(f"Error al encolar respuesta: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+    
+    return JsonResponse({'success': False}, status=400)
+
+@login_required
+def publish_response_status(request, response_id):
+    """Estado de publicación de una respuesta (la UI lo consulta mientras está en cola)"""
+    response = get_object_or_404(Response, id=response_id, comment__post__user=request.user)
+    
+    return JsonResponse({'success': True, **publish_status(REDDIT, response)})
+
+@login_required
+def bulk_review_responses(request):
+    """Aprueba, rechaza o publica varias respuestas en una sola petición"""
+    import json
+    
+    if request.method == 'POST':
+        try:
+            payload = json.loads(request.body or '{}')
+            result = review_responses(
+                REDDIT,
+                request.user,
+                payload.get('action'),
+                payload.get('response_ids', []),
+                payload.get('edited_texts')
+            )
+            if payload.get('action') == PUBLISH and result['updated']:
+                # Las respuestas ya están en cola: el worker las publica y reintenta si falla
+                drain_publish_outbox.delay(REDDIT)
+            
+            return JsonResponse({'success': True, **result})
+        except PermissionDenied:
+            return JsonResponse({
+                'success': False,
+                'error': 'No autorizado'
+            }, status=403)
+        except (ValueError, TypeError) as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+        except Exception as e:
+            logger.error(f"Error en la revisión en bloque: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+    
+    return JsonResponse({'success': False}, status=400)
+
+@login_required
+def publish_post_responses(request, post_id):
+    """Encola la publicación de todas las respuestas aprobadas de un post"""
+    if request.method == 'POST':
+        try:
+            post = get_object_or_404(RedditPost, post_id=post_id, user=request.user)
+            response_ids = Response.objects.filter(
+                comment__post=post, status='approved'
+            ).values_list('id', flat=True)
+            job = start_publishing(REDDIT, response_ids)
+            
+            return JsonResponse({'success': True, **job})
+        except Exception as e:
+            logger.error(f"Error al encolar respuestas: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+    
+    return JsonResponse({'success': False}, status=400)
+
+@login_required
+def apply_response_to_cluster(request, response_id):
+    """Copia la respuesta a los comentarios casi idénticos que no tienen respuesta"""
+    if request.method == 'POST':
+        try:
+            response = get_object_or_404(Response, id=response_id)
+            
+            # Verificar permisos
+            if response.comment.post.user != request.user:
                 return JsonResponse({
                     'success': False,
-                    'error': 'Error al publicar en Reddit'
-                }, status=500)
-                
+                    'error': 'No autorizado'
+                }, status=403)
+            
+            cluster_id = response.comment.cluster_id
+            applied = apply_draft_to_cluster(
+                REDDIT, cluster_id, response.final_text, response.tone
+            ) if cluster_id else 0
+            
+            return JsonResponse({
+                'success': True,
+                'applied_count': applied
+            })
+            
         except Exception as e:
-            logger.error(f"Error al publicar respuesta: {str(e)}")
+            logger.error(f"Error al aplicar respuesta al cluster: {str(e)}")
             return JsonResponse({
                 'success': False,
                 'error': str(e)
@@ -416,7 +599,8 @@ def reject_response(request, response_id):
                 }, status=403)
             
             response.status = 'rejected'
-            response.save()
+            with transaction.atomic():
+                response.save()
             
             return JsonResponse({
                 'success': True,
@@ -492,8 +676,9 @@ def create_post_view(request):
 
 
 @login_required
-def generate_job_post_view(request):
-    """Vista para generar post de empleo con IA"""
+@admission_control
+async def generate_job_post_view(request):
+    """Vista para generar post de empleo con IA (asíncrona: la espera al modelo no bloquea un hilo)"""
     if request.method == 'POST':
         form = GenerateJobPostForm(request.POST)
         if form.is_valid():
@@ -518,7 +703,7 @@ def generate_job_post_view(request):
                     ]
                 
                 # Generar post
-                generated = generator.generate_job_post(
+                generated = await generator.agenerate_job_post(
                     job_title=form.cleaned_data['job_title'],
                     company_name=form.cleaned_data['company_name'],
                     job_type=form.cleaned_data['job_type'],
@@ -534,6 +719,8 @@ def generate_job_post_view(request):
                     'content': generated['content']
                 })
                 
+            except QueueTimeout as e:
+                return busy_response(e.eta_seconds)
             except Exception as e:
                 logger.error(f"Error al generar post: {str(e)}")
                 return JsonResponse({
@@ -547,7 +734,8 @@ def generate_job_post_view(request):
         'form': form
     }
     
-    return render(request, 'dashboard/generate_job_post.html', context)
+    # Los context processors leen request.user y la sesión (consultas síncronas)
+    return await sync_to_async(render)(request, 'dashboard/generate_job_post.html', context)
 
 
 @login_required
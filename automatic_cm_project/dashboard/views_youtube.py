@@ -1,11 +1,24 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.utils import timezone
 from django.contrib import messages
-from .models import YouTubeVideo, YouTubeComment, YouTubeResponse
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from .models import YouTubeVideo, YouTubeComment, YouTubeResponse, SyncSchedule
 from ai_manager.response_generator import ResponseGenerator
+from ai_manager.scheduler import QueueTimeout
+from bots.rate_limit import RateLimited
 from bots.youtube_bot import YouTubeBot
+from core.tasks import drain_publish_outbox, start_draft_generation, start_publishing
+from .clustering import apply_draft_to_cluster, pending_cluster_members
+from .decorators import admission_control, busy_response
+from .publishing import publish_status
+from .review import PUBLISH, review_responses
+from .streaming import aprime, astream_generation, sse_response
+from .sync import sync_youtube_videos, sync_youtube_comments, SyncInProgress
+from .snapshots import get_dashboard_snapshot, YOUTUBE
+import math
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,70 +26,19 @@ logger = logging.getLogger(__name__)
 @login_required
 def youtube_manager(request):
     """Vista principal - Lista de videos de YouTube"""
-    from datetime import timedelta
-    from django.db.models import Count
     import json
     
     videos = YouTubeVideo.objects.filter(user=request.user, is_active=True)
     
-    # Calcular métricas
-    total_videos = videos.count()
-    total_comments = sum(video.youtube_comments.filter(is_reply=False).count() for video in videos)
-    total_unread = sum(video.unread_comments_count for video in videos)
-    
-    # Respuestas pendientes y publicadas
-    pending_responses = YouTubeResponse.objects.filter(
-        comment__video__user=request.user,
-        status='pending'
-    ).count()
-    
-    published_responses = YouTubeResponse.objects.filter(
-        comment__video__user=request.user,
-        status='published'
-    ).count()
-    
-    # Videos de los últimos 7 días
-    seven_days_ago = timezone.now() - timedelta(days=7)
-    videos_7d = videos.filter(published_at__gte=seven_days_ago).count()
-    
-    # Promedio de comentarios por video
-    avg_comments = total_comments / total_videos if total_videos > 0 else 0
-    
-    # === DATOS PARA GRÁFICAS ===
-    # Actividad semanal (últimas 4 semanas)
-    activity_data = []
-    for i in range(3, -1, -1):
-        week_start = timezone.now() - timedelta(days=7*i + 7)
-        week_end = timezone.now() - timedelta(days=7*i)
-        week_videos = videos.filter(published_at__gte=week_start, published_at__lt=week_end).count()
-        activity_data.append({
-            'week': f'Semana {4-i}',
-            'videos': week_videos
-        })
-    
-    # Engagement por video (top 5 videos con más comentarios)
-    top_videos = videos.annotate(total_youtube_comments=Count('youtube_comments')).order_by('-total_youtube_comments')[:5]
-    engagement_data = [{
-        'title': video.title[:30] + '...' if len(video.title) > 30 else video.title,
-        'comments': video.youtube_comments.filter(is_reply=False).count()
-    } for video in top_videos]
-    
-    # Tasa de respuesta
-    videos_with_responses = videos.filter(youtube_comments__youtube_response__isnull=False).distinct().count()
-    response_rate = (videos_with_responses / total_videos * 100) if total_videos > 0 else 0
+    # Métricas desde la caché (se recalculan con consultas agregadas si no existen)
+    metrics = get_dashboard_snapshot(request.user, YOUTUBE)
     
     context = {
         'videos': videos,
-        'total_videos': total_videos,
-        'total_comments': total_comments,
-        'total_unread': total_unread,
-        'pending_responses': pending_responses,
-        'published_responses': published_responses,
-        'videos_7d': videos_7d,
-        'avg_comments': round(avg_comments, 2),
-        'activity_data': json.dumps(activity_data),
-        'engagement_data': json.dumps(engagement_data),
-        'response_rate': round(response_rate, 1)
+        'sync_schedule': SyncSchedule.objects.filter(user=request.user, platform=YOUTUBE).first(),
+        **metrics,
+        'activity_data': json.dumps(metrics['activity_data']),
+        'engagement_data': json.dumps(metrics['engagement_data'])
     }
     
     return render(request, 'dashboard/youtube_manager.html', context)
@@ -86,39 +48,30 @@ def sync_videos_yt(request):
     """Sincroniza videos de YouTube con la base de datos"""
     if request.method == 'POST':
         try:
-            bot = YouTubeBot()
-            videos_data = bot.get_channel_videos(max_results=25)
-            
-            synced_count = 0
-            for video_data in videos_data:
-                video, created = YouTubeVideo.objects.get_or_create(
-                    video_id=video_data['video_id'],
-                    defaults={
-                        'user': request.user,
-                        'title': video_data['title'],
-                        'description': video_data['description'],
-                        'url': video_data['url'],
-                        'thumbnail_url': video_data['thumbnail_url'],
-                        'channel_title': video_data['channel_title'],
-                        'published_at': video_data['published_at'],
-                        'view_count': video_data['view_count'],
-                        'comment_count': video_data['comment_count']
-                    }
-                )
-                
-                # Actualizar estadísticas si ya existe
-                if not created:
-                    video.view_count = video_data['view_count']
-                    video.comment_count = video_data['comment_count']
-                    video.save()
-                else:
-                    synced_count += 1
+            # La sincronización periódica queda activada para el usuario
+            SyncSchedule.objects.get_or_create(user=request.user, platform=YOUTUBE)
+            synced_count = sync_youtube_videos(request.user)['synced']
             
             messages.success(request, f'Se sincronizaron {synced_count} videos nuevos')
             return JsonResponse({
                 'success': True,
                 'synced_count': synced_count
             })
+        except SyncInProgress as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=409)
+        except RateLimited as e:
+            # Sin cupo de llamadas a la plataforma: el usuario reintenta después
+            retry_after = math.ceil(e.retry_after)
+            response = JsonResponse({
+                'success': False,
+                'retry_after': retry_after,
+                'error': str(e)
+            }, status=429)
+            response['Retry-After'] = str(retry_after)
+            return response
         except Exception as e:
             logger.error(f"Error al sincronizar videos: {str(e)}")
             return JsonResponse({
@@ -132,7 +85,7 @@ def sync_videos_yt(request):
 def video_detail_yt(request, video_id):
     """Vista de comentarios de un video específico"""
     video = get_object_or_404(YouTubeVideo, video_id=video_id, user=request.user)
-    comments = video.youtube_comments.filter(is_reply=False).order_by('-published_at')
+    comments = video.youtube_comments.filter(is_reply=False).select_related('youtube_response').order_by('-published_at')
     
     context = {
         'video': video,
@@ -148,32 +101,33 @@ def sync_comments_yt(request, video_id):
     if request.method == 'POST':
         try:
             video = get_object_or_404(YouTubeVideo, video_id=video_id, user=request.user)
-            bot = YouTubeBot()
-            comments_data = bot.get_video_comments(video_id)
-            
-            synced_count = 0
-            for comment_data in comments_data:
-                comment, created = YouTubeComment.objects.get_or_create(
-                    comment_id=comment_data['comment_id'],
-                    defaults={
-                        'video': video,
-                        'author': comment_data['author'],
-                        'author_channel_id': comment_data['author_channel_id'],
-                        'content': comment_data['content'],
-                        'like_count': comment_data['like_count'],
-                        'parent_id': comment_data['parent_id'],
-                        'is_reply': comment_data['is_reply'],
-                        'published_at': comment_data['published_at'],
-                        'updated_at': comment_data['updated_at']
-                    }
-                )
-                if created:
-                    synced_count += 1
+            
+            # 'incremental' (por defecto) solo descarga comentarios más nuevos que
+            # el último guardado; 'full' vuelve a descargar todo para reparar
+            mode = request.POST.get('mode', 'incremental')
+            result = sync_youtube_comments(video, mode=mode)
             
             return JsonResponse({
                 'success': True,
-                'synced_count': synced_count
+                'synced_count': result['inserted'],
+                'updated_count': result['updated'],
+                'mode': mode
             })
+        except SyncInProgress as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=409)
+        except RateLimited as e:
+            # Sin cupo de llamadas a la plataforma: el usuario reintenta después
+            retry_after = math.ceil(e.retry_after)
+            response = JsonResponse({
+                'success': False,
+                'retry_after': retry_after,
+                'error': str(e)
+            }, status=429)
+            response['Retry-After'] = str(retry_after)
+            return response
         except Exception as e:
             logger.error(f"Error al sincronizar comentarios: {str(e)}")
             return JsonResponse({
@@ -183,6 +137,43 @@ def sync_comments_yt(request, video_id):
     
     return JsonResponse({'success': False}, status=400)
 
+@login_required
+def generate_drafts_video_yt(request, video_id):
+    """Encola la generación de borradores para los comentarios sin respuesta de un video"""
+    if request.method == 'POST':
+        try:
+            video = get_object_or_404(YouTubeVideo, video_id=video_id, user=request.user)
+            tone = request.POST.get('tone', 'friendly')
+            job = start_draft_generation(YOUTUBE, request.user.id, video.pk, tone)
+            
+            return JsonResponse({'success': True, **job})
+        except Exception as e:
+            logger.error(f"Error al encolar borradores: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+    
+    return JsonResponse({'success': False}, status=400)
+
+@login_required
+def generate_drafts_yt(request):
+    """Encola la generación de borradores para todos los comentarios sin respuesta del usuario"""
+    if request.method == 'POST':
+        try:
+            tone = request.POST.get('tone', 'friendly')
+            job = start_draft_generation(YOUTUBE, request.user.id, tone=tone)
+            
+            return JsonResponse({'success': True, **job})
+        except Exception as e:
+            logger.error(f"Error al encolar borradores: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+    
+    return JsonResponse({'success': False}, status=400)
+
 @login_required
 def comment_detail_yt(request, comment_id):
     """Vista de detalle de un comentario con opciones de respuesta"""
@@ -201,7 +192,11 @@ def comment_detail_yt(request, comment_id):
     context = {
         'comment': comment,
         'response': response,
-        'available_tones': ['formal', 'friendly', 'informative']
+        'available_tones': ['formal', 'friendly', 'informative'],
+        # Comentarios casi idénticos que todavía no tienen respuesta
+        'similar_pending': pending_cluster_members(YOUTUBE, comment.cluster_id).exclude(
+            pk=comment.pk
+        ).count() if comment.cluster_id else 0
     }
     
     return render(request, 'dashboard/comment_detail_yt.html', context)
@@ -250,31 +245,38 @@ def delete_comment_yt(request, comment_id):
     return JsonResponse({'success': False}, status=400)
 
 @login_required
-def generate_response_yt(request, comment_id):
-    """Genera una respuesta con IA para un comentario de YouTube"""
+@admission_control
+async def generate_response_yt(request, comment_id):
+    """Genera una respuesta con IA para un comentario de YouTube (vista asíncrona)"""
     if request.method == 'POST':
         try:
-            comment = get_object_or_404(YouTubeComment, comment_id=comment_id)
+            comment = await aget_object_or_404(
+                YouTubeComment.objects.select_related('video'), comment_id=comment_id
+            )
+            user = await request.auser()
             
             # Verificar permisos
-            if comment.video.user != request.user:
+            if comment.video.user_id != user.pk:
                 return JsonResponse({
                     'success': False,
                     'error': 'No autorizado'
                 }, status=403)
             
             tone = request.POST.get('tone', 'friendly')
+            # Forzar una nueva generación en lugar de usar la caché
+            regenerate = request.POST.get('regenerate') == '1'
             
-            # Generar respuesta
+            # Generar respuesta (la espera al modelo no bloquea un hilo)
             generator = ResponseGenerator()
-            generated_text = generator.generate(
+            generated_text = await generator.agenerate(
                 comment_text=comment.content,
                 tone=tone,
-                context=f"Video: {comment.video.title}"
+                context=f"Video: {comment.video.title}",
+                regenerate=regenerate
             )
             
             # Guardar o actualizar respuesta
-            response, created = YouTubeResponse.objects.update_or_create(
+            response, created = await YouTubeResponse.objects.aupdate_or_create(
                 comment=comment,
                 defaults={
                     'generated_text': generated_text,
@@ -291,6 +293,9 @@ def generate_response_yt(request, comment_id):
                 'tone': tone
             })
             
+        except QueueTimeout as e:
+            # La cola se saturó mientras esperaba turno: no se guarda la respuesta de respaldo
+            return busy_response(e.eta_seconds)
         except Exception as e:
             logger.error(f"Error al generar respuesta: {str(e)}")
             return JsonResponse({
@@ -300,6 +305,56 @@ def generate_response_yt(request, comment_id):
     
     return JsonResponse({'success': False}, status=400)
 
+@login_required
+@admission_control
+async def generate_response_stream_yt(request, comment_id):
+    """Genera una respuesta con IA transmitiendo los tokens (SSE) para un comentario de YouTube"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False}, status=400)
+    
+    comment = await aget_object_or_404(
+        YouTubeComment.objects.select_related('video'), comment_id=comment_id
+    )
+    user = await request.auser()
+    
+    # Verificar permisos
+    if comment.video.user_id != user.pk:
+        return JsonResponse({
+            'success': False,
+            'error': 'No autorizado'
+        }, status=403)
+    
+    tone = request.POST.get('tone', 'friendly')
+    regenerate = request.POST.get('regenerate') == '1'
+    generator = ResponseGenerator()
+    tokens = generator.agenerate_stream(
+        comment_text=comment.content,
+        tone=tone,
+        context=f"Video: {comment.video.title}",
+        regenerate=regenerate
+    )
+    
+    async def save(generated_text):
+        # Guardar o actualizar respuesta cuando termina el stream
+        response, created = await YouTubeResponse.objects.aupdate_or_create(
+            comment=comment,
+            defaults={
+                'generated_text': generated_text,
+                'tone': tone,
+                'status': 'pending',
+                'edited_text': None
+            }
+        )
+        return response
+    
+    try:
+        # El turno en el servidor de modelos se obtiene antes de abrir el stream
+        tokens = await aprime(tokens)
+    except QueueTimeout as e:
+        return busy_response(e.eta_seconds)
+    
+    return sse_response(astream_generation(tokens, save))
+
 @login_required
 def update_response_yt(request, response_id):
     """Actualiza el texto de una respuesta (edición manual)"""
@@ -341,7 +396,7 @@ def update_response_yt(request, response_id):
 
 @login_required
 def publish_response_yt(request, response_id):
-    """Publica la respuesta en YouTube"""
+    """Pone la respuesta en la cola de publicación de YouTube"""
     if request.method == 'POST':
         try:
             response = get_object_or_404(YouTubeResponse, id=response_id)
@@ -353,38 +408,129 @@ def publish_response_yt(request, response_id):
                     'error': 'No autorizado'
                 }, status=403)
             
-            # Verificar que no esté ya publicada
+            # Verificar que no esté ya publicada ni en cola
             if response.status == 'published':
                 return JsonResponse({
                     'success': False,
                     'error': 'Esta respuesta ya fue publicada'
                 }, status=400)
+            if response.status == 'queued':
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Esta respuesta ya está en cola de publicación'
+                }, status=400)
             
-            # Publicar en YouTube
-            bot = YouTubeBot()
-            reply_id = bot.reply_to_comment(
-                comment_id=response.comment.comment_id,
-                text=response.final_text
-            )
+            # El worker de la cola publica en YouTube y reintenta si falla
+            start_publishing(YOUTUBE, [response.id])
             
-            if reply_id:
-                response.youtube_reply_id = reply_id
-                response.publish()
+            return JsonResponse({
+                'success': True,
+                'status': 'queued',
+                'message': 'Respuesta en cola de publicación'
+            }, status=202)
                 
-                messages.success(request, '¡Respuesta publicada exitosamente en YouTube!')
-                return JsonResponse({
-                    'success': True,
-                    'message': 'Respuesta publicada exitosamente',
-                    'reply_id': reply_id
-                })
-            else:
+        except Exception as e:
+            logger.error(f"Error al encolar respuesta: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+    
+    return JsonResponse({'success': False}, status=400)
+
+@login_required
+def publish_response_status_yt(request, response_id):
+    """Estado de publicación de una respuesta (la UI lo consulta mientras está en cola)"""
+    response = get_object_or_404(YouTubeResponse, id=response_id, comment__video__user=request.user)
+    
+    return JsonResponse({'success': True, **publish_status(YOUTUBE, response)})
+
+@login_required
+def bulk_review_responses_yt(request):
+    """Aprueba, rechaza o publica varias respuestas en una sola petición"""
+    import json
+    
+    if request.method == 'POST':
+        try:
+            payload = json.loads(request.body or '{}')
+            result = review_responses(
+                YOUTUBE,
+                request.user,
+                payload.get('action'),
+                payload.get('response_ids', []),
+                payload.get('edited_texts')
+            )
+            if payload.get('action') == PUBLISH and result['updated']:
+                # Las respuestas ya están en cola: el worker las publica y reintenta si falla
+                drain_publish_outbox.delay(YOUTUBE)
+            
+            return JsonResponse({'success': True, **result})
+        except PermissionDenied:
+            return JsonResponse({
+                'success': False,
+                'error': 'No autorizado'
+            }, status=403)
+        except (ValueError, TypeError) as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+        except Exception as e:
+            logger.error(f"Error en la revisión en bloque: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+    
+    return JsonResponse({'success': False}, status=400)
+
+@login_required
+def publish_video_responses_yt(request, video_id):
+    """Encola la publicación de todas las respuestas aprobadas de un video"""
+    if request.method == 'POST':
+        try:
+            video = get_object_or_404(YouTubeVideo, video_id=video_id, user=request.user)
+            response_ids = YouTubeResponse.objects.filter(
+                comment__video=video, status='approved'
+            ).values_list('id', flat=True)
+            job = start_publishing(YOUTUBE, response_ids)
+            
+            return JsonResponse({'success': True, **job})
+        except Exception as e:
+            logger.error(f"Error al encolar respuestas: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+    
+    return JsonResponse({'success': False}, status=400)
+
+@login_required
+def apply_response_to_cluster_yt(request, response_id):
+    """Copia la respuesta a los comentarios casi idénticos que no tienen respuesta"""
+    if request.method == 'POST':
+        try:
+            response = get_object_or_404(YouTubeResponse, id=response_id)
+            
+            # Verificar permisos
+            if response.comment.video.user != request.user:
                 return JsonResponse({
                     'success': False,
-                    'error': 'Error al publicar en YouTube'
-                }, status=500)
-                
+                    'error': 'No autorizado'
+                }, status=403)
+            
+            cluster_id = response.comment.cluster_id
+            applied = apply_draft_to_cluster(
+                YOUTUBE, cluster_id, response.final_text, response.tone
+            ) if cluster_id else 0
+            
+            return JsonResponse({
+                'success': True,
+                'applied_count': applied
+            })
+            
         except Exception as e:
-            logger.error(f"Error al publicar respuesta: {str(e)}")
+            logger.error(f"Error al aplicar respuesta al cluster: {str(e)}")
             return JsonResponse({
                 'success': False,
                 'error': str(e)
@@ -407,7 +553,8 @@ def reject_response_yt(request, response_id):
                 }, status=403)
             
             response.status = 'rejected'
-            response.save()
+            with transaction.atomic():
+                response.save()
             
             return JsonResponse({
                 'success': True,